@@ -4,9 +4,10 @@ changing and deleting data from the database,
 intended for the normal purposes of this system
 """
 import json
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum
-from sqlalchemy import exists, and_
+from sqlalchemy import exists, and_, func, literal
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.future import select
 from sqlalchemy.orm import joinedload, selectinload
 from database.main_db import admin_crud
@@ -20,6 +21,8 @@ from model.main_db.group import Group
 from model.main_db.assigned_discipline import AssignedDiscipline
 from model.main_db.discipline import Discipline
 from model.main_db.student_ban import StudentBan
+from model.main_db.test_duration import TestDuration
+from model.main_db.cpu_usage import CpuUsage
 from model.pydantic.queue_in_raw import QueueInRaw
 from model.queue_db.queue_in import QueueIn
 from testing_tools.logger.report_model import LabReport
@@ -278,7 +281,10 @@ async def write_test_result(lab_report: LabReport, input_record: QueueIn) -> Non
     Record the test results.
 
     IF the work is submitted on time, 
-    then a full score is recorded ELSE result / 2
+    then a full score is recorded ELSE result / 2.
+    The time of the try is the time the answers were uploaded,
+    so that the time spent in the queue of the checks is not counted
+    (the time of the check for the records without it)
 
     :param lab_report: report on the results of testing the tasks of the work
     :param input_record: source data sent for testing
@@ -314,7 +320,8 @@ async def write_test_result(lab_report: LabReport, input_record: QueueIn) -> Non
                 for task_result in lab_report.tasks:
                     if task.number == task_result.task_id:
                         task.amount_tries += 1
-                        task.last_try_time = task_result.time
+                        task.last_try_time = task_raw.upload_time or \
+                            task_result.time
                         if not task.is_done and task_result.status:
                             task.is_done = True
                             task_done += 1
@@ -323,7 +330,7 @@ async def write_test_result(lab_report: LabReport, input_record: QueueIn) -> Non
 
             too_slow = False
             if (task_done == len(lab.tasks)) and not lab.is_done:
-                end_time = datetime.now()
+                end_time = task_raw.upload_time or datetime.now()
                 lab.end_time = end_time
                 lab.is_done = True
                 if lab.deadline < end_time.date():
@@ -340,3 +347,165 @@ async def write_test_result(lab_report: LabReport, input_record: QueueIn) -> Non
                 assig_discipline.point += lab_points
             assig_discipline.home_work = utils.homeworks_to_json(hwork)
             await session.commit()
+
+async def write_test_durations(discipline_id: int, lab_report: LabReport) -> None:
+    """
+    Add the durations of the tests of the check
+    to the durations accumulated for the lab work.
+    The rows are upserted in one statement, so that the checks
+    of the same lab written at the same time are all counted.
+
+    :param discipline_id: discipline ID
+    :param lab_report: report on the results of testing the tasks of the work
+
+    :return None:
+    """
+    if not lab_report.tests:
+        return
+    # one row per test: a statement can not update a row twice
+    tests = {it.name: it for it in lab_report.tests}
+    statement = insert(TestDuration).values([
+        {
+            'discipline_id': discipline_id,
+            'lab_number': lab_report.lab_id,
+            'test_name': it.name,
+            'task_id': it.task_id,
+            'runs': 1,
+            'total_duration': it.duration,
+            'max_duration': it.duration,
+        } for it in tests.values()
+    ])
+    statement = statement.on_conflict_do_update(
+        index_elements=[
+            TestDuration.discipline_id,
+            TestDuration.lab_number,
+            TestDuration.test_name
+        ],
+        set_={
+            'task_id': statement.excluded.task_id,
+            'runs': TestDuration.runs + 1,
+            'total_duration': TestDuration.total_duration +
+                statement.excluded.total_duration,
+            'max_duration': func.greatest(
+                TestDuration.max_duration,
+                statement.excluded.max_duration
+            ),
+        }
+    )
+    async with Session() as session:
+        async with session.begin():
+            await session.execute(statement)
+
+async def get_slowest_tests(discipline_id: int,
+                            amount: int = 5) -> dict[int, list[TestDuration]]:
+    """
+    Get the tests with the longest average duration for each lab work.
+
+    :param discipline_id: discipline ID
+    :param amount: number of tests per lab work
+
+    :return dict[int, list[TestDuration]]: lab number: slowest tests
+    """
+    async with Session() as session:
+        rows = await session.scalars(
+            select(TestDuration).where(
+                TestDuration.discipline_id == discipline_id
+            ).order_by(
+                TestDuration.lab_number,
+                (TestDuration.total_duration / TestDuration.runs).desc()
+            )
+        )
+        result: dict[int, list[TestDuration]] = {}
+        for it in rows:
+            tests = result.setdefault(it.lab_number, [])
+            if len(tests) < amount:
+                tests.append(it)
+        return result
+
+async def add_cpu_usage(telegram_id: int,
+                        discipline_id: int,
+                        cpu_time: float) -> None:
+    """
+    Add the CPU time used by the check to the usage of the student
+    for the current day. The usage is upserted in one statement,
+    so that the checks of the student persisted concurrently
+    by several checker workers are all counted.
+
+    :param telegram_id: student Telegram ID
+    :param discipline_id: discipline ID
+    :param cpu_time: CPU time used by the tests (sec)
+
+    :return None:
+    """
+    statement = insert(CpuUsage).from_select(
+        ['student_id', 'discipline_id', 'day', 'checks', 'cpu_time'],
+        select(
+            Student.id,
+            literal(discipline_id),
+            literal(datetime.now().date()),
+            literal(1),
+            literal(cpu_time)
+        ).where(Student.telegram_id == telegram_id)
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[
+            CpuUsage.student_id,
+            CpuUsage.discipline_id,
+            CpuUsage.day
+        ],
+        set_={
+            'checks': CpuUsage.checks + 1,
+            'cpu_time': CpuUsage.cpu_time + statement.excluded.cpu_time,
+        }
+    )
+    async with Session() as session:
+        async with session.begin():
+            await session.execute(statement)
+
+async def get_cpu_usage(telegram_id: int, since: date) -> float:
+    """
+    Get the CPU time used by the checks of the student
+    in all disciplines since the given day.
+
+    :param telegram_id: student Telegram ID
+    :param since: first day of the period
+
+    :return float: CPU time (sec)
+    """
+    async with Session() as session:
+        result = await session.scalar(
+            select(func.sum(CpuUsage.cpu_time))
+            .join(Student, Student.id == CpuUsage.student_id)
+            .where(Student.telegram_id == telegram_id, CpuUsage.day >= since)
+        )
+        return result or 0.0
+
+async def get_top_cpu_consumers(
+        discipline_id: int,
+        since: date,
+        amount: int = 10) -> list[tuple[Student, int, float]]:
+    """
+    Get the students whose checks used the most CPU time
+    in the discipline since the given day.
+
+    :param discipline_id: discipline ID
+    :param since: first day of the period
+    :param amount: number of students
+
+    :return list[tuple[Student, int, float]]: student, number of checks
+        and CPU time (sec), in descending order of the CPU time
+    """
+    async with Session() as session:
+        total = func.sum(CpuUsage.cpu_time).label('total')
+        rows = await session.execute(
+            select(Student, func.sum(CpuUsage.checks), total)
+            .join(CpuUsage, Student.id == CpuUsage.student_id)
+            .where(
+                CpuUsage.discipline_id == discipline_id,
+                CpuUsage.day >= since
+            )
+            .group_by(Student.id)
+            .order_by(total.desc())
+            .limit(amount)
+        )
+        return [(it[0], it[1], it[2]) for it in rows]
@@ -17,7 +17,8 @@ load_dotenv()
 
 engine = create_async_engine(
     f"postgresql+psycopg://{os.getenv('DB_USERNAME')}" +
-    f":{os.getenv('DB_PASSWORD')}@localhost:5432/{os.getenv('DATABASE_NAME')}"
+    f":{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST', 'localhost')}" +
+    f":{os.getenv('DB_PORT', '5432')}/{os.getenv('DATABASE_NAME')}"
 )
 
 Session = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
@@ -8,6 +8,8 @@ from model.main_db.teacher import Teacher
 from model.main_db.discipline import Discipline
 from model.main_db.assigned_discipline import AssignedDiscipline
 from model.main_db.admin import Admin
+from model.main_db.test_duration import TestDuration
+from model.main_db.cpu_usage import CpuUsage
 
 
 async def create_main_tables(settings: DbCreatorSettings) -> None:
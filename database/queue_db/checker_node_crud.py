@@ -0,0 +1,143 @@
+"""
+This module contains the operations with the registry of checker nodes
+in the queue database: registration, heartbeats, fleet status
+and returning the records of failed nodes to the queue.
+"""
+from datetime import timedelta
+from sqlalchemy import delete, func, or_, update
+from sqlalchemy.future import select
+from database.queue_db.database import Session, db_now
+from model.queue_db.checker_node import CheckerNode
+from model.queue_db.queue_in import QueueIn
+
+
+async def heartbeat(node_id: str,
+                    host: str,
+                    capacity: int,
+                    running: int,
+                    job_time: float | None = None,
+                    throughput: float = 0.0) -> None:
+    """
+    Register the checker node or update its report
+
+    :param node_id: node ID
+    :param host: name of the machine running the node
+    :param capacity: number of simultaneously running containers of the node
+    :param running: number of jobs being checked by the node
+    :param job_time: average duration of the recent checks (sec)
+    :param throughput: number of checks finished per second recently
+
+    :return None:
+    """
+    async with Session() as session:
+        async with session.begin():
+            node = await session.get(CheckerNode, node_id)
+            if node is None:
+                node = CheckerNode(id=node_id, host=host)
+                session.add(node)
+            node.capacity = capacity
+            node.running = running
+            node.job_time = job_time
+            node.throughput = throughput
+            node.last_heartbeat = db_now()
+
+async def remove_node(node_id: str) -> int:
+    """
+    Remove the checker node from the registry
+    and return the records taken by it to the queue
+
+    :param node_id: node ID
+
+    :return int: number of records returned to the queue
+    """
+    async with Session() as session:
+        async with session.begin():
+            result = await session.execute(
+                update(QueueIn)
+                .where(QueueIn.node_id == node_id)
+                .values(node_id=None, claimed_at=None)
+            )
+            await session.execute(
+                delete(CheckerNode).where(CheckerNode.id == node_id)
+            )
+            return result.rowcount
+
+async def get_all_nodes() -> list[CheckerNode]:
+    """
+    Get all registered checker nodes
+
+    :param None:
+
+    :return list[CheckerNode]: nodes ordered by ID
+    """
+    async with Session() as session:
+        nodes = await session.scalars(
+            select(CheckerNode).order_by(CheckerNode.id)
+        )
+        return list(nodes)
+
+async def get_live_nodes(stale_time: timedelta) -> list[CheckerNode]:
+    """
+    Get the checker nodes which have reported within the given time
+
+    :param stale_time: time after which a silent node is considered failed
+
+    :return list[CheckerNode]: nodes ordered by ID
+    """
+    async with Session() as session:
+        nodes = await session.scalars(
+            select(CheckerNode)
+            .where(CheckerNode.last_heartbeat >= db_now() - stale_time)
+            .order_by(CheckerNode.id)
+        )
+        return list(nodes)
+
+async def get_heartbeat_ages() -> list[tuple[CheckerNode, float]]:
+    """
+    Get all registered checker nodes with the time since their last report,
+    measured by the clock of the database
+
+    :param None:
+
+    :return list[tuple[CheckerNode, float]]: nodes ordered by ID
+        and the time since their last report (sec)
+    """
+    async with Session() as session:
+        rows = await session.execute(
+            select(
+                CheckerNode,
+                func.extract('epoch', db_now() - CheckerNode.last_heartbeat)
+            ).order_by(CheckerNode.id)
+        )
+        return [(node, float(age)) for node, age in rows]
+
+async def reclaim_jobs(stale_time: timedelta) -> int:
+    """
+    Remove the nodes which have not reported for the given time
+    and return the records taken by them (or by unregistered nodes)
+    to the queue
+
+    :param stale_time: time after which a silent node is considered failed
+
+    :return int: number of records returned to the queue
+    """
+    async with Session() as session:
+        async with session.begin():
+            await session.execute(
+                delete(CheckerNode).where(
+                    CheckerNode.last_heartbeat < db_now() - stale_time
+                )
+            )
+            result = await session.execute(
+                update(QueueIn)
+                .where(
+                    QueueIn.node_id.is_not(None),
+                    or_(
+                        QueueIn.claimed_at.is_(None),
+                        QueueIn.claimed_at < db_now() - stale_time
+                    ),
+                    QueueIn.node_id.not_in(select(CheckerNode.id))
+                )
+                .values(node_id=None, claimed_at=None)
+            )
+            return result.rowcount
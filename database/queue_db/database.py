@@ -4,6 +4,7 @@ as well as auxiliary functions for subsequent access to it.
 """
 import os
 from dotenv import load_dotenv
+from sqlalchemy import func
 from sqlalchemy.ext.asyncio import (
     create_async_engine,
     async_sessionmaker,
@@ -17,11 +18,25 @@ load_dotenv()
 
 engine = create_async_engine(
     f"postgresql+psycopg://{os.getenv('DB_USERNAME')}" +
-    f":{os.getenv('DB_PASSWORD')}@localhost:5432/{os.getenv('QUEUE_DB_NAME')}"
+    f":{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST', 'localhost')}" +
+    f":{os.getenv('DB_PORT', '5432')}/{os.getenv('QUEUE_DB_NAME')}"
 )
 
 Session = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
 
+def db_now():
+    """
+    Return the current time of the database server in UTC,
+    so that the times written and compared by the checker nodes
+    on different machines do not depend on their clocks and time zones.
+
+    :param None:
+
+    :return: SQL expression of the time (timestamp without time zone)
+    """
+    return func.timezone('UTC', func.now())
+
+
 class Base(AsyncAttrs, DeclarativeBase):
     """
     Inherited from sqlalchemy.orm.DeclarativeBase
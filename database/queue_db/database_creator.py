@@ -2,6 +2,11 @@
 This module contains the function of creating a queue table in the database
 """
 from database.queue_db.database import create_tables
+from model.queue_db.checker_node import CheckerNode
+from model.queue_db.progress import Progress
+from model.queue_db.queue_in import QueueIn
+from model.queue_db.queue_out import QueueOut
+from model.queue_db.rejected import Rejected
 
 
 async def create_queue_tables() -> None:
@@ -0,0 +1,78 @@
+"""
+This module contains the basic operations with the intermediate results
+of checks for their entry/extraction into the queue database progress table.
+"""
+import json
+from sqlalchemy import delete
+from database.queue_db.database import Session
+from model.pydantic.queue_out_raw import TestProgress
+from model.queue_db.progress import Progress
+from pydantic.json import pydantic_encoder
+from sqlalchemy.future import select
+
+
+async def is_not_empty() -> bool:
+    """
+    Check if progress table is not empty
+
+    :param None:
+
+    :return bool: True IF is not empty ELSE False
+    """
+    async with Session() as session:
+        data = await session.scalar(select(Progress))
+        return data is not None
+
+async def get_all_records() -> list[Progress]:
+    """
+    Get all records from the progress table
+
+    :param None:
+
+    :return list[Progress]: records in the order they were added
+    """
+    async with Session() as session:
+        data = await session.scalars(select(Progress).order_by(Progress.id))
+        return data.all()
+
+async def delete_records(record_ids: list[int]) -> None:
+    """
+    Delete the processed records from the progress table
+
+    :param record_ids: record IDs
+
+    :return None:
+    """
+    async with Session() as session:
+        async with session.begin():
+            await session.execute(
+                delete(Progress).where(Progress.id.in_(record_ids))
+            )
+
+async def add_record(user_tg_id: int, chat_id: int, data: TestProgress) -> None:
+    """
+    Add the intermediate check result to the progress table
+
+    :param user_tg_id: user Telegran ID
+    :param chat_id: chat ID
+    :param data: results of the tasks tested so far
+
+    :return None:
+    """
+    async with Session() as session:
+        async with session.begin():
+            json_data = json.dumps(
+                data,
+                sort_keys=False,
+                indent=4,
+                ensure_ascii=False,
+                separators=(",", ": "),
+                default=pydantic_encoder
+            )
+            session.add(
+                Progress(
+                    telegram_id=user_tg_id,
+                    chat_id=chat_id,
+                    data=json_data
+                )
+            )
@@ -3,25 +3,51 @@ This module contains the basic operations with incoming data
 for their subsequent entry/extraction into the queue database input table.
 """
 import json
-from database.queue_db.database import Session
+from typing import Callable
+from database.queue_db.database import Session, db_now
 from model.pydantic.queue_in_raw import QueueInRaw
 from model.queue_db.queue_in import QueueIn
 from pydantic.json import pydantic_encoder
+from sqlalchemy import delete, func, update
 from sqlalchemy.future import select
 
 
-async def add_record(user_tg_id: int, chat_id: int, data: QueueInRaw) -> None:
+# key of the transaction-level advisory lock taken by the uploads
+# admitted against the records of the queue (see add_record)
+ADMISSION_LOCK_KEY = 7_100_001
+
+
+async def add_record(user_tg_id: int,
+                     chat_id: int,
+                     data: QueueInRaw,
+                     admit: Callable[[list[QueueIn]], bool] | None = None
+                     ) -> bool:
     """
-    Add a data entry to the input table
+    Add a data entry to the input table.
+    IF the admission check is given, the records of the queue are read
+    and the entry is added in one transaction holding the advisory lock
+    of the admission, so that the concurrent uploads are checked one by one
+    and can not all pass the limits of the queue.
     
     :param user_tg_id: user Telegram ID, eg message.from_user.id
     :param chat_id: chat ID, eg message.chat.id
     :param data: eg discipline_id, lab_number, filelist
+    :param admit: function called with all records of the queue,
+        returns True IF the entry is admitted
 
-    :return None:
+    :return bool: True IF the entry is added
     """
     async with Session() as session:
         async with session.begin():
+            if admit is not None:
+                await session.execute(
+                    select(func.pg_advisory_xact_lock(ADMISSION_LOCK_KEY))
+                )
+                records = await session.scalars(
+                    select(QueueIn).order_by(QueueIn.id)
+                )
+                if not admit(records.all()):
+                    return False
             json_data = json.dumps(
                 data,
                 sort_keys=False,
@@ -38,22 +64,25 @@ async def add_record(user_tg_id: int, chat_id: int, data: QueueInRaw) -> None:
                     )
                 )
             await session.commit()
+    return True
 
 async def is_empty() -> bool:
     """
-    Check if input table is empty
+    Check if there are no records waiting for the check in the input table
 
     :param None:
 
     :return bool: True IF is empty ELSE False
     """
     async with Session() as session:
-        data = await session.scalar(select(QueueIn))
+        data = await session.scalar(
+            select(QueueIn).where(QueueIn.node_id.is_(None))
+        )
         return data is None
 
 async def is_not_empty() -> bool:
     """
-    Check if there is some data in the input table
+    Check if there are records waiting for the check in the input table
 
     :param None:
 
@@ -61,22 +90,150 @@ async def is_not_empty() -> bool:
     """
     async with Session() as session:
         data = await session.scalar(
-            select(QueueIn)
+            select(QueueIn).where(QueueIn.node_id.is_(None))
         )
         return data is not None
 
-async def get_first_record() -> QueueIn:
+async def get_first_record(node_id: str) -> QueueIn | None:
+    """
+    Take the first record waiting for the check in the input table.
+    The record stays in the table, marked as taken by the checker node,
+    until the node deletes it after the check (see delete_record),
+    so that the records of a failed node can be returned to the queue.
+    The records locked by other nodes are skipped, so that each record
+    is taken by exactly one of them.
+
+    :param node_id: ID of the checker node taking the record
+
+    :return QueueIn | None: object of class QueueIn,
+        None IF all records are already taken
+    """
+    async with Session() as session:
+        async with session.begin():
+            record = await session.scalar(
+                select(QueueIn)
+                .where(QueueIn.node_id.is_(None))
+                .order_by(QueueIn.id)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )
+            if record is not None:
+                record.node_id = node_id
+                record.claimed_at = db_now()
+        return record
+
+async def get_similar_records(node_id: str,
+                              record: QueueIn,
+                              limit: int,
+                              scan: int = 100) -> list[QueueIn]:
+    """
+    Take the records waiting for the check with the same discipline
+    and lab as the given record, to check them in one batch.
+    The records are taken the same way as by get_first_record.
+
+    :param node_id: ID of the checker node taking the records
+    :param record: record taken by the node
+    :param limit: maximum number of records to take
+    :param scan: number of the first waiting records looked through
+
+    :return list[QueueIn]: taken records, in the order of the queue
+    """
+    raw = QueueInRaw(**json.loads(record.data))
+    result = []
+    async with Session() as session:
+        async with session.begin():
+            records = await session.scalars(
+                select(QueueIn)
+                .where(QueueIn.node_id.is_(None))
+                .order_by(QueueIn.id)
+                .limit(scan)
+                .with_for_update(skip_locked=True)
+            )
+            for it in records:
+                data = QueueInRaw(**json.loads(it.data))
+                if data.discipline_id != raw.discipline_id or \
+                        data.lab_number != raw.lab_number:
+                    continue
+                it.node_id = node_id
+                it.claimed_at = db_now()
+                result.append(it)
+                if len(result) == limit:
+                    break
+    return result
+
+async def delete_record(record_id: int) -> None:
+    """
+    Delete the checked record from the input table
+
+    :param record_id: record ID
+
+    :return None:
+    """
+    async with Session() as session:
+        async with session.begin():
+            await session.execute(
+                delete(QueueIn).where(QueueIn.id == record_id)
+            )
+
+async def release_record(record_id: int) -> None:
+    """
+    Return the record whose check has failed to the queue,
+    counting the failed attempt
+
+    :param record_id: record ID
+
+    :return None:
+    """
+    async with Session() as session:
+        async with session.begin():
+            await session.execute(
+                update(QueueIn)
+                .where(QueueIn.id == record_id)
+                .values(
+                    node_id=None,
+                    claimed_at=None,
+                    attempts=QueueIn.attempts + 1
+                )
+            )
+
+async def get_all_records() -> list[QueueIn]:
+    """
+    Get all records of the input table: waiting and being checked
+
+    :param None:
+
+    :return list[QueueIn]: records in the order of the queue
+    """
+    async with Session() as session:
+        data = await session.scalars(select(QueueIn).order_by(QueueIn.id))
+        return data.all()
+
+async def get_waiting_records() -> list[QueueIn]:
     """
-    Get first record in from input table
+    Get the records waiting for the check
 
     :param None:
 
-    :return QueueIn: object of class QueueIn
+    :return list[QueueIn]: records not taken by checker nodes,
+        in the order of the queue
     """
     async with Session() as session:
-        record = await session.scalar(
+        data = await session.scalars(
             select(QueueIn)
+            .where(QueueIn.node_id.is_(None))
+            .order_by(QueueIn.id)
+        )
+        return data.all()
+
+async def get_queue_length() -> int:
+    """
+    Get the number of records waiting for the check
+
+    :param None:
+
+    :return int: number of records not taken by checker nodes
+    """
+    async with Session() as session:
+        return await session.scalar(
+            select(func.count(QueueIn.id)).where(QueueIn.node_id.is_(None))
         )
-        await session.delete(record)
-        await session.commit()
-        return record
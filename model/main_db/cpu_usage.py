@@ -0,0 +1,41 @@
+"""
+Describes 'cpu_usage' table, CPU time used by the checks
+of the answers of each student per day, to limit and show
+the students that consume the most compute
+"""
+from datetime import date
+from sqlalchemy import Date, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import mapped_column, Mapped
+from database.main_db.database import Base
+
+
+class CpuUsage(Base):
+    """
+    :param student_id: student ID
+    :param discipline_id: discipline ID
+    :param day: day of the checks
+    :param checks: number of the checks
+    :param cpu_time: CPU time used by the tests of the checks (sec)
+    """
+    __tablename__ = "cpu_usage"
+    __table_args__ = (
+        UniqueConstraint("student_id", "discipline_id", "day"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    student_id: Mapped[int] = mapped_column(
+        ForeignKey("students.id", ondelete="CASCADE"),
+        nullable=False
+    )
+    discipline_id: Mapped[int] = mapped_column(
+        ForeignKey("disciplines.id", onupdate="CASCADE", ondelete="CASCADE"),
+        nullable=False
+    )
+    day: Mapped[date] = mapped_column(Date, nullable=False)
+    checks: Mapped[int] = mapped_column(default=0)
+    cpu_time: Mapped[float] = mapped_column(default=0)
+
+    def __repr__(self) -> str:
+        return f"CpuUsage [student: {self.student_id}, " \
+            f"discipline: {self.discipline_id}, day: {self.day}, " \
+            f"checks: {self.checks}, CPU: {self.cpu_time}]"
@@ -0,0 +1,40 @@
+"""
+Describes 'test_durations' table, durations of the tests of lab works
+accumulated over all checks, to find the tests that take the most time
+"""
+from sqlalchemy import ForeignKey, String, UniqueConstraint
+from sqlalchemy.orm import mapped_column, Mapped
+from database.main_db.database import Base
+
+
+class TestDuration(Base):
+    """
+    :param discipline_id: discipline ID
+    :param lab_number: lab work number
+    :param test_name: test name (pytest node id)
+    :param task_id: number of the task checked by the test, IF known
+    :param runs: number of runs of the test
+    :param total_duration: total duration of the runs (sec)
+    :param max_duration: duration of the longest run (sec)
+    """
+    __tablename__ = "test_durations"
+    __table_args__ = (
+        UniqueConstraint("discipline_id", "lab_number", "test_name"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    discipline_id: Mapped[int] = mapped_column(
+        ForeignKey("disciplines.id", onupdate="CASCADE", ondelete="CASCADE"),
+        nullable=False
+    )
+    lab_number: Mapped[int] = mapped_column(nullable=False)
+    test_name: Mapped[str] = mapped_column(String(512), nullable=False)
+    task_id: Mapped[int | None]
+    runs: Mapped[int] = mapped_column(default=0)
+    total_duration: Mapped[float] = mapped_column(default=0)
+    max_duration: Mapped[float] = mapped_column(default=0)
+
+    def __repr__(self) -> str:
+        return f"TestDuration [discipline: {self.discipline_id}, " \
+            f"lab: {self.lab_number}, test: {self.test_name}, " \
+            f"runs: {self.runs}, total: {self.total_duration}]"
@@ -1,4 +1,5 @@
 """Contains the data structure for the queue database input table"""
+from datetime import datetime
 from pydantic import BaseModel
 
 
@@ -7,3 +8,6 @@ class QueueInRaw(BaseModel):
     discipline_id: int
     lab_number: int
     files_path: list[str]
+    progress_message_id: int | None = None  # сообщение о ходе проверки
+    trace_id: str | None = None  # трасса отправки (utils.tracing)
+    upload_time: datetime | None = None  # время отправки ответов студентом
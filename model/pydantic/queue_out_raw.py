@@ -23,3 +23,18 @@ class TestResult(BaseModel):
     lab_number: int
     successful_task: list[TaskResult] = []
     failed_task: list[TaskResult] = []
+    trace_id: str | None = None  # трасса отправки (utils.tracing)
+
+
+class TestProgress(BaseModel):
+    """
+    A class that stores the results of the tasks tested so far.
+    Its instance is passed from the verification subsystem to the bot
+    via an intermediate database while the tests are still running,
+    to update the message about the progress of the check
+    """
+    discipline_id: int
+    lab_number: int
+    message_id: int
+    successful_task: list[TaskResult] = []
+    failed_task: list[TaskResult] = []
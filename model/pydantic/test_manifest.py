@@ -0,0 +1,30 @@
+"""
+Contains the manifest of the tests uploaded for a discipline.
+It is built once, when the administrator uploads the test archive,
+and is used by the verification subsystem instead of scanning
+the test directories for every answer.
+"""
+from pydantic import BaseModel
+from model.pydantic.test_settings import TestSettings
+
+
+class LabTestManifest(BaseModel):
+    """
+    Contains data about the tests of a specific lab (homework) work
+    """
+    lab_number: int
+    tasks: list[str]  # имена файлов ответов, для которых есть тесты
+    file_hashes: dict[str, str]  # имя файла: sha256
+    settings: TestSettings
+    dependency_hash: str
+
+
+class DisciplineTestManifest(BaseModel):
+    """
+    Contains manifests of all lab (homework) works of the discipline,
+    the version of the uploaded tests and the directory (relative
+    to the root test directory of the discipline) where they are located
+    """
+    version: int = 0
+    root: str = ''
+    labs: dict[int, LabTestManifest] = {}
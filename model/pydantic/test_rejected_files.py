@@ -7,6 +7,7 @@ class RejectedType(IntEnum):
     """Reason, on select, for which answer files may be rejected"""
     TEMPLATEERROR = 0  # не вышел названием
     KEYWORDSERROR = 1  # запрещённые или отсутствующие ключевые слова
+    CHECKERERROR = 2  # сбой системы проверки
 
 
 class TestRejectedFiles(BaseModel):
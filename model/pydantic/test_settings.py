@@ -26,5 +26,7 @@ class TestSettings(BaseModel):
     with dependencies on external packages
     """
     dependencies: list[str] | None  # зависимости
+    cpus: int | None  # число ядер процессора на одну проверку
+    datasets: list[str] | None  # наборы данных из хранилища дисциплины
     global_level: TestGlobalSettings
     local_level: list[TestLocalSettings]
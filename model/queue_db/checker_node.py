@@ -0,0 +1,35 @@
+"""
+Contains a table of the checker nodes: instances of the verification
+subsystem (possibly on different machines) sharing the input table
+"""
+from datetime import datetime
+from sqlalchemy import DateTime, String
+from sqlalchemy.orm import mapped_column, Mapped
+from database.queue_db.database import Base
+
+
+class CheckerNode(Base):
+    """
+    :param id: node ID, eg hostname-pid
+    :param host: name of the machine running the node
+    :param capacity: number of simultaneously running containers of the node
+    :param running: number of jobs being checked by the node
+    :param job_time: average duration of the recent checks (sec),
+        None IF the node has not checked anything yet
+    :param throughput: number of checks finished per second recently
+    :param last_heartbeat: time of the last report of the node
+    """
+    __tablename__ = "checker_node"
+
+    id: Mapped[str] = mapped_column(String(255), primary_key=True)
+    host: Mapped[str] = mapped_column(String(255), nullable=False)
+    capacity: Mapped[int] = mapped_column(nullable=False)
+    running: Mapped[int] = mapped_column(default=0, nullable=False)
+    job_time: Mapped[float | None] = mapped_column()
+    throughput: Mapped[float] = mapped_column(default=0.0, nullable=False)
+    last_heartbeat: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"CheckerNode [ID: {self.id}, host: {self.host}, " \
+            f"capacity: {self.capacity}, running: {self.running}, " \
+            f"heartbeat: {self.last_heartbeat}]"
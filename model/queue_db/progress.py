@@ -0,0 +1,25 @@
+"""
+Contains a progress intermediate table with the intermediate results
+of the check of the student's homework/laboratory work
+"""
+from sqlalchemy import JSON, BigInteger
+from sqlalchemy.orm import mapped_column, Mapped
+from database.queue_db.database import Base
+
+
+class Progress(Base):
+    """
+    :param telegram_id: user Telegram ID, eg message.from_user.id
+    :param chat_id: chat ID, eg message.chat.id
+    :param data: results of the tasks tested so far
+    """
+    __tablename__ = "progress"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    telegram_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    chat_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    data: Mapped[str] = mapped_column(JSON, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"Q(progress) [ID: {self.id}, TG: {self.telegram_id}, " \
+             f"chat: {self.chat_id}, \ndata: {self.data}\n]"
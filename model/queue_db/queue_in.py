@@ -2,7 +2,8 @@
 Contains an input intermediate table with data 
 for the incoming data (homework/lab) from the student
 """
-from sqlalchemy import JSON, BigInteger
+from datetime import datetime
+from sqlalchemy import JSON, BigInteger, DateTime, Integer, String
 from sqlalchemy.orm import mapped_column, Mapped
 from database.queue_db.database import Base
 
@@ -12,6 +13,10 @@ class QueueIn(Base):
     :param telegram_id: user Telegram ID, eg message.from_user.id
     :param chat_id: chat ID, eg message.chat.id
     :param data: student answers
+    :param node_id: ID of the checker node that took the record,
+        None IF the record is waiting for the check
+    :param claimed_at: time when the record was taken
+    :param attempts: number of the failed checks of the record
     """
     __tablename__ = "input"
 
@@ -19,6 +24,9 @@ class QueueIn(Base):
     telegram_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
     chat_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
     data: Mapped[str] = mapped_column(JSON, nullable=False)
+    node_id: Mapped[str | None] = mapped_column(String(255), index=True)
+    claimed_at: Mapped[datetime | None] = mapped_column(DateTime)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
 
     def __repr__(self) -> str:
         return f"Q(input) [ID: {self.id}, TG: {self.telegram_id}, " \
@@ -24,3 +24,5 @@ import mrhomebot.admin_handlers.download_full_report as download_full_report
 import mrhomebot.admin_handlers.download_short_report as download_short_report
 import mrhomebot.admin_handlers.download_finish_report as download_finish_report
 import mrhomebot.admin_handlers.common_download_report_callback as common_download_report_callback
+import mrhomebot.admin_handlers.checker_fleet as checker_fleet
+import mrhomebot.admin_handlers.slow_tests as slow_tests
@@ -22,6 +22,7 @@ from mrhomebot.admin_handlers.upload_start_configuration \
 from mrhomebot.admin_handlers.download_all_test_and_answer \
     import _handle_download_all_test_and_answer
 from mrhomebot.admin_handlers.reset_teacher_mode import __handle_reset
+from mrhomebot.admin_handlers.checker_fleet import _handle_checker_fleet
 from mrhomebot.teacher_handlers.teacher_menu import create_teacher_keyboard
 
 
@@ -58,6 +59,8 @@ class AdminCommand(Enum):
     DOWNLOAD_ALL_ANSWER_WITH_TEST = auto()
     SWITCH_TO_TEACHER = auto()
     RESET = auto()
+    CHECKER_FLEET = auto()
+    SLOW_TESTS = auto()
 
 
 __admin_commands = {
@@ -83,7 +86,9 @@ __admin_commands = {
     AdminCommand.DOWNLOAD_SHORT_REPORT: "Краткий отчёт",
     AdminCommand.DOWNLOAD_FINISH_REPORT: "Итоговый отчёт",
     AdminCommand.SWITCH_TO_TEACHER: "\U0001F468\U0000200D\U0001F3EB",
-    AdminCommand.RESET: "Сброс ошибки"
+    AdminCommand.RESET: "Сброс ошибки",
+    AdminCommand.CHECKER_FLEET: "Узлы проверки",
+    AdminCommand.SLOW_TESTS: "Медленные тесты"
 }
 
 
@@ -168,6 +173,10 @@ async def third_admin_keyboard(message: Message | None = None) -> ReplyKeyboardM
         KeyboardButton(__admin_commands[AdminCommand.UPLOAD_TESTS]),
         KeyboardButton(__admin_commands[AdminCommand.UPLOAD_CONFIGURATION])
     )
+    markup.add(
+        KeyboardButton(__admin_commands[AdminCommand.CHECKER_FLEET]),
+        KeyboardButton(__admin_commands[AdminCommand.SLOW_TESTS])
+    )
     markup.add(
         KeyboardButton(__admin_commands[AdminCommand.BACK])
     )
@@ -300,3 +309,7 @@ async def handle_commands(message: Message):
             await _handle_download_all_test_and_answer(message)
         case AdminCommand.RESET:
             await __handle_reset(message)
+        case AdminCommand.CHECKER_FLEET:
+            await _handle_checker_fleet(message)
+        case AdminCommand.SLOW_TESTS:
+            await create_discipline_button(message, "slowTests")
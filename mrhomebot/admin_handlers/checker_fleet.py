@@ -0,0 +1,55 @@
+"""
+Contains the necessary functionality to display the status
+of the checker fleet: the registered checker nodes and the queue
+"""
+from telebot.types import Message
+from database.queue_db import checker_node_crud, queue_in_crud
+from mrhomebot.configuration import bot
+
+
+@bot.message_handler(is_admin=True, commands=["fleet"])
+async def handle_checker_fleet(message: Message):
+    """
+    Call the next level function for further processing
+    if the command received from the user is "checker fleet status"
+    and if this user is an administrator.
+
+    :param message: the object containing information about
+        an incoming message from the user.
+    """
+    await _handle_checker_fleet(message)
+
+@bot.message_handler(is_admin=False, commands=["fleet"])
+async def handle_no_checker_fleet(message: Message):
+    """
+    Deny the user his request, since (based on the verification results)
+    he is not an administrator and is prohibited from using this functionality.
+
+    :param message: the object containing information about
+        an incoming message from the user.
+    """
+    await bot.send_message(message.chat.id, "Нет прав доступа!!!")
+
+async def _handle_checker_fleet(message: Message):
+    """
+    Send the list of checker nodes with their capacity, running jobs
+    and the time since their last heartbeat (by the clock
+    of the queue database), and the queue length.
+
+    :param message: the object containing information about
+        an incoming message from the user.
+    """
+    nodes = await checker_node_crud.get_heartbeat_ages()
+    queue_length = await queue_in_crud.get_queue_length()
+    text = f"Ожидают проверки: {queue_length}\n"
+    if not nodes:
+        text += "Нет активных узлов проверки"
+    else:
+        text += f"Узлы проверки ({len(nodes)}), " \
+            f"заданий в работе {sum(it.running for it, _ in nodes)} " \
+            f"из {sum(it.capacity for it, _ in nodes)}:\n"
+        for node, age in nodes:
+            seconds = int(age)
+            text += f"{node.id}: {node.running}/{node.capacity}, " \
+                f"отклик {seconds} с. назад\n"
+    await bot.send_message(message.chat.id, text)
@@ -0,0 +1,67 @@
+"""
+Contains the necessary functionality to display the tests
+of the labs of a discipline that take the most time to run
+"""
+from telebot.types import Message, CallbackQuery
+from telebot.util import smart_split
+from database.main_db import common_crud
+from mrhomebot.admin_handlers.utils import create_discipline_button
+from mrhomebot.configuration import bot
+
+
+@bot.message_handler(is_admin=True, commands=["slowtests"])
+async def handle_slow_tests(message: Message):
+    """
+    Call the next level function for further processing
+    if the command received from the user is "slow tests"
+    and if this user is an administrator.
+
+    :param message: the object containing information about
+        an incoming message from the user.
+    """
+    await create_discipline_button(message, "slowTests")
+
+@bot.message_handler(is_admin=False, commands=["slowtests"])
+async def handle_no_slow_tests(message: Message):
+    """
+    Deny the user his request, since (based on the verification results)
+    he is not an administrator and is prohibited from using this functionality.
+
+    :param message: the object containing information about
+        an incoming message from the user.
+    """
+    await bot.send_message(message.chat.id, "Нет прав доступа!!!")
+
+@bot.callback_query_handler(
+    func=lambda call: call.data.startswith("slowTests_")
+)
+async def callback_slow_tests(call: CallbackQuery):
+    """
+    Send the slowest tests of each lab of the chosen discipline
+    by their average duration. The list longer than the message
+    length limit of Telegram is split into several messages.
+
+    :param call: an object that extends the standard message.
+        contains the discipline identifier
+    """
+    discipline_id = int(call.data.split("_")[1])
+    labs = await common_crud.get_slowest_tests(discipline_id)
+    if not labs:
+        text = "Нет данных о времени выполнения тестов"
+    else:
+        text = "Самые долгие тесты (среднее / максимум, запусков):\n"
+        for lab_number, tests in labs.items():
+            text += f"\nЛабораторная работа {lab_number}:\n"
+            for it in tests:
+                task = "" if it.task_id is None else f" (задание {it.task_id})"
+                text += f"{it.test_name}{task}: " \
+                    f"{it.total_duration / it.runs:.2f} / " \
+                    f"{it.max_duration:.2f} с, {it.runs}\n"
+    first, *rest = smart_split(text)
+    await bot.edit_message_text(
+        first,
+        call.message.chat.id,
+        call.message.id
+    )
+    for it in rest:
+        await bot.send_message(call.message.chat.id, it)
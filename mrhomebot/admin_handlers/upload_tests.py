@@ -2,6 +2,7 @@
 Module for processing the administrator command 
 to load tests for the selected discipline
 """
+import asyncio
 from telebot.asyncio_handler_backends import StatesGroup, State
 from telebot.types import Message, CallbackQuery, InlineKeyboardButton,\
     InlineKeyboardMarkup
@@ -9,7 +10,8 @@ from database.main_db import admin_crud
 from mrhomebot.admin_handlers.utils import start_upload_file_message,\
     finish_upload_file_message
 from mrhomebot.configuration import bot
-from utils.unzip_test_files import save_test_files
+from testing_tools.checker.docker_builder import prewarm_lab_images
+from utils.unzip_test_files import TestArchiveException, save_test_files
 
 
 class AdminState(StatesGroup):
@@ -20,6 +22,9 @@ class AdminState(StatesGroup):
     upload_test = State()
 
 
+_background_tasks: set[asyncio.Task] = set()
+
+
 @bot.message_handler(is_admin=True, commands=["uptest"])
 async def handle_upload_tests(message: Message):
     """
@@ -123,12 +128,31 @@ async def handle_upload_zip_tests(message: Message):
         file_info = await bot.get_file(message.document.file_id)
         downloaded_file = await bot.download_file(file_info.file_path)
         discipline = await admin_crud.get_discipline(discipline_id)
-        await save_test_files(discipline.path_to_test, downloaded_file)
+        try:
+            changed_labs = await save_test_files(
+                discipline.path_to_test,
+                downloaded_file
+            )
+        except TestArchiveException as ex:
+            await finish_upload_file_message(
+                message,
+                result_message,
+                f'<i>Тесты не загружены: {ex}</i>'
+            )
+            return
         await finish_upload_file_message(
             message,
             result_message,
             f'<i>Тесты по дисциплине "{discipline.short_name}" загружены!</i>'
         )
+        # образы для изменённых работ собираются в фоне,
+        # до того как студенты начнут присылать ответы
+        task = asyncio.create_task(prewarm_lab_images(
+            discipline.path_to_test,
+            [it.settings for it in changed_labs]
+        ))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
         await bot.delete_state(
             message.from_user.id,
             message.chat.id
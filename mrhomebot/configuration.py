@@ -42,11 +42,12 @@ def my_str_to_bool(value: str) -> bool:
         raise ValueError('Правильно заполните .env')
 
 
+# the deferred uploads do not count towards the upload limit
+flood_middleware: StudentFloodMiddleware | None = None
 if my_str_to_bool(os.getenv("FLOOD_MIDDLEWARE")):
-    bot.setup_middleware((
-        StudentFloodMiddleware(
-            bot,
-            int(os.getenv("STUDENT_UPLOAD_LIMIT")),
-            int(os.getenv("STUDENT_COMMAND_LIMIT"))
-        )
-    ))
+    flood_middleware = StudentFloodMiddleware(
+        bot,
+        int(os.getenv("STUDENT_UPLOAD_LIMIT")),
+        int(os.getenv("STUDENT_COMMAND_LIMIT"))
+    )
+    bot.setup_middleware(flood_middleware)
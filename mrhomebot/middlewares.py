@@ -77,6 +77,15 @@ class StudentFloodMiddleware(BaseMiddleware):
         self.commands_limit = commands_limit * 60
         self.update_types = ['message']
 
+    def forget_upload(self, user_id: int) -> None:
+        """
+        Let the student upload the answers again without waiting
+        for the limit, eg IF the upload was not admitted to the queue.
+
+        :param user_id: student Telegram ID
+        """
+        self.last_answer_time.pop(user_id, None)
+
     async def pre_process(self, message: Message, data):
         """
         Before servicing a user, check whether enough time has passed since 
@@ -1,12 +1,17 @@
 """Student Command Processing Module for loading answers from a student"""
+import time
+from datetime import datetime
 from telebot.asyncio_handler_backends import State, StatesGroup
 from telebot.types import CallbackQuery, Message, InlineKeyboardButton,\
     InlineKeyboardMarkup
 from database.main_db import common_crud
-from database.queue_db import queue_in_crud
 from model.pydantic.queue_in_raw import QueueInRaw
-from mrhomebot.configuration import bot
+from mrhomebot.configuration import bot, flood_middleware
+from testing_tools.answer.admission import add_admitted_record,\
+    check_admission, check_cpu_budget
+from testing_tools.answer.queue_status import get_queue_statuses
 from utils.check_exist_test_folder import is_test_folder_exist
+from utils.tracing import new_trace_id, record_span
 from utils.unzip_homework_files import save_homework_file
 
 
@@ -134,6 +139,10 @@ async def handle_student_docs(message: Message):
         it is an archive with ready-made responses from a student, 
         which further require separate verification.
     """
+    trace_id = new_trace_id()
+    upload_start = time.time()
+    # the deadline is checked against the time the student sent the answers
+    upload_time = datetime.fromtimestamp(message.date)
     result_message = await bot.send_message(
         message.chat.id,
         "<i>Загружаем ваш файл</i>",
@@ -147,6 +156,20 @@ async def handle_student_docs(message: Message):
         lab_num = data["labNumber"]
         discipline_id = data["discipline_id"]
 
+    refusal = await check_cpu_budget(message.from_user.id) or \
+        await check_admission(message.from_user.id, discipline_id)
+    if refusal is not None:
+        await bot.edit_message_text(
+            text=refusal,
+            chat_id=message.chat.id,
+            message_id=result_message.id,
+            parse_mode='HTML'
+        )
+        if flood_middleware is not None:
+            flood_middleware.forget_upload(message.from_user.id)
+        await bot.delete_state(message.from_user.id, message.chat.id)
+        return
+
     discipline = await common_crud.get_discipline(discipline_id)
 
     file_name = message.document.file_name
@@ -171,18 +194,50 @@ async def handle_student_docs(message: Message):
             discipline.path_to_answer
         )
 
-        await queue_in_crud.add_record(
+        # the message shows the position in the queue
+        # and is updated as the tests of the tasks are completed
+        progress_message = await bot.send_message(
+            message.chat.id,
+            "<i>Задания отправлены на проверку</i>",
+            parse_mode='HTML'
+        )
+
+        # the queue may have filled up while the answers were downloaded
+        refusal = await add_admitted_record(
             message.from_user.id,
             message.chat.id,
             QueueInRaw(
                 discipline_id=discipline_id,
                 lab_number=lab_num,
-                files_path=filelist
+                files_path=filelist,
+                progress_message_id=progress_message.id,
+                trace_id=trace_id,
+                upload_time=upload_time
             )
         )
-
-        await bot.send_message(message.chat.id,
-                               "Задания отправлены на проверку")
+        if refusal is not None:
+            await bot.delete_message(message.chat.id, progress_message.id)
+            await bot.edit_message_text(
+                text=refusal,
+                chat_id=message.chat.id,
+                message_id=result_message.id,
+                parse_mode='HTML'
+            )
+            if flood_middleware is not None:
+                flood_middleware.forget_upload(message.from_user.id)
+            await bot.delete_state(message.from_user.id, message.chat.id)
+            return
+        record_span(trace_id, 'bot', 'upload', upload_start, time.time())
+        status = (await get_queue_statuses()).get(
+            (message.chat.id, progress_message.id)
+        )
+        if status is not None:
+            await bot.edit_message_text(
+                status,
+                message.chat.id,
+                progress_message.id,
+                parse_mode='HTML'
+            )
 
     else:
         await bot.reply_to(message, "Неверный тип файла")
@@ -6,3 +6,4 @@ import mrhomebot.teacher_handlers.teacher_menu as teacher_menu
 from mrhomebot.teacher_handlers.teacher_menu import create_teacher_keyboard
 import mrhomebot.teacher_handlers.download_answers as download_answers
 import mrhomebot.teacher_handlers.interactive_report as interactive_report
+import mrhomebot.teacher_handlers.cpu_usage as cpu_usage
@@ -0,0 +1,38 @@
+"""
+A module for processing teacher commands, in this case,
+displaying the students whose checks used the most CPU time
+in a discipline during the current budget period.
+"""
+from datetime import datetime
+from telebot.types import CallbackQuery
+from database.main_db import common_crud
+from mrhomebot.configuration import bot
+from testing_tools.answer.admission import get_budget_period
+
+
+@bot.callback_query_handler(
+    func=lambda call: call.data.startswith("cpuUsage_")
+)
+async def callback_cpu_usage(call: CallbackQuery):
+    """
+    Send the students of the chosen discipline whose checks
+    used the most CPU time since the start of the budget period.
+
+    :param call: an object that extends the standard message.
+        contains the discipline identifier
+    """
+    discipline_id = int(call.data.split("_")[1])
+    start, _ = get_budget_period(datetime.now().date())
+    students = await common_crud.get_top_cpu_consumers(discipline_id, start)
+    if not students:
+        text = "Нет данных о процессорном времени проверок"
+    else:
+        text = f"Процессорное время проверок с {start:%d.%m.%Y} " \
+            "(минут, проверок):\n"
+        for student, checks, cpu_time in students:
+            text += f"{student.full_name}: {cpu_time / 60:.1f}, {checks}\n"
+    await bot.edit_message_text(
+        text,
+        call.message.chat.id,
+        call.message.id
+    )
@@ -27,6 +27,7 @@ class TeacherCommand(Enum):
     DOWNLOAD_FINISH_REPORT = auto()
     DOWNLOAD_ANSWER = auto()
     INTERACTIVE_REPORT = auto()
+    CPU_USAGE = auto()
     SWITCH_TO_ADMIN = auto()
     RESET = auto()
 
@@ -36,6 +37,7 @@ __teacher_commands = {
     TeacherCommand.UNBAN_STUDENT: "Разбанить",
     TeacherCommand.DOWNLOAD_ANSWER: "Скачать ответы",
     TeacherCommand.INTERACTIVE_REPORT: "Интерактивный отчёт",
+    TeacherCommand.CPU_USAGE: "Нагрузка проверок",
     TeacherCommand.DOWNLOAD_FULL_REPORT: "Полный отчёт",
     TeacherCommand.DOWNLOAD_SHORT_REPORT: "Короткий отчёт",
     TeacherCommand.DOWNLOAD_FINISH_REPORT: "Итоговый отчёт",
@@ -66,7 +68,8 @@ async def create_teacher_keyboard(
         KeyboardButton(__teacher_commands[TeacherCommand.DOWNLOAD_SHORT_REPORT])
     )
     markup.add(
-        KeyboardButton(__teacher_commands[TeacherCommand.INTERACTIVE_REPORT])
+        KeyboardButton(__teacher_commands[TeacherCommand.INTERACTIVE_REPORT]),
+        KeyboardButton(__teacher_commands[TeacherCommand.CPU_USAGE])
     )
     footer_buttons = [
         KeyboardButton(__teacher_commands[TeacherCommand.BAN_STUDENT]),
@@ -153,5 +156,7 @@ async def handle_commands(message: Message):
             await create_teacher_groups_button(message, 'interactiveGrRep')
         case TeacherCommand.DOWNLOAD_ANSWER:
             await create_teacher_discipline_button(message, 'dowTAnswersDis')
+        case TeacherCommand.CPU_USAGE:
+            await create_teacher_discipline_button(message, 'cpuUsage')
         case TeacherCommand.RESET:
             await handle_reset_with_teacher(message)
@@ -1,5 +1,9 @@
 """
-Module for launching the response verification subsystem in a separate process
+Module for launching the response verification subsystem in a separate process.
+IF the CHECKER_PROCESSES environment variable is greater than 1,
+the checker runs in several worker processes under a supervisor.
+On SIGTERM the checker finishes the jobs being checked
+(see CHECKER_DRAIN_TIMEOUT) and returns the rest to the queue.
 Example:
     $ python run_test_checker.py
 """
@@ -8,6 +12,7 @@ import os
 from pathlib import Path
 from sys import platform
 from dotenv import load_dotenv
+from testing_tools.checker.supervisor import CheckerSupervisor
 from testing_tools.checker.task_processing import TaskProcessing
 from utils.init_app import init_app
 
@@ -23,5 +28,11 @@ if __name__ == "__main__":
         temp_path = Path.cwd()
         temp_path = Path(temp_path.joinpath(os.getenv("TEMP_REPORT_DIR")))
         dockers_run = int(os.getenv("AMOUNT_DOKER_RUN"))
+        processes = int(os.getenv("CHECKER_PROCESSES", "1"))
 
-        asyncio.run(TaskProcessing(temp_path, dockers_run).run())
+        if processes > 1:
+            CheckerSupervisor(temp_path, dockers_run, processes).run()
+        else:
+            asyncio.run(
+                TaskProcessing(temp_path, dockers_run, handle_sigterm=True).run()
+            )
@@ -0,0 +1,47 @@
+"""
+Module for reconstructing the latency of the submissions
+from the trace sinks (TRACE_FILE) of the bot and the checkers:
+the breakdown of one submission by its trace ID,
+or the percentiles of the spans over all submissions.
+Example:
+    $ python run_trace_report.py traces.jsonl
+    $ python run_trace_report.py traces.jsonl checker-2/traces.jsonl
+    $ python run_trace_report.py traces.jsonl --trace 3f2a...
+"""
+import argparse
+from pathlib import Path
+from utils.tracing import aggregate, get_breakdown, load_spans
+
+
+def main():
+    """Print the latency breakdown or the percentiles of the spans"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('files', nargs='+', type=Path,
+                        help='trace sinks (JSONL)')
+    parser.add_argument('--trace', help='trace ID of the submission')
+    args = parser.parse_args()
+
+    traces = load_spans(args.files)
+    if args.trace is not None:
+        spans = traces.get(args.trace)
+        if not spans:
+            print(f"Трасса {args.trace} не найдена")
+            return
+        start = spans[0]['start']
+        for it in spans:
+            print(f"{it['start'] - start:9.3f} {it['end'] - it['start']:9.3f} "
+                  f"{it['component']:8} {it['span']}")
+        for name, duration in get_breakdown(spans).items():
+            print(f"{name:24} {duration:9.3f}")
+        return
+
+    stats = aggregate([get_breakdown(it) for it in traces.values()])
+    print(f"Отправок: {len(traces)}")
+    print(f"{'span':24} {'count':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for name, it in sorted(stats.items()):
+        print(f"{name:24} {it['count']:6} {it['p50']:9.3f} {it['p95']:9.3f} "
+              f"{it['p99']:9.3f} {it['max']:9.3f}")
+
+
+if __name__ == "__main__":
+    main()
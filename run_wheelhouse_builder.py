@@ -0,0 +1,35 @@
+"""
+Module for filling the wheelhouse (WHEELHOUSE_DIR) with the wheels
+of the dependencies of all labs, declared in the uploaded tests.
+Run it on a host with network access after uploading tests
+with new dependencies, after which the checker images are built offline.
+Example:
+    $ python run_wheelhouse_builder.py
+"""
+import asyncio
+from dotenv import load_dotenv
+from database.main_db import admin_crud
+from testing_tools.checker.docker_api import docker_api
+from testing_tools.checker.docker_builder import populate_wheelhouse
+from utils.test_manifest import get_manifest
+
+
+async def main():
+    """
+    Collect the union of the dependencies of all labs
+    and download their wheels into the wheelhouse.
+    """
+    dependencies: set[str] = set()
+    for discipline in await admin_crud.get_all_disciplines():
+        manifest = get_manifest(discipline.path_to_test)
+        for lab in manifest.labs.values():
+            dependencies.update(lab.settings.dependencies or [])
+    try:
+        await populate_wheelhouse(sorted(dependencies))
+    finally:
+        await docker_api.close()
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    asyncio.run(main())
@@ -0,0 +1,244 @@
+"""
+This module contains the admission control of the answers uploaded
+by the students: IF the queue of the checks is longer than allowed
+(in total, for the student or for the discipline) or the student
+has used up the CPU time budget of the checks, the upload
+is deferred, and the student is told when to send the answers again.
+"""
+import json
+import math
+import os
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from database.main_db import common_crud
+from database.queue_db import queue_in_crud
+from model.pydantic.queue_in_raw import QueueInRaw
+from model.queue_db.queue_in import QueueIn
+from testing_tools.answer.queue_status import estimate_wait, get_live_nodes
+
+
+# retry time (sec) suggested when it can not be estimated
+DEFAULT_RETRY_TIME = 5 * 60
+
+
+@dataclass
+class AdmissionLimits:
+    """
+    Limits of the queue of the checks, 0 - unlimited
+
+    :param max_depth: number of records in the queue
+    :param max_per_student: number of records of one student
+    :param discipline_quota: number of records of one discipline
+    :param discipline_quotas: discipline ID: its own quota
+    """
+    max_depth: int = 0
+    max_per_student: int = 0
+    discipline_quota: int = 0
+    discipline_quotas: dict[int, int] = field(default_factory=dict)
+
+    def get_discipline_quota(self, discipline_id: int) -> int:
+        """
+        :param discipline_id: discipline ID
+
+        :return int: quota of the discipline, 0 - unlimited
+        """
+        return self.discipline_quotas.get(discipline_id, self.discipline_quota)
+
+    def is_limited(self) -> bool:
+        """
+        :return bool: True IF any limit is set
+        """
+        return bool(self.max_depth or self.max_per_student or
+                    self.discipline_quota or self.discipline_quotas)
+
+
+def get_admission_limits() -> AdmissionLimits:
+    """
+    Read the limits from the QUEUE_MAX_DEPTH, QUEUE_MAX_PER_STUDENT
+    and QUEUE_DISCIPLINE_QUOTA environment variables. The quota is a number
+    for all disciplines and/or "discipline_id:number" pairs, eg "20,3:50".
+
+    :param None:
+
+    :return AdmissionLimits: limits
+    """
+    limits = AdmissionLimits(
+        max_depth=int(os.getenv("QUEUE_MAX_DEPTH", "0")),
+        max_per_student=int(os.getenv("QUEUE_MAX_PER_STUDENT", "0"))
+    )
+    value = os.getenv("QUEUE_DISCIPLINE_QUOTA")
+    if value:
+        for it in value.split(','):
+            if ':' in it:
+                discipline_id, amount = it.split(':')
+                limits.discipline_quotas[int(discipline_id)] = int(amount)
+            else:
+                limits.discipline_quota = int(it)
+    return limits
+
+
+def find_blocking_record(queue: list[tuple[int, int]],
+                         student_id: int,
+                         discipline_id: int,
+                         limits: AdmissionLimits) -> tuple[int, str] | None:
+    """
+    Check whether a new record can be added to the queue.
+
+    :param queue: student Telegram ID and discipline ID
+        of the records in the order of the queue
+    :param student_id: Telegram ID of the student uploading the answers
+    :param discipline_id: discipline of the answers
+    :param limits: limits of the queue
+
+    :return tuple[int, str] | None: None IF the record is admitted,
+        otherwise the position in the queue (starting from 1) of the last
+        record that has to be checked before the record is admitted,
+        and the reason of the refusal
+    """
+    checks = [
+        (limits.max_depth,
+         list(range(1, len(queue) + 1)),
+         'в очереди слишком много заданий'),
+        (limits.max_per_student,
+         [i for i, it in enumerate(queue, 1) if it[0] == student_id],
+         'ваши предыдущие задания ещё не проверены'),
+        (limits.get_discipline_quota(discipline_id),
+         [i for i, it in enumerate(queue, 1) if it[1] == discipline_id],
+         'в очереди слишком много заданий по дисциплине'),
+    ]
+    result = None
+    for limit, positions, reason in checks:
+        if not limit or len(positions) < limit:
+            continue
+        position = positions[len(positions) - limit]
+        if result is None or position > result[0]:
+            result = (position, reason)
+    return result
+
+
+def _get_queue(records: list[QueueIn]) -> list[tuple[int, int]]:
+    """
+    :param records: records of the input table in the order of the queue
+
+    :return list[tuple[int, int]]: student Telegram ID and discipline ID
+        of the records (see find_blocking_record)
+    """
+    queue = []
+    for it in records:
+        data = QueueInRaw(**json.loads(it.data))
+        queue.append((it.telegram_id, data.discipline_id))
+    return queue
+
+
+async def _get_refusal(blocking: tuple[int, str]) -> str:
+    """
+    :param blocking: position of the blocking record and the reason
+        of the refusal (see find_blocking_record)
+
+    :return str: text of the refusal with the retry time
+    """
+    position, reason = blocking
+    wait = estimate_wait(position, await get_live_nodes())
+    if wait is None:
+        wait = DEFAULT_RETRY_TIME
+    return f'<i>Задания не приняты: {reason}.</i>\n' \
+        f'Отправьте ответы повторно через {math.ceil(wait / 60)} мин.'
+
+
+async def check_admission(student_id: int, discipline_id: int) -> str | None:
+    """
+    Check whether the answers of the student can be added to the queue,
+    before they are downloaded. The answers are admitted finally
+    when they are added (see add_admitted_record).
+
+    :param student_id: Telegram ID of the student
+    :param discipline_id: discipline of the answers
+
+    :return str | None: None IF the answers are admitted,
+        otherwise the text of the refusal with the retry time
+    """
+    limits = get_admission_limits()
+    if not limits.is_limited():
+        return None
+    queue = _get_queue(await queue_in_crud.get_all_records())
+    blocking = find_blocking_record(queue, student_id, discipline_id, limits)
+    if blocking is None:
+        return None
+    return await _get_refusal(blocking)
+
+
+async def add_admitted_record(student_id: int,
+                              chat_id: int,
+                              data: QueueInRaw) -> str | None:
+    """
+    Add the answers of the student to the queue IF they are admitted.
+    The queue is checked and the record is added in one transaction,
+    so the concurrent uploads can not exceed the limits.
+
+    :param student_id: Telegram ID of the student
+    :param chat_id: chat ID
+    :param data: record of the answers
+
+    :return str | None: None IF the answers are added,
+        otherwise the text of the refusal with the retry time
+    """
+    limits = get_admission_limits()
+    if not limits.is_limited():
+        await queue_in_crud.add_record(student_id, chat_id, data)
+        return None
+    blocking = None
+
+    def admit(records: list[QueueIn]) -> bool:
+        nonlocal blocking
+        blocking = find_blocking_record(
+            _get_queue(records),
+            student_id,
+            data.discipline_id,
+            limits
+        )
+        return blocking is None
+
+    if await queue_in_crud.add_record(student_id, chat_id, data, admit):
+        return None
+    return await _get_refusal(blocking)
+
+
+def get_budget_period(today: date) -> tuple[date, date]:
+    """
+    Get the period of the CPU time budget of the students,
+    a day or a week (from Monday) set by the STUDENT_CPU_BUDGET_PERIOD
+    environment variable.
+
+    :param today: current day
+
+    :return tuple[date, date]: first day of the period
+        and first day of the next one
+    """
+    if os.getenv("STUDENT_CPU_BUDGET_PERIOD", "day") == 'week':
+        start = today - timedelta(days=today.weekday())
+        return start, start + timedelta(days=7)
+    return today, today + timedelta(days=1)
+
+
+async def check_cpu_budget(student_id: int) -> str | None:
+    """
+    Check whether the student has CPU time left for the checks
+    in the current period. The budget (sec) is set by the
+    STUDENT_CPU_BUDGET environment variable, 0 - unlimited.
+
+    :param student_id: Telegram ID of the student
+
+    :return str | None: None IF the answers are admitted,
+        otherwise the text of the refusal with the retry time
+    """
+    budget = float(os.getenv("STUDENT_CPU_BUDGET", "0"))
+    if budget <= 0:
+        return None
+    start, end = get_budget_period(datetime.now().date())
+    used = await common_crud.get_cpu_usage(student_id, start)
+    if used < budget:
+        return None
+    return f'<i>Задания не приняты: проверки ваших ответов израсходовали ' \
+        f'лимит процессорного времени ({used / 60:.0f} из ' \
+        f'{budget / 60:.0f} мин.).</i>\n' \
+        f'Отправьте ответы повторно начиная с {end:%d.%m.%Y}'
@@ -4,11 +4,22 @@ to the user about completed/uncompleted work on his homework.
 """
 import asyncio
 import json
+import os
+import time
 from telebot.async_telebot import AsyncTeleBot
-from database.queue_db import queue_out_crud, rejected_crud
-from model.pydantic.queue_out_raw import TestResult
+from telebot.asyncio_helper import ApiTelegramException
+from database.queue_db import progress_crud, queue_out_crud, rejected_crud
+from model.pydantic.queue_out_raw import TestProgress, TestResult
 from model.pydantic.test_rejected_files import TestRejectedFiles
+from model.queue_db.progress import Progress
 from model.queue_db.queue_out import QueueOut
+from testing_tools.answer.queue_status import get_queue_statuses
+from utils.tracing import span
+
+
+# maximum number of the queue messages updated at a time,
+# so that the bot does not exceed the Telegram limits
+MAX_QUEUE_UPDATES = 20
 
 
 def _get_lab_number(name: str) -> int:
@@ -36,9 +47,19 @@ class AnswerProcessing:
         :param bot: link to bot instance
         :param amount_answer_process: number of records processed at a time.
             If set to None - everything is scraped from the DB table
+
+        The messages about the answers waiting in the queue are updated
+        with their position and estimated time every QUEUE_STATUS_INTERVAL
+        seconds (0 - not updated).
         """
         self.slice_size = amount_answer_process
         self.bot = bot
+        self.queue_status_interval = int(
+            os.getenv("QUEUE_STATUS_INTERVAL", "15")
+        )
+        self.queue_status_time = 0.0
+        # last texts of the queue messages: (chat ID, message ID): text
+        self.queue_statuses: dict[tuple[int, int], str] = {}
 
     async def run(self):
         """
@@ -49,6 +70,14 @@ class AnswerProcessing:
         """
         while True:
             await asyncio.sleep(2)
+            if self.queue_status_interval and time.monotonic() - \
+                    self.queue_status_time >= self.queue_status_interval:
+                self.queue_status_time = time.monotonic()
+                await self.__processing_queue()
+            if await progress_crud.is_not_empty():
+                await self.__processing_progress(
+                    await progress_crud.get_all_records()
+                )
             if await queue_out_crud.is_not_empty():
                 records = await queue_out_crud.get_all_records()
                 if self.slice_size is not None:
@@ -68,6 +97,76 @@ class AnswerProcessing:
                     parse_mode='HTML'
                 )
 
+    async def __processing_queue(self) -> None:
+        """
+        Update the messages about the answers waiting in the queue
+        with their position and estimated time, IF they have changed.
+        The messages closer to the head of the queue are updated first.
+
+        :return None:
+        """
+        statuses = await get_queue_statuses()
+        updates = 0
+        for key, text in statuses.items():
+            if self.queue_statuses.get(key) == text:
+                continue
+            if updates == MAX_QUEUE_UPDATES:
+                break
+            updates += 1
+            try:
+                await self.bot.edit_message_text(
+                    text,
+                    key[0],
+                    key[1],
+                    parse_mode='HTML'
+                )
+            except ApiTelegramException:
+                # the message was deleted or has not changed
+                pass
+            self.queue_statuses[key] = text
+        # the records taken by the checker are no longer tracked
+        self.queue_statuses = {
+            key: text for key, text in self.queue_statuses.items()
+            if key in statuses
+        }
+
+    async def __processing_progress(self, records: list[Progress]) -> None:
+        """
+        Update the messages about the progress of the checks
+        with the results of the tasks tested so far.
+        Only the latest record of each message is shown.
+
+        :param records: intermediate result records
+
+        :return None:
+        """
+        latest: dict[tuple[int, int], TestProgress] = {}
+        for record in records:
+            progress = TestProgress(**json.loads(record.data))
+            latest[(record.chat_id, progress.message_id)] = progress
+
+        for (chat_id, message_id), progress in latest.items():
+            text = '<i>Идёт проверка, готово заданий: ' \
+                f'{len(progress.successful_task) + len(progress.failed_task)}' \
+                '</i>\n'
+            for it in sorted(progress.successful_task,
+                             key=lambda x: _get_lab_number(x.file_name)):
+                text += f'<b>✅ {it.file_name}</b>\n'
+            for it in sorted(progress.failed_task,
+                             key=lambda x: _get_lab_number(x.file_name)):
+                text += f'<b>❌ {it.file_name}</b>\n'
+            try:
+                await self.bot.edit_message_text(
+                    text,
+                    chat_id,
+                    message_id,
+                    parse_mode='HTML'
+                )
+            except ApiTelegramException:
+                # the message was deleted or has not changed
+                pass
+        await progress_crud.delete_records([it.id for it in records])
+
     async def __processing_records(self, records: list[QueueOut]) -> None:
         """
         Prepare and submit a response based on the results 
@@ -89,9 +188,10 @@ class AnswerProcessing:
                 text += f'<b>✅ {it.file_name}</b>\n'
             for it in test_result.failed_task:
                 text += f'<b>❌ {it.file_name}</b> {it.description}\n'
-            await self.bot.send_message(
-                record.chat_id,
-                text=text,
-                parse_mode='HTML',
-            )
+            with span(test_result.trace_id, 'answer', 'deliver'):
+                await self.bot.send_message(
+                    record.chat_id,
+                    text=text,
+                    parse_mode='HTML',
+                )
             await queue_out_crud.delete_record(record.id)
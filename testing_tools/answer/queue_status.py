@@ -0,0 +1,88 @@
+"""
+This module estimates the position of the student's answers in the queue
+of the checks and the time left until their result, from the recent
+throughput and check durations reported by the checker nodes.
+"""
+import json
+import math
+import os
+from datetime import timedelta
+from database.queue_db import checker_node_crud, queue_in_crud
+from model.pydantic.queue_in_raw import QueueInRaw
+from model.queue_db.checker_node import CheckerNode
+
+
+def estimate_wait(position: int, nodes: list[CheckerNode]) -> float | None:
+    """
+    Estimate the time until the result of the record waiting in the queue.
+    The records ahead of it first take the free container slots,
+    the rest leave the queue at the recent throughput of the nodes
+    (or, IF nothing was checked recently, at the rate their slots allow).
+
+    :param position: position of the record in the queue, starting from 1
+    :param nodes: live checker nodes
+
+    :return float | None: time (sec), None IF it can not be estimated:
+        there are no nodes or they have not checked anything yet
+    """
+    times = [it.job_time for it in nodes if it.job_time is not None]
+    if not times:
+        return None
+    job_time = sum(times) / len(times)
+    free = sum(max(0, it.capacity - it.running) for it in nodes)
+    if position <= free:
+        return job_time
+    rate = sum(it.throughput for it in nodes)
+    if rate <= 0:
+        rate = sum(it.capacity for it in nodes) / job_time
+    return (position - free) / rate + job_time
+
+
+def format_queue_status(position: int, wait: float | None) -> str:
+    """
+    :param position: position of the record in the queue, starting from 1
+    :param wait: estimated time until the result (sec), None IF unknown
+
+    :return str: text of the message about the check of the answers
+    """
+    text = f'<i>Задания отправлены на проверку</i>\nМесто в очереди: {position}'
+    if wait is None:
+        return text
+    if wait < 60:
+        return text + '\nОжидаемое время проверки: меньше минуты'
+    return text + f'\nОжидаемое время проверки: ~{math.ceil(wait / 60)} мин.'
+
+
+async def get_live_nodes() -> list[CheckerNode]:
+    """
+    :param None:
+
+    :return list[CheckerNode]: checker nodes, except for the nodes
+        silent for 4 heartbeat intervals by the clock of the queue database
+    """
+    stale_time = timedelta(
+        seconds=4 * int(os.getenv("CHECKER_HEARTBEAT_INTERVAL", "15"))
+    )
+    return await checker_node_crud.get_live_nodes(stale_time)
+
+
+async def get_queue_statuses() -> dict[tuple[int, int], str]:
+    """
+    Make the texts of the messages about the check of the records
+    waiting in the queue.
+
+    :param None:
+
+    :return dict[tuple[int, int], str]: (chat ID, progress message ID):
+        text of the message, in the order of the queue
+    """
+    nodes = await get_live_nodes()
+    result = {}
+    records = await queue_in_crud.get_waiting_records()
+    for position, record in enumerate(records, 1):
+        data = QueueInRaw(**json.loads(record.data))
+        if data.progress_message_id is None:
+            continue
+        result[(record.chat_id, data.progress_message_id)] = \
+            format_queue_status(position, estimate_wait(position, nodes))
+    return result
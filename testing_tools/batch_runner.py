@@ -0,0 +1,251 @@
+"""
+The module is copied to the base image of the lab.
+Runs the tests of a batch of jobs of the same lab in one container,
+so that the container start and the import of pytest are paid once
+per batch. Each job is in its own subdirectory of the working directory
+(with the answers, tests and log_init.json), and its pytest session
+is run in a forked child, so that the modules and monkeypatches
+of a job do not get into the next one. Each child runs as its own user
+owning only the subdirectory of its job, so that the tests of a job
+can neither read nor change the answers and reports of the others:
+all subdirectories are closed before the first job, and the processes
+left running by the tests of a job are killed before the next one.
+The results of the tasks are written by the conftest of the tests
+to a pipe of the runner, which relays them to the stderr of the container,
+so that the output of the tests can not pass for them.
+The runner is the main process of the container: after each job it saves
+the report and the CPU time of the job to RESULT_DIR/<job subdirectory>,
+and after all jobs it waits for the verification subsystem to read
+the results and the CPU time of the container before the container stops.
+Usage:
+    python3 batch_runner.py
+"""
+import os
+import select
+import signal
+import sys
+import time
+import traceback
+from typing import Callable
+import pytest
+import conftest
+from logger.docker_logger import DockerLogger
+from logger.report_model import BATCH_JOB_PREFIX, CPU_TIME_FILE_NAME,\
+    DONE_FILE_NAME, JOBS_DONE_MARKER, RESULT_DIR, TASK_EVENT_FD_ENV
+
+
+# the user ID of a job is this number plus the index of the job
+JOB_UID_BASE = 20000
+# time (sec) the container is kept running after the results are saved,
+# IF the verification subsystem has not removed it
+RESULT_HOLD_TIME = 60
+
+
+def get_jobs() -> list[str]:
+    """
+    :return list[str]: subdirectories of the jobs of the batch
+    """
+    return sorted(
+        it for it in os.listdir('.')
+        if os.path.isfile(os.path.join(it, 'log_init.json'))
+    )
+
+
+def isolate_job(path: str, uid: int) -> None:
+    """
+    Give the job subdirectory to the user of the job
+    and close it to the other users.
+
+    :param path: absolute path to the job subdirectory
+    :param uid: user and group ID of the job
+    """
+    for directory, _, files in os.walk(path):
+        os.chown(directory, uid, uid)
+        for it in files:
+            os.chown(os.path.join(directory, it), uid, uid)
+    os.chmod(path, 0o700)
+
+
+def become_job_user(path: str, uid: int) -> None:
+    """
+    Switch the forked child to the user of the job,
+    with the job subdirectory as its home and temporary directory.
+
+    :param path: absolute path to the job subdirectory
+    :param uid: user and group ID of the job
+    """
+    os.chdir(path)
+    os.setgroups([])
+    os.setgid(uid)
+    os.setuid(uid)
+    os.environ['HOME'] = path
+    os.environ['TMPDIR'] = path
+
+
+def kill_job_processes(uid: int) -> None:
+    """
+    Kill the processes left running by the tests of the job,
+    so that they can not get to the files of the next jobs
+    or take their CPU time. A forked child switched to the user
+    of the job signals all processes it is allowed to, that is
+    the processes of the user except itself.
+
+    :param uid: user and group ID of the job
+    """
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            os.setgroups([])
+            os.setgid(uid)
+            os.setuid(uid)
+            os.kill(-1, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            os._exit(code)
+    os.waitpid(pid, 0)
+
+
+def relay(pid: int, handlers: dict[int, Callable[[bytes], None]]) -> float:
+    """
+    Pass the data of the pipes written by the forked child to their
+    handlers until the child exits, and close the pipes. The data
+    written by the descendants left running after the child is not waited for.
+
+    :param pid: PID of the child
+    :param handlers: read ends of the pipes and the handlers of their data
+
+    :return float: user and system CPU time (sec) of the child
+        and of its waited-for descendants
+    """
+    usage = None
+    open_fds = set(handlers)
+    while open_fds:
+        if usage is None:
+            waited, _, usage = os.wait4(pid, os.WNOHANG)
+            if not waited:
+                usage = None
+        # once the child has exited, only the data already in the pipes is read
+        ready, _, _ = select.select(
+            list(open_fds), [], [], 0.1 if usage is None else 0
+        )
+        for fd in ready:
+            data = os.read(fd, 65536)
+            if data:
+                handlers[fd](data)
+            else:
+                open_fds.discard(fd)
+        if usage is not None:
+            break
+    for fd in handlers:
+        os.close(fd)
+    if usage is None:
+        _, _, usage = os.wait4(pid, 0)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run_tests(root: str, job: str, uid: int) -> float:
+    """
+    Run the tests of the job in a separate pytest session
+    in a forked child, and wait for it.
+    The conftest of the image is passed as a plugin, since the rootdir
+    of the session is the job subdirectory. The stderr of the child
+    is its stdout, so that only the runner writes to the stderr
+    of the container: the name of the job, then the task results
+    from the pipe of the child.
+
+    :param root: working directory of the batch
+    :param job: job subdirectory
+    :param uid: user and group ID the tests of the job are run as,
+        the job subdirectory is already given to this user
+
+    :return float: user and system CPU time (sec) of the child
+        and of its waited-for descendants
+    """
+    path = os.path.join(root, job)
+    print(f'{BATCH_JOB_PREFIX}{job}', file=sys.stderr, flush=True)
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            os.close(read_end)
+            os.dup2(1, 2)
+            os.environ[TASK_EVENT_FD_ENV] = str(write_end)
+            become_job_user(path, uid)
+            DockerLogger.reset()
+            pytest.main(
+                ['--tb=no', '-p', 'no:cacheprovider',
+                 '--confcutdir', path, path],
+                plugins=[conftest]
+            )
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+    os.close(write_end)
+    line_end = True
+
+    def write_events(data: bytes) -> None:
+        nonlocal line_end
+        sys.stderr.buffer.write(data)
+        sys.stderr.buffer.flush()
+        line_end = data.endswith(b'\n')
+
+    cpu_time = relay(pid, {read_end: write_events})
+    kill_job_processes(uid)
+    if not line_end:
+        # the line cut off by the exit of the child
+        # does not join the next line of the runner
+        print(file=sys.stderr, flush=True)
+    return cpu_time
+
+
+def save_results(root: str, job: str, cpu_time: float) -> None:
+    """
+    Save the CPU time of the job, and its report IF its tests have been run.
+
+    :param root: working directory of the batch
+    :param job: job subdirectory
+    :param cpu_time: CPU time (sec) of the tests of the job
+    """
+    result_dir = os.path.join(RESULT_DIR, job)
+    os.makedirs(result_dir, exist_ok=True)
+    with open(os.path.join(result_dir, CPU_TIME_FILE_NAME), 'w') as file:
+        file.write(str(cpu_time))
+    os.chdir(os.path.join(root, job))
+    DockerLogger.reset()
+    logger = DockerLogger()
+    if os.path.isfile(logger.get_logfile_name()):
+        os.environ['RESULT_DIR'] = result_dir
+        logger.save_result()
+    os.chdir(root)
+
+
+def finish() -> None:
+    """
+    Mark the results as saved and keep the container running,
+    since the CPU time of a stopped container can not be read.
+    """
+    open(os.path.join(RESULT_DIR, DONE_FILE_NAME), 'w').close()
+    print(JOBS_DONE_MARKER, file=sys.stderr, flush=True)
+    time.sleep(RESULT_HOLD_TIME)
+
+
+if __name__ == '__main__':
+    root = os.getcwd()
+    jobs = get_jobs()
+    # all jobs are closed before the tests of the first one are run
+    for index, it in enumerate(jobs):
+        isolate_job(os.path.join(root, it), JOB_UID_BASE + index)
+    for index, it in enumerate(jobs):
+        cpu_time = run_tests(root, it, JOB_UID_BASE + index)
+        save_results(root, it, cpu_time)
+    finish()
@@ -0,0 +1,206 @@
+"""
+This module contains the autoscaler of the verification subsystem:
+it adjusts the number of simultaneously running containers between
+the configured bounds, depending on the queue depth, the recent
+duration of checks, the load average and the free memory of the host.
+"""
+import asyncio
+import os
+from collections import deque
+from dataclasses import dataclass
+from database.queue_db import queue_in_crud
+
+
+class SlotLimiter:
+    """
+    Limits the number of simultaneously running operations.
+    Unlike asyncio.Semaphore, the limit can be changed while running:
+    a decreased limit is reached as the running operations finish.
+    """
+    def __init__(self, limit: int):
+        """
+        :param limit: number of operations allowed at the same time
+        """
+        self.limit = limit
+        self.active = 0
+        self._changed = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        async with self._changed:
+            self.active -= 1
+            self._changed.notify_all()
+
+    async def set_limit(self, limit: int) -> None:
+        """
+        :param limit: new number of operations allowed at the same time
+        """
+        async with self._changed:
+            self.limit = limit
+            self._changed.notify_all()
+
+
+@dataclass
+class HostMetrics:
+    """Measurements the autoscaler decision is based on"""
+    queue_depth: int
+    job_duration: float | None
+    load_per_cpu: float | None
+    free_memory: int | None
+
+    def __str__(self) -> str:
+        duration = '-' if self.job_duration is None \
+            else f'{self.job_duration:.1f} с'
+        load = '-' if self.load_per_cpu is None else f'{self.load_per_cpu:.2f}'
+        memory = '-' if self.free_memory is None \
+            else f'{self.free_memory / 2 ** 20:.0f} МБ'
+        return f'очередь {self.queue_depth}, проверка {duration}, ' \
+            f'нагрузка на ядро {load}, свободно {memory}'
+
+
+def get_load_per_cpu() -> float | None:
+    """
+    :return float | None: 1-minute load average divided by the number
+        of CPUs, None IF it is not available (eg on Windows)
+    """
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return None
+
+
+def get_free_memory() -> int | None:
+    """
+    :return int | None: memory available for new processes (bytes),
+        None IF it is not available (no /proc/meminfo)
+    """
+    try:
+        with open('/proc/meminfo', encoding='utf-8') as meminfo:
+            for line in meminfo:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def decide(limit: int,
+           active: int,
+           metrics: HostMetrics,
+           min_slots: int,
+           max_slots: int,
+           interval: int,
+           max_load: float = 1.5,
+           min_free_memory: int = 512 * 2 ** 20) -> tuple[int, str]:
+    """
+    Choose the number of container slots for the next period.
+    The host protection goes first: IF the load or the memory is over
+    the limits, the number of slots decreases. Otherwise it increases
+    while all slots are busy and the queue would not be drained
+    within the period, and decreases when the slots are idle.
+
+    :param limit: current number of slots
+    :param active: number of busy slots
+    :param metrics: measurements of the queue and the host
+    :param min_slots: lower bound of the number of slots
+    :param max_slots: upper bound of the number of slots
+    :param interval: period between decisions (sec)
+    :param max_load: load average per CPU above which slots are removed
+    :param min_free_memory: free memory (bytes) below which slots are removed
+
+    :return tuple[int, str]: new number of slots, reason of the decision
+    """
+    overloaded = metrics.load_per_cpu is not None and \
+        metrics.load_per_cpu > max_load
+    low_memory = metrics.free_memory is not None and \
+        metrics.free_memory < min_free_memory
+    if low_memory and limit > min_slots:
+        return limit - 1, 'мало свободной памяти'
+    if overloaded and limit > min_slots:
+        return limit - 1, 'высокая нагрузка'
+    if overloaded or low_memory:
+        return limit, 'хост перегружен'
+
+    duration = metrics.job_duration or interval
+    backlog_time = metrics.queue_depth * duration / limit
+    if active >= limit and backlog_time > interval and limit < max_slots:
+        return limit + 1, 'очередь не успевает разбираться'
+    if metrics.queue_depth == 0 and active < limit - 1 and limit > min_slots:
+        return limit - 1, 'слоты простаивают'
+    return limit, 'без изменений'
+
+
+class Autoscaler:
+    """
+    Class that periodically measures the queue and the host
+    and changes the limit of the container slots, logging the changes.
+    """
+    def __init__(self,
+                 slots: SlotLimiter,
+                 min_slots: int,
+                 max_slots: int,
+                 interval: int = 30):
+        """
+        :param slots: limiter of the simultaneously running containers
+        :param min_slots: lower bound of the number of slots
+        :param max_slots: upper bound of the number of slots
+        :param interval: period between decisions (sec)
+        """
+        self.slots = slots
+        self.min_slots = min_slots
+        self.max_slots = max_slots
+        self.interval = interval
+        self.max_load = float(os.getenv("CHECKER_MAX_LOAD", "1.5"))
+        self.min_free_memory = int(
+            os.getenv("CHECKER_MIN_FREE_MEMORY", "512")
+        ) * 2 ** 20
+        self.durations: deque[float] = deque(maxlen=20)
+
+    def observe_duration(self, seconds: float) -> None:
+        """
+        Register the duration of a container run.
+
+        :param seconds: duration of the run
+        """
+        self.durations.append(seconds)
+
+    async def get_metrics(self) -> HostMetrics:
+        """
+        :return HostMetrics: current measurements of the queue and the host
+        """
+        duration = None
+        if self.durations:
+            duration = sum(self.durations) / len(self.durations)
+        return HostMetrics(
+            await queue_in_crud.get_queue_length(),
+            duration,
+            get_load_per_cpu(),
+            get_free_memory()
+        )
+
+    async def run(self):
+        """Periodically adjust the number of container slots"""
+        while True:
+            await asyncio.sleep(self.interval)
+            metrics = await self.get_metrics()
+            limit, reason = decide(
+                self.slots.limit,
+                self.slots.active,
+                metrics,
+                self.min_slots,
+                self.max_slots,
+                self.interval,
+                self.max_load,
+                self.min_free_memory
+            )
+            if limit != self.slots.limit:
+                print(
+                    f"Автомасштабирование: контейнеров {self.slots.limit} "
+                    f"-> {limit} ({reason}; {metrics})"
+                )
+                await self.slots.set_limit(limit)
@@ -0,0 +1,101 @@
+"""
+This module contains the distribution of CPU cores between the checks
+running at the same time: each check gets its own cpuset slice,
+and the thread pools of numpy/sklearn (OpenMP, OpenBLAS, MKL)
+are limited to its size, so that concurrent containers
+do not oversubscribe the host.
+"""
+import asyncio
+import os
+
+
+THREAD_LIMIT_VARIABLES = [
+    'OMP_NUM_THREADS',
+    'OPENBLAS_NUM_THREADS',
+    'MKL_NUM_THREADS',
+]
+
+
+def parse_cpuset(value: str) -> list[int]:
+    """
+    Parse the list of CPUs in the cpuset format.
+
+    :param value: eg "0-3,8,10-11"
+
+    :return list[int]: CPU numbers
+    """
+    cpus = []
+    for part in value.split(','):
+        if '-' in part:
+            first, last = part.split('-')
+            cpus.extend(range(int(first), int(last) + 1))
+        elif part.strip():
+            cpus.append(int(part))
+    return sorted(set(cpus))
+
+
+def format_cpuset(cpus: list[int]) -> str:
+    """
+    :param cpus: CPU numbers
+
+    :return str: CPU list in the cpuset format, eg "0,1,2"
+    """
+    return ','.join(str(it) for it in sorted(cpus))
+
+
+def get_thread_limits(threads: int) -> dict[str, str]:
+    """
+    :param threads: number of threads allowed to the check
+
+    :return dict[str, str]: environment variables limiting
+        the thread pools of the numerical libraries
+    """
+    return {it: str(max(1, threads)) for it in THREAD_LIMIT_VARIABLES}
+
+
+class CpuAllocator:
+    """
+    Class that hands out disjoint sets of CPU cores to the checks.
+    A check asking for more cores than are free waits for them.
+    """
+    def __init__(self, cpus: list[int] | None = None):
+        """
+        :param cpus: cores available to the checks. By default,
+            the cores from the CHECKER_CPUSET environment variable
+            (eg "2-15") or all cores available to the process
+        """
+        if cpus is None:
+            if os.getenv("CHECKER_CPUSET"):
+                cpus = parse_cpuset(os.getenv("CHECKER_CPUSET"))
+            elif hasattr(os, 'sched_getaffinity'):
+                cpus = sorted(os.sched_getaffinity(0))
+            else:
+                cpus = list(range(os.cpu_count() or 1))
+        self.cpus = cpus
+        self.free = list(cpus)
+        self._changed = asyncio.Condition()
+
+    async def acquire(self, amount: int) -> list[int]:
+        """
+        Take the cores for a check.
+
+        :param amount: number of cores, limited by the number
+            of cores available to the checks
+
+        :return list[int]: taken cores
+        """
+        amount = max(1, min(amount, len(self.cpus)))
+        async with self._changed:
+            await self._changed.wait_for(lambda: len(self.free) >= amount)
+            taken, self.free = self.free[:amount], self.free[amount:]
+            return taken
+
+    async def release(self, cpus: list[int]) -> None:
+        """
+        Return the cores of a finished check.
+
+        :param cpus: cores taken by acquire
+        """
+        async with self._changed:
+            self.free = sorted(self.free + cpus)
+            self._changed.notify_all()
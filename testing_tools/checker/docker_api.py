@@ -0,0 +1,485 @@
+"""
+This module contains an asynchronous client of the Docker Engine API,
+which works over the docker unix socket with a persistent connection,
+instead of starting the docker CLI process for every command.
+"""
+import asyncio
+import io
+import json
+import os
+import struct
+import tarfile
+from collections import deque
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, BinaryIO, Callable
+from urllib.parse import quote
+import aiohttp
+
+
+# number of the last lines of the build output and the container logs
+# kept for diagnostics, so that verbose tests do not fill the memory
+OUTPUT_TAIL_LINES = 200
+# a longer part of a line of the followed logs is passed as a line (bytes)
+MAX_LINE_SIZE = 2 ** 20
+
+
+class DockerApiException(Exception):
+    """An error returned by the Docker Engine API"""
+    def __init__(self, message: str, status: int | None = None):
+        """
+        :param message: error description
+        :param status: HTTP status of the response, IF any
+        """
+        super().__init__(message)
+        self.status = status
+
+
+def make_build_context(path_to_folder: Path) -> bytes:
+    """
+    Pack the directory into a tar archive to be sent as the build context.
+
+    :param path_to_folder: directory with the Dockerfile and files
+
+    :return bytes: tar archive of the directory
+    """
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w') as tar:
+        for it in sorted(path_to_folder.rglob('*')):
+            tar.add(it, arcname=it.relative_to(path_to_folder).as_posix(),
+                    recursive=False)
+    return buffer.getvalue()
+
+
+def demultiplex_logs(data: bytes) -> tuple[str, str]:
+    """
+    Split the logs of a container started without TTY into stdout and stderr.
+    Each frame of such a stream starts with an 8-byte header:
+    stream type (1 - stdout, 2 - stderr), 3 zero bytes and the frame size.
+
+    :param data: raw logs
+
+    :return tuple[str, str]: stdout, stderr
+    """
+    streams = {1: bytearray(), 2: bytearray()}
+    position = 0
+    while position + 8 <= len(data):
+        stream_type, size = struct.unpack('>BxxxL', data[position:position + 8])
+        position += 8
+        streams.setdefault(stream_type, bytearray()).extend(
+            data[position:position + size]
+        )
+        position += size
+    return (streams[1].decode('utf-8', errors='replace'),
+            streams[2].decode('utf-8', errors='replace'))
+
+
+class DockerApiClient:
+    """Asynchronous client of the Docker Engine API"""
+    def __init__(self,
+                 socket_path: str | None = '/var/run/docker.sock',
+                 base_url: str = 'http://docker'):
+        """
+        :param socket_path: path to the docker unix socket. IF None,
+            the API is accessed over TCP at base_url
+        :param base_url: API address; with a unix socket
+            only the path part of it is used
+        """
+        self.socket_path = socket_path
+        self.base_url = base_url.rstrip('/')
+        self._session: aiohttp.ClientSession | None = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Create the HTTP session on the first request, since it must be
+        created in the running event loop. The session keeps
+        the connection to the docker daemon open between requests.
+
+        :return aiohttp.ClientSession: session
+        """
+        if self._session is None or self._session.closed:
+            connector = None
+            if self.socket_path is not None:
+                connector = aiohttp.UnixConnector(path=self.socket_path)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=None)
+            )
+        return self._session
+
+    async def close(self) -> None:
+        """Close the connection to the docker daemon"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _request(self,
+                       method: str,
+                       path: str,
+                       expected: tuple[int, ...] = (200,),
+                       **kwargs) -> bytes:
+        """
+        Send the request and return the response body.
+
+        :param method: HTTP method
+        :param path: API path, eg /containers/create
+        :param expected: response statuses considered successful
+        :param kwargs: request parameters passed to aiohttp
+
+        :raises DockerApiException: IF the daemon returned another status
+
+        :return bytes: response body
+        """
+        async with self._get_session().request(
+                method,
+                f'{self.base_url}{path}',
+                **kwargs) as response:
+            body = await response.read()
+            if response.status not in expected:
+                try:
+                    message = json.loads(body).get('message', body)
+                except ValueError:
+                    message = body
+                raise DockerApiException(
+                    f'{method} {path}: {response.status} {message}',
+                    response.status
+                )
+            return body
+
+    async def image_exists(self, name: str) -> bool:
+        """
+        :param name: image name or tag
+
+        :return bool: True IF the image exists ELSE False
+        """
+        try:
+            await self._request('GET', f'/images/{quote(name, safe="")}/json')
+        except DockerApiException as ex:
+            if ex.status == 404:
+                return False
+            raise
+        return True
+
+    async def _read_progress(self,
+                             response: aiohttp.ClientResponse
+                             ) -> AsyncIterator[dict]:
+        """
+        Read the progress messages of a build or a pull.
+
+        :param response: response streaming the JSON messages
+
+        :raises DockerApiException: IF the daemon reported an error
+
+        :return AsyncIterator[dict]: messages
+        """
+        async for line in response.content:
+            if not line.strip():
+                continue
+            message = json.loads(line)
+            if 'error' in message:
+                raise DockerApiException(message['error'])
+            yield message
+
+    async def build(self,
+                    context: bytes | BinaryIO,
+                    tag: str,
+                    labels: dict[str, str] | None = None,
+                    cpuset: str | None = None,
+                    on_output: Callable[[str], Awaitable[None]] | None = None
+                    ) -> str:
+        """
+        Build the image from the tar archive with the Dockerfile.
+
+        :param context: build context (see make_build_context),
+            or a file it is streamed from, eg the read end of a pipe
+        :param tag: image tag
+        :param labels: image labels
+        :param cpuset: CPUs the build steps may use, eg "0,1"
+        :param on_output: coroutine function called with each complete line
+            of the build output as soon as it is received
+
+        :raises DockerApiException: IF the build failed
+
+        :return str: the last OUTPUT_TAIL_LINES lines of the build output
+        """
+        params = {'t': tag, 'rm': '1', 'forcerm': '1'}
+        if labels:
+            params['labels'] = json.dumps(labels)
+        if cpuset:
+            params['cpusetcpus'] = cpuset
+        output = deque(maxlen=OUTPUT_TAIL_LINES)
+        line_buffer = ''
+        async with self._get_session().post(
+                f'{self.base_url}/build',
+                params=params,
+                data=context,
+                headers={'Content-Type': 'application/x-tar'}) as response:
+            if response.status != 200:
+                raise DockerApiException(
+                    f'POST /build: {response.status} {await response.text()}',
+                    response.status
+                )
+            async for message in self._read_progress(response):
+                if 'stream' in message:
+                    line_buffer += message['stream']
+                    *lines, line_buffer = line_buffer.split('\n')
+                    for it in lines:
+                        output.append(it)
+                        if on_output is not None:
+                            await on_output(it)
+        if line_buffer:
+            output.append(line_buffer)
+            if on_output is not None:
+                await on_output(line_buffer)
+        return '\n'.join(output)
+
+    async def pull_image(self, name: str) -> None:
+        """
+        Pull the image from the registry.
+
+        :param name: image name with the tag, eg python:3.11
+
+        :raises DockerApiException: IF the pull failed
+        """
+        image, _, tag = name.partition(':')
+        async with self._get_session().post(
+                f'{self.base_url}/images/create',
+                params={'fromImage': image, 'tag': tag or 'latest'}
+        ) as response:
+            if response.status != 200:
+                raise DockerApiException(
+                    f'POST /images/create: {response.status} '
+                    f'{await response.text()}',
+                    response.status
+                )
+            async for _ in self._read_progress(response):
+                pass
+
+    async def list_images(self, label: str | None = None) -> list[dict]:
+        """
+        :param label: label the images must have, IF any
+
+        :return list[dict]: images, eg Id, RepoTags, Created (timestamp),
+            Size and Labels of each
+        """
+        params = {}
+        if label is not None:
+            params['filters'] = json.dumps({'label': [label]})
+        data = await self._request('GET', '/images/json', params=params)
+        return json.loads(data)
+
+    async def list_containers(self,
+                              label: str | None = None,
+                              all_containers: bool = True) -> list[dict]:
+        """
+        :param label: label the containers must have, IF any
+        :param all_containers: list the stopped containers too
+
+        :return list[dict]: containers, eg Id, Image, State
+            and Labels of each
+        """
+        params = {'all': '1' if all_containers else '0'}
+        if label is not None:
+            params['filters'] = json.dumps({'label': [label]})
+        data = await self._request('GET', '/containers/json', params=params)
+        return json.loads(data)
+
+    async def inspect_container(self, container_id: str) -> dict:
+        """
+        :param container_id: container ID or name
+
+        :return dict: container details, eg State.FinishedAt
+        """
+        data = await self._request('GET', f'/containers/{container_id}/json')
+        return json.loads(data)
+
+    async def create_container(self,
+                               image: str,
+                               name: str,
+                               labels: dict[str, str] | None = None,
+                               **config) -> str:
+        """
+        Create a container.
+
+        :param image: image name or tag
+        :param name: container name
+        :param labels: container labels
+        :param config: additional container settings of the API,
+            eg HostConfig
+
+        :return str: container ID
+        """
+        body = {'Image': image, 'Labels': labels or {}, **config}
+        data = await self._request(
+            'POST',
+            '/containers/create',
+            expected=(201,),
+            params={'name': name},
+            json=body
+        )
+        return json.loads(data)['Id']
+
+    async def start_container(self, container_id: str) -> None:
+        """
+        :param container_id: container ID or name
+        """
+        await self._request(
+            'POST',
+            f'/containers/{container_id}/start',
+            expected=(204, 304)
+        )
+
+    async def wait_container(self, container_id: str) -> int:
+        """
+        Wait for the container to stop.
+
+        :param container_id: container ID or name
+
+        :return int: container exit code
+        """
+        data = await self._request('POST', f'/containers/{container_id}/wait')
+        return json.loads(data)['StatusCode']
+
+    async def container_logs(self,
+                             container_id: str,
+                             tail: int | None = OUTPUT_TAIL_LINES
+                             ) -> tuple[str, str]:
+        """
+        :param container_id: container ID or name
+        :param tail: number of the last lines of the logs to read,
+            None to read all logs
+
+        :return tuple[str, str]: container stdout, stderr
+        """
+        params = {'stdout': '1', 'stderr': '1'}
+        if tail is not None:
+            params['tail'] = str(tail)
+        data = await self._request(
+            'GET',
+            f'/containers/{container_id}/logs',
+            params=params
+        )
+        return demultiplex_logs(data)
+
+    async def follow_logs(self,
+                          container_id: str) -> AsyncIterator[tuple[int, str]]:
+        """
+        Read the logs of the running container as they are written,
+        until the container stops.
+
+        :param container_id: container ID or name
+
+        :return AsyncIterator[tuple[int, str]]: stream type
+            (1 - stdout, 2 - stderr) and each complete line of the stream
+        """
+        buffers: dict[int, bytes] = {}
+        async with self._get_session().get(
+                f'{self.base_url}/containers/{container_id}/logs',
+                params={'stdout': '1', 'stderr': '1', 'follow': '1'}
+        ) as response:
+            if response.status != 200:
+                raise DockerApiException(
+                    f'GET /containers/{container_id}/logs: '
+                    f'{response.status} {await response.text()}',
+                    response.status
+                )
+            while True:
+                try:
+                    header = await response.content.readexactly(8)
+                    stream_type, size = struct.unpack('>BxxxL', header)
+                    data = await response.content.readexactly(size)
+                except asyncio.IncompleteReadError:
+                    break
+                *lines, buffers[stream_type] = \
+                    (buffers.get(stream_type, b'') + data).split(b'\n')
+                for it in lines:
+                    yield stream_type, it.decode('utf-8', errors='replace')
+                if len(buffers[stream_type]) > MAX_LINE_SIZE:
+                    yield stream_type, buffers.pop(stream_type).decode(
+                        'utf-8', errors='replace'
+                    )
+        for stream_type, it in buffers.items():
+            if it:
+                yield stream_type, it.decode('utf-8', errors='replace')
+
+    async def container_cpu_time(self, container_id: str) -> float:
+        """
+        Read the CPU time used by all processes of the running container,
+        as accounted by its cgroup.
+
+        :param container_id: container ID or name
+
+        :return float: user and system CPU time (sec)
+        """
+        data = await self._request(
+            'GET',
+            f'/containers/{container_id}/stats',
+            params={'stream': 'false', 'one-shot': 'true'}
+        )
+        return json.loads(data)['cpu_stats']['cpu_usage']['total_usage'] / 1e9
+
+    async def get_archive(self,
+                          container_id: str,
+                          path: str) -> bytes | None:
+        """
+        Read the files of the container, eg the report it has saved.
+        The container may be stopped.
+
+        :param container_id: container ID or name
+        :param path: file or directory in the container
+
+        :return bytes | None: tar archive of the path,
+            None IF there is no such path in the container
+        """
+        try:
+            return await self._request(
+                'GET',
+                f'/containers/{container_id}/archive',
+                params={'path': path}
+            )
+        except DockerApiException as ex:
+            if ex.status == 404:
+                return None
+            raise
+
+    async def remove_container(self,
+                               container_id: str,
+                               force: bool = True) -> None:
+        """
+        :param container_id: container ID or name
+        :param force: kill the container IF it is running
+        """
+        await self._request(
+            'DELETE',
+            f'/containers/{container_id}',
+            expected=(204, 404),
+            params={'force': '1' if force else '0'}
+        )
+
+    async def remove_image(self, name: str, force: bool = False) -> None:
+        """
+        :param name: image name or tag
+        :param force: remove the image even IF it is used
+        """
+        await self._request(
+            'DELETE',
+            f'/images/{quote(name, safe="")}',
+            expected=(200, 404),
+            params={'force': '1' if force else '0'}
+        )
+
+
+def _create_default_client() -> DockerApiClient:
+    """
+    Create the client from the DOCKER_API_URL environment variable:
+    unix:///path/to/docker.sock (default /var/run/docker.sock)
+    or http://host:port for docker daemons available over TCP.
+
+    :return DockerApiClient: client
+    """
+    url = os.getenv("DOCKER_API_URL", "unix:///var/run/docker.sock")
+    if url.startswith('unix://'):
+        return DockerApiClient(socket_path=url[len('unix://'):])
+    return DockerApiClient(socket_path=None, base_url=url)
+
+
+docker_api = _create_default_client()
@@ -2,85 +2,858 @@
 This module contains the docker image builder, and is also responsible 
 for launching them and saving reports of their work.
 """
+import asyncio
+import hashlib
+import io
 import json
-import time
+import os
+import tarfile
 import uuid
-from pathlib import Path
-from python_on_whales import DockerClient
+from collections import deque
+from contextlib import aclosing
+from pathlib import Path, PurePosixPath
+from typing import Awaitable, Callable
 from model.pydantic.test_settings import TestSettings
+from testing_tools.checker.cpu_allocator import format_cpuset,\
+    get_thread_limits
+from testing_tools.checker.docker_api import DockerApiException,\
+    OUTPUT_TAIL_LINES, docker_api, make_build_context
+from testing_tools.checker.metrics import MetricsRegistry
+from testing_tools.checker.warm_runner import WarmRunnerException, WarmRunners
+from testing_tools.checker.worker_pool import WorkerPool
+from testing_tools.logger.report_model import TaskReport, RESULT_DIR,\
+    RESULT_FILE_NAME, TASK_EVENT_PREFIX, BATCH_JOB_PREFIX,\
+    CPU_TIME_FILE_NAME, JOBS_DONE_MARKER
+from utils.test_manifest import get_dataset_paths, get_dependency_hash,\
+    get_file_hash
 
 
-docker = DockerClient(log_level='info')
+PYTHON_IMAGE = 'python:3.11'
+# packages required by the checker files in every image
+BASE_PACKAGES = ['pytest', 'pydantic']
+
+# checker files that are the same for all jobs and therefore
+# are placed into the base image once instead of every job directory
+CHECKER_ASSETS = ['conftest.py', 'batch_runner.py', 'zygote.py', 'logger']
+
+# label of the images and containers of student jobs,
+# by which they are found by the garbage collector
+JOB_LABEL = 'homeworkbot.job'
+# label of the lab images, by which the images no longer
+# referenced by the tests are found by the garbage collector
+LAB_LABEL = 'homeworkbot.lab'
+
+# the report file of a job larger than this (bytes) is not read
+MAX_RESULT_SIZE = 2 ** 20
+# size of the tail of the build output, stdout and stderr (characters)
+# kept for diagnostics of a job without a report
+DIAGNOSTICS_TAIL_SIZE = 4000
+# directory of the job directory where the reports saved by the container
+# to RESULT_DIR are placed; it is created after the build context is packed,
+# so it is not copied
+RESULT_DIR_NAME = '.result'
+
+# directory of the job image with the job subdirectories,
+# and the subdirectory of the job of an image with a single job
+JOBS_DIR = '/opt/jobs'
+JOB_NAME = 'job'
+
+# directory of the lab image where the datasets of the lab are placed,
+# available to the tests through the DATASETS_DIR environment variable
+DATASETS_PATH = '/datasets'
+
+_assets_hash: str | None = None
+
+
+def _get_assets_path() -> Path:
+    """
+    :return Path: directory with the checker files copied into the image
+    """
+    return Path.cwd().joinpath('testing_tools')
+
+
+def _get_assets_hash() -> str:
+    """
+    Return the hash of the checker files, so that the base image
+    is rebuilt after they are changed.
+
+    :return str: hex digest of the checker files
+    """
+    global _assets_hash
+    if _assets_hash is None:
+        digest = hashlib.sha256()
+        assets_path = _get_assets_path()
+        for it in CHECKER_ASSETS:
+            path = assets_path.joinpath(it)
+            files = sorted(path.rglob('*.py')) if path.is_dir() else [path]
+            for file in files:
+                digest.update(file.relative_to(assets_path).as_posix().encode())
+                digest.update(get_file_hash(file).encode())
+        _assets_hash = digest.hexdigest()
+    return _assets_hash
+
+
+def get_wheelhouse_path() -> Path | None:
+    """
+    :return Path | None: directory with the wheels of the lab dependencies
+        (WHEELHOUSE_DIR environment variable), None IF it is not set and
+        the dependencies are installed from PyPI
+    """
+    if not os.getenv("WHEELHOUSE_DIR"):
+        return None
+    return Path.cwd().joinpath(os.getenv("WHEELHOUSE_DIR"))
+
+
+async def populate_wheelhouse(dependencies: list[str]) -> None:
+    """
+    Download the wheels of the checker packages and the lab dependencies
+    into the wheelhouse. Pip is run in the same image the lab images
+    are built from, so the wheels match its python version and platform;
+    the packages published only as sources are built into wheels here,
+    since the lab images are installed from the wheelhouse without
+    the build tools of the packages.
+    Requires network access, while the lab images are then built without it.
+
+    :param dependencies: union of the dependencies of all labs
+
+    :raises DockerApiException: IF pip failed
+
+    :return None:
+    """
+    wheelhouse = get_wheelhouse_path()
+    if wheelhouse is None:
+        raise ValueError('Не задан параметр WHEELHOUSE_DIR')
+    wheelhouse.mkdir(parents=True, exist_ok=True)
+    if not await docker_api.image_exists(PYTHON_IMAGE):
+        await docker_api.pull_image(PYTHON_IMAGE)
+    container_id = await docker_api.create_container(
+        PYTHON_IMAGE,
+        f'homeworkbot-wheelhouse-{uuid.uuid4()}',
+        Cmd=['pip', 'wheel', '--wheel-dir', '/wheelhouse',
+             *BASE_PACKAGES, *dependencies],
+        HostConfig={'Binds': [f'{wheelhouse}:/wheelhouse']}
+    )
+    try:
+        await docker_api.start_container(container_id)
+        code = await docker_api.wait_container(container_id)
+        if code != 0:
+            _, stderr = await docker_api.container_logs(container_id)
+            raise DockerApiException(f'pip wheel: код {code}\n{stderr}')
+    finally:
+        await docker_api.remove_container(container_id)
+
+
+def _get_datasets_hash(datasets: list[Path]) -> str:
+    """
+    Return the hash of the names, sizes and modification times
+    of the dataset files, so that the image is rebuilt after
+    a dataset is changed, without reading the large files.
+
+    :param datasets: paths to the dataset files or directories
+
+    :return str: hex digest of the datasets
+    """
+    digest = hashlib.sha256()
+    for dataset in sorted(datasets):
+        files = sorted(dataset.rglob('*')) if dataset.is_dir() else [dataset]
+        for file in files:
+            info = file.stat()
+            digest.update(
+                f'{file.relative_to(dataset.parent).as_posix()} '
+                f'{info.st_size} {info.st_mtime_ns}\n'.encode()
+            )
+    return digest.hexdigest()
+
+
+def get_lab_image_tag(dependencies: list[str] | None,
+                      datasets: list[Path] | None = None) -> str:
+    """
+    Return the tag of the base image with the lab dependencies
+    and the checker files installed and the lab datasets placed.
+    Labs with the same dependencies and datasets share one image.
+
+    :param dependencies: list of packages from settings.json
+    :param datasets: paths to the lab datasets
+
+    :return str: image tag
+    """
+    data = get_dependency_hash(dependencies) + _get_assets_hash()
+    if datasets:
+        data += _get_datasets_hash(datasets)
+    digest = hashlib.sha256(data.encode()).hexdigest()
+    return f'homeworkbot-lab:{digest[:16]}'
+
+
+def _write_lab_context(output: int,
+                       dependencies: list[str] | None,
+                       datasets: list[Path] | None) -> None:
+    """
+    Write the build context of the lab image as a tar stream:
+    the Dockerfile, the checker files, the wheelhouse and the datasets
+    are packed from their places, without being copied
+    into a context directory first.
+
+    :param output: descriptor the stream is written to, closed at the end
+    :param dependencies: list of packages from settings.json
+    :param datasets: paths to the lab datasets
+
+    :return None:
+    """
+    packages = ' '.join(BASE_PACKAGES)
+    if dependencies:
+        for it in dependencies:
+            packages += f' {it}'
+
+    wheelhouse = get_wheelhouse_path()
+    if wheelhouse is None:
+        file = [
+            f"FROM {PYTHON_IMAGE}\n",
+            "ENV PIP_ROOT_USER_ACTION=ignore\n",
+            f"RUN pip install {packages}\n",
+        ]
+    else:
+        # the packages are installed in a separate stage,
+        # so that the wheelhouse does not get into the image layers
+        file = [
+            f"FROM {PYTHON_IMAGE} AS install\n",
+            "ENV PIP_ROOT_USER_ACTION=ignore\n",
+            "COPY wheelhouse /wheelhouse\n",
+            "RUN pip install --no-index --find-links /wheelhouse"
+            f" --prefix /install {packages}\n",
+            f"FROM {PYTHON_IMAGE}\n",
+            "COPY --from=install /install /usr/local\n",
+        ]
+    file += [
+        "ENV PYTHONDONTWRITEBYTECODE=1\n",
+        "ENV PYTHONUNBUFFERED=1\n",
+        "WORKDIR /opt/\n",
+        "COPY conftest.py batch_runner.py zygote.py /opt/\n",
+        "COPY logger /opt/logger\n",
+    ]
+    if datasets:
+        file.append(f"COPY datasets {DATASETS_PATH}\n")
+        file.append(f"ENV DATASETS_DIR={DATASETS_PATH}\n")
+
+    def skip_cache(info: tarfile.TarInfo) -> tarfile.TarInfo | None:
+        return None if '__pycache__' in info.name else info
+
+    with os.fdopen(output, 'wb') as stream, \
+            tarfile.open(fileobj=stream, mode='w|') as tar:
+        dockerfile = ''.join(file).encode()
+        info = tarfile.TarInfo('Dockerfile')
+        info.size = len(dockerfile)
+        tar.addfile(info, io.BytesIO(dockerfile))
+        assets_path = _get_assets_path()
+        for it in CHECKER_ASSETS:
+            tar.add(assets_path.joinpath(it), arcname=it, filter=skip_cache)
+        if wheelhouse is not None:
+            tar.add(wheelhouse, arcname='wheelhouse')
+        for it in datasets or []:
+            tar.add(it, arcname=f'datasets/{it.name}')
+
+
+async def build_lab_image(dependencies: list[str] | None,
+                          datasets: list[Path] | None = None) -> str:
+    """
+    Build the base image with the lab dependencies installed,
+    the checker files (conftest.py, batch_runner.py, zygote.py, logger)
+    in /opt
+    and the lab datasets in /datasets, if it has not been built yet.
+    The datasets are placed into the image once, instead of being
+    copied into the directory of every job. The build context
+    is streamed to the docker daemon while it is packed.
+
+    :param dependencies: list of packages from settings.json
+    :param datasets: paths to the lab datasets
+
+    :raises DockerApiException: IF the build failed
+
+    :return str: image tag
+    """
+    tag_name = await asyncio.to_thread(
+        get_lab_image_tag,
+        dependencies,
+        datasets
+    )
+    if await docker_api.image_exists(tag_name):
+        return tag_name
+    read_end, write_end = os.pipe()
+    with os.fdopen(read_end, 'rb') as context:
+        writer = asyncio.create_task(asyncio.to_thread(
+            _write_lab_context,
+            write_end,
+            dependencies,
+            datasets
+        ))
+        try:
+            await docker_api.build(context, tag_name, labels={LAB_LABEL: 'true'})
+            await writer
+        finally:
+            # the writer fails on the closed pipe IF the build has failed
+            context.close()
+            await asyncio.gather(writer, return_exceptions=True)
+    return tag_name
+
+
+class LabImageUsage:
+    """
+    The time each lab image was last used by a check, kept as
+    the modification time of an empty file named after the image
+    in the given directory, which is shared by the checker processes
+    of the host.
+    """
+    def __init__(self, path: Path):
+        """
+        :param path: directory of the usage files
+        """
+        self.path = path
+
+    def _get_file(self, tag_name: str) -> Path:
+        """
+        :param tag_name: tag of the lab image
+
+        :return Path: usage file of the image
+        """
+        return self.path.joinpath(tag_name.replace(':', '_'))
+
+    def touch(self, tag_name: str) -> None:
+        """
+        Record that the lab image is used now.
+
+        :param tag_name: tag of the lab image
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._get_file(tag_name).touch()
+
+    def get_last_used(self, tag_name: str) -> float | None:
+        """
+        :param tag_name: tag of the lab image
+
+        :return float | None: time the image was last used,
+            None IF it has not been used on this host
+        """
+        try:
+            return self._get_file(tag_name).stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+    def forget(self, tag_name: str) -> None:
+        """
+        Remove the usage file of the removed image.
+
+        :param tag_name: tag of the lab image
+        """
+        self._get_file(tag_name).unlink(missing_ok=True)
+
+
+def read_result(path_to_file: Path, limit: int = MAX_RESULT_SIZE) -> str | None:
+    """
+    Read the report file of the job.
+
+    :param path_to_file: path to the report file
+    :param limit: maximum size of the report (bytes)
+
+    :return str | None: report, None IF the file is missing
+        or larger than the limit
+    """
+    try:
+        with open(path_to_file, 'rb') as file:
+            data = file.read(limit + 1)
+    except FileNotFoundError:
+        return None
+    if len(data) > limit:
+        print(f"Отчёт {path_to_file} превышает {limit} байт")
+        return None
+    return data.decode('utf-8', errors='replace')
+
+
+def extract_results(archive: bytes,
+                    result_dir: Path,
+                    limit: int = MAX_RESULT_SIZE) -> None:
+    """
+    Unpack the archive of RESULT_DIR read from the container
+    into the result directory of the job. Only the regular files
+    not larger than the limit are unpacked, and only inside the directory.
+
+    :param archive: tar archive of RESULT_DIR (see DockerApiClient.get_archive)
+    :param result_dir: result directory of the job
+    :param limit: maximum size of a file (bytes)
+
+    :return None:
+    """
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        for it in tar:
+            # the names start with the name of RESULT_DIR itself
+            parts = PurePosixPath(it.name).parts[1:]
+            if not it.isfile() or not parts or '..' in parts:
+                continue
+            if it.size > limit:
+                print(f"Отчёт {it.name} превышает {limit} байт")
+                continue
+            path = result_dir.joinpath(*parts)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(tar.extractfile(it).read())
+
+
+def read_cpu_time(path_to_file: Path) -> float:
+    """
+    Read the CPU time of the job saved by the batch runner.
+
+    :param path_to_file: path to the CPU time file of the job
+
+    :return float: CPU time (sec), 0 IF the file is missing or invalid
+    """
+    data = read_result(path_to_file)
+    try:
+        return float(data)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def split_cpu_time(total: float, usage: dict[str, float]) -> dict[str, float]:
+    """
+    Split the CPU time of the container between the jobs run in it
+    in proportion to the CPU time of their tests, since the CPU time
+    of the container also counts the processes left by the tests
+    and the runner itself.
+
+    :param total: CPU time (sec) of the container, 0 IF it was not read
+        (eg the container stopped before the results were saved)
+    :param usage: job name: CPU time (sec) of its tests
+        measured by the batch runner
+
+    :return dict[str, float]: job name: CPU time (sec) of the job
+    """
+    if total <= 0:
+        return dict(usage)
+    measured = sum(usage.values())
+    if measured <= 0:
+        return {it: total / len(usage) for it in usage}
+    return {it: total * value / measured for it, value in usage.items()}
+
+
+async def prewarm_lab_images(path_to_test: str,
+                             settings: list[TestSettings]) -> None:
+    """
+    Build base images for the labs whose tests were changed,
+    so that the first student answer does not pay for installing
+    the dependencies.
+
+    :param path_to_test: root directory of the discipline tests
+    :param settings: testing policies of the changed labs
+
+    :return None:
+    """
+    built: set[str] = set()
+    for it in settings:
+        datasets = get_dataset_paths(path_to_test, it)
+        tag_name = await asyncio.to_thread(
+            get_lab_image_tag,
+            it.dependencies,
+            datasets
+        )
+        if tag_name in built:
+            continue
+        try:
+            await build_lab_image(it.dependencies, datasets)
+        except Exception as ex:
+            print(f"Не удалось собрать образ {tag_name}: {ex}")
+        built.add(tag_name)
 
 class DockerBuilder:
     """Dockerfile generation class"""
+    # directory of the image the directory of the job is copied to
+    COPY_TARGET = f'{JOBS_DIR}/{JOB_NAME}'
+
     def __init__(self,
                  path_to_folder: Path,
                  student_id: int,
-                 lab_number: int) -> None:
+                 lab_number: int,
+                 test_settings: TestSettings,
+                 datasets: list[Path] | None = None) -> None:
         """
         :param path_to_folder: path to the directory with files that 
             will be sent to the container
         :param student_id: student Telegram id
         :param lab_number: laboratory (homework) number
+        :param test_settings: testing policies of the lab
+            from the tests manifest
+        :param datasets: paths to the lab datasets placed into the lab image
         """
         self.test_dir = path_to_folder
-        settings_path = path_to_folder.joinpath('settings.json')
-        with open(settings_path, encoding='utf-8') as file:
-            data = json.load(file)
-        self.dependencies = TestSettings(**data).dependencies
+        self.dependencies = test_settings.dependencies
+        self.datasets = datasets
         self.tag_name = f'{student_id}-{lab_number}-{uuid.uuid4()}'
-        self.logs: str | None = None
+        self.report: str | None = None
+        self.cpu_time = 0.0
+        self.build_output = ''
+        self.stdout = ''
+        self.stderr = ''
 
-    def _build_docker_file(self):
-        """Generate, fill with the necessary content and save the Dockerfile"""
+    def _build_docker_file(self, lab_image: str, env: dict[str, str]):
+        """
+        Generate, fill with the necessary content and save the Dockerfile
+
+        :param lab_image: tag of the base image of the lab
+        :param env: environment variables of the tests
+        """
         file = [
-            "FROM python:3.11\n",
-            "ENV PIP_ROOT_USER_ACTION=ignore\n",
-            "ENV PYTHONDONTWRITEBYTECODE=1\n",
-            "ENV PYTHONUNBUFFERED=1\n",
-            "WORKDIR /opt/\n"
-            "COPY . /opt \n",
+            f"FROM {lab_image}\n",
+            f"WORKDIR {JOBS_DIR}\n"
+            f"COPY . {self.COPY_TARGET}/\n",
         ]
+        file.extend(f"ENV {key}={value}\n" for key, value in env.items())
 
-        dependencies = 'pytest pydantic'
-        if self.dependencies:
-            for it in self.dependencies:
-                dependencies += f' {it}'
-
-        file.append(f"RUN pip install {dependencies}\n")
-        file.append('RUN ["pytest", "--tb=no"]\n')
-        file.append('CMD ["python3", "docker_output.py"]\n')
+        # the tests are run by the container, so that their CPU time
+        # is accounted by its cgroup
+        file.append(f'RUN mkdir -m 700 {RESULT_DIR}\n')
+        file.append('CMD ["python3", "/opt/batch_runner.py"]\n')
 
         f = open(self.test_dir.joinpath('Dockerfile'), "w")
         f.writelines(file)
         f.close()
 
-    def get_run_result(self) -> str:
-        """
-        Return the docker container execution log
-        """
-        return self.logs
-
-    def run_docker(self):
-        """
-        Build the image, run the container, 
-        and get the result of the work done (logs) and save it.
-        """
-        self._build_docker_file()
-        with docker.build(context_path=self.test_dir,
-                          tags=self.tag_name) as my_image:
-            with docker.container.run(self.tag_name,
-                            name=self.tag_name,
-                            detach=True) as output:
-                while True:
-                    container_info = docker.container.inspect(output.id)
-                    status = container_info.state.status
-                    if status in ["exited", "dead"]:
-                        break
-                    time.sleep(1)
-                self.logs = docker.container.logs(
-                    container=output
-                    ) or docker.container.logs(
-                        container=output.id
-                        )
+    def get_run_result(self) -> str | None:
+        """
+        Return the report saved by the container to the result file,
+        None IF there is no report
+        """
+        return self.report
+
+    async def _ensure_lab_image(self, lab_image: str) -> None:
+        """
+        Build the lab image IF it is missing.
+
+        :param lab_image: tag of the lab image
+        """
+        if not await docker_api.image_exists(lab_image):
+            await build_lab_image(self.dependencies, self.datasets)
+
+    async def _run_warm(self,
+                        runners: WarmRunners,
+                        pool: WorkerPool,
+                        lab_image: str,
+                        env: dict[str, str],
+                        cpus: list[int] | None,
+                        on_task: Callable[[TaskReport], Awaitable[None]]
+                        | None,
+                        metrics: MetricsRegistry,
+                        trace_id: str | None) -> None:
+        """
+        Run the tests in the warm runner of the lab image,
+        which receives the archive of the job directory
+        and returns the output and the report of the tests.
+
+        :param runners: warm runner containers of the lab images
+        :param pool: worker pool for the blocking stages
+        :param lab_image: tag of the lab image
+        :param env: thread limits, applied IF the runner is started
+        :param cpus: CPU cores the tests are pinned to, IF any
+        :param on_task: coroutine function called with the result
+            of each task as soon as its test is completed
+        :param metrics: registry of the durations of the job steps
+        :param trace_id: trace of the submission the steps are recorded to
+
+        :raises WarmRunnerException: IF the runner is not available
+        """
+        await self._ensure_lab_image(lab_image)
+        runner = await runners.get(lab_image, self.dependencies, env)
+        archive = await pool.run(make_build_context, self.test_dir)
+        with metrics.timer('warm_run', trace_id):
+            try:
+                self.stdout, self.report, self.cpu_time = await runner.run(
+                    archive,
+                    cpus,
+                    None if on_task is None else self._task_reader(on_task)
+                )
+            except WarmRunnerException:
+                await runners.discard(runner)
+                raise
+
+    async def _read_results(self, pool: WorkerPool, result_dir: Path) -> None:
+        """
+        Read the report saved by the container, and the CPU time
+        of the tests IF the CPU time of the container was not read.
+
+        :param pool: worker pool for the blocking stages
+        :param result_dir: result directory of the job
+        """
+        self.report = await pool.run(
+            read_result,
+            result_dir.joinpath(JOB_NAME, RESULT_FILE_NAME)
+        )
+        if not self.cpu_time:
+            self.cpu_time = await pool.run(
+                read_cpu_time,
+                result_dir.joinpath(JOB_NAME, CPU_TIME_FILE_NAME)
+            )
+
+    async def _follow_container(self,
+                                pool: WorkerPool,
+                                container_id: str,
+                                result_dir: Path,
+                                on_task: Callable[..., Awaitable[None]]
+                                | None) -> None:
+        """
+        Pass the task results relayed by the batch runner to the stderr
+        of the running container to on_task until the runner has saved
+        the results, then read the CPU time of the container and the results.
+        The stdout of the container is the output of the tests,
+        so the lines printed to it are kept only for diagnostics.
+
+        :param pool: worker pool for the blocking stages
+        :param container_id: container ID
+        :param result_dir: result directory of the job
+        :param on_task: coroutine function called with the result
+            of each task as soon as its test is completed
+        """
+        read_line = None if on_task is None else self._task_reader(on_task)
+        stdout = deque(maxlen=OUTPUT_TAIL_LINES)
+        stderr = deque(maxlen=OUTPUT_TAIL_LINES)
+        done = False
+        async with aclosing(docker_api.follow_logs(container_id)) as logs:
+            async for stream_type, line in logs:
+                if stream_type != 2:
+                    stdout.append(line)
+                    continue
+                stderr.append(line)
+                if line == JOBS_DONE_MARKER:
+                    done = True
+                    break
+                if read_line is not None:
+                    await read_line(line)
+        self.stdout = '\n'.join(stdout)
+        self.stderr = '\n'.join(stderr)
+        if done:
+            # the CPU time of a stopped container is not available
+            self.cpu_time = await docker_api.container_cpu_time(container_id)
+        archive = await docker_api.get_archive(container_id, RESULT_DIR)
+        result_dir.mkdir(exist_ok=True)
+        if archive is not None:
+            await pool.run(extract_results, archive, result_dir)
+
+    def get_diagnostics(self) -> str:
+        """
+        Return the tails of the build output
+        and of the container stdout and stderr
+        """
+        return f'build:\n{self.build_output[-DIAGNOSTICS_TAIL_SIZE:]}\n' \
+            f'stdout:\n{self.stdout[-DIAGNOSTICS_TAIL_SIZE:]}\n' \
+            f'stderr:\n{self.stderr[-DIAGNOSTICS_TAIL_SIZE:]}'
+
+    @staticmethod
+    def _task_reader(
+            on_task: Callable[[TaskReport], Awaitable[None]]
+    ) -> Callable[[str], Awaitable[None]]:
+        """
+        Make the handler of the lines relayed by the runner from the pipe
+        of the task results, which passes the task results written
+        by the conftest of the tests to on_task.
+
+        :param on_task: coroutine function called with a task result
+
+        :return Callable[[str], Awaitable[None]]: line handler
+        """
+        async def read_line(line: str) -> None:
+            if not line.startswith(TASK_EVENT_PREFIX):
+                return
+            data = line[len(TASK_EVENT_PREFIX):]
+            try:
+                task = TaskReport(**json.loads(data))
+            except (TypeError, ValueError):
+                return
+            await on_task(task)
+        return read_line
+
+    async def run_docker(self,
+                         pool: WorkerPool,
+                         cpus: list[int] | None = None,
+                         threads: int = 1,
+                         on_task: Callable[[TaskReport], Awaitable[None]]
+                         | None = None,
+                         metrics: MetricsRegistry | None = None,
+                         trace_id: str | None = None,
+                         runners: WarmRunners | None = None,
+                         usage: LabImageUsage | None = None):
+        """
+        Build the image, run the container, whose batch runner runs
+        the tests, and read the report it saved to RESULT_DIR
+        and the CPU time of the container accounted by its cgroup,
+        which the tests can not change. The report is read through the API
+        from the container, so the docker daemon does not need
+        to see the job directory (eg the checker runs in a container
+        or the daemon is on another host). The tails of the container
+        stdout and stderr are kept separately for diagnostics.
+        The job is controlled through the Docker Engine API,
+        without blocking the event loop.
+        IF the warm runners are given, the tests are run in the runner
+        of the lab image instead, and only IF the runner is not available,
+        in a new container.
+
+        :param pool: worker pool for the blocking stages
+        :param cpus: CPU cores the tests are pinned to, IF any
+        :param threads: number of threads of the numerical libraries
+            (OpenMP, OpenBLAS, MKL) used by the tests
+        :param on_task: coroutine function called with the result
+            of each task as soon as its test is completed
+            (for a batch, with the job name and the result, see
+            BatchDockerBuilder._task_reader)
+        :param metrics: registry of the durations of the job steps:
+            image_build (the lab image, IF missing, and the job image)
+            and container_run, or warm_run
+        :param trace_id: trace of the submission the steps are recorded to
+        :param runners: warm runner containers of the lab images
+        :param usage: usage times of the lab images, where the use
+            of the lab image of the job is recorded
+        """
+        metrics = metrics or MetricsRegistry()
+        cpuset = format_cpuset(cpus) if cpus else None
+        env = get_thread_limits(len(cpus) if cpus else threads)
+        lab_image = await pool.run(
+            get_lab_image_tag,
+            self.dependencies,
+            self.datasets
+        )
+        if usage is not None:
+            await pool.run(usage.touch, lab_image)
+        if runners is not None:
+            try:
+                await self._run_warm(
+                    runners, pool, lab_image, env, cpus, on_task,
+                    metrics, trace_id
+                )
+                return
+            except WarmRunnerException as ex:
+                print(f"{ex}\nПроверка {self.tag_name} в новом контейнере")
+        self._build_docker_file(lab_image, env)
+        host_config = {}
+        if cpuset:
+            host_config['CpusetCpus'] = cpuset
+        with metrics.timer('image_build', trace_id):
+            await self._ensure_lab_image(lab_image)
+            context = await pool.run(make_build_context, self.test_dir)
+            self.build_output = await docker_api.build(
+                context,
+                self.tag_name,
+                labels={JOB_LABEL: 'true'},
+                cpuset=cpuset
+            )
+        try:
+            container_id = await docker_api.create_container(
+                self.tag_name,
+                self.tag_name,
+                labels={JOB_LABEL: 'true'},
+                HostConfig=host_config
+            )
+            try:
+                with metrics.timer('container_run', trace_id):
+                    await docker_api.start_container(container_id)
+                    result_dir = self.test_dir.joinpath(RESULT_DIR_NAME)
+                    await self._follow_container(
+                        pool,
+                        container_id,
+                        result_dir,
+                        on_task
+                    )
+                    await self._read_results(pool, result_dir)
+            finally:
+                await docker_api.remove_container(container_id)
+        finally:
+            await docker_api.remove_image(self.tag_name, force=True)
+
+
+class BatchDockerBuilder(DockerBuilder):
+    """
+    Dockerfile generation class for a batch of jobs of the same lab,
+    whose tests are run by batch_runner.py in one container.
+    Each job is a subdirectory of the batch directory
+    and gets its own report and share of the CPU time of the container.
+    """
+    COPY_TARGET = JOBS_DIR
+
+    def __init__(self,
+                 path_to_folder: Path,
+                 jobs: list[str],
+                 lab_number: int,
+                 test_settings: TestSettings,
+                 datasets: list[Path] | None = None) -> None:
+        """
+        :param path_to_folder: path to the batch directory
+        :param jobs: names of the job subdirectories
+        :param lab_number: laboratory (homework) number
+        :param test_settings: testing policies of the lab
+            from the tests manifest
+        :param datasets: paths to the lab datasets placed into the lab image
+        """
+        super().__init__(path_to_folder, 0, lab_number, test_settings, datasets)
+        self.tag_name = f'batch-{lab_number}-{uuid.uuid4()}'
+        self.jobs = jobs
+        self.reports: dict[str, str | None] = {}
+        self.cpu_times: dict[str, float] = {}
+
+    def get_job_result(self, job: str) -> str | None:
+        """
+        :param job: name of the job subdirectory
+
+        :return str | None: report of the job, None IF there is no report
+            (eg the tests of a previous job crashed the runner)
+        """
+        return self.reports.get(job)
+
+    def get_job_cpu_time(self, job: str) -> float:
+        """
+        :param job: name of the job subdirectory
+
+        :return float: CPU time (sec) of the job
+        """
+        return self.cpu_times.get(job, 0.0)
+
+    async def _read_results(self, pool: WorkerPool, result_dir: Path) -> None:
+        """
+        Read the reports of the jobs saved by the container
+        and split the CPU time of the container between the jobs.
+
+        :param pool: worker pool for the blocking stages
+        :param result_dir: result directory of the batch
+        """
+        usage = {}
+        for it in self.jobs:
+            self.reports[it] = await pool.run(
+                read_result,
+                result_dir.joinpath(it, RESULT_FILE_NAME)
+            )
+            usage[it] = await pool.run(
+                read_cpu_time,
+                result_dir.joinpath(it, CPU_TIME_FILE_NAME)
+            )
+        self.cpu_times = split_cpu_time(self.cpu_time, usage)
+
+    def _task_reader(
+            self,
+            on_task: Callable[[str, TaskReport], Awaitable[None]]
+    ) -> Callable[[str], Awaitable[None]]:
+        """
+        Make the handler of the lines relayed by the batch runner,
+        which passes the task results to on_task together with the job
+        they belong to, named by the runner before the tests of each job.
+
+        :param on_task: coroutine function called with the name
+            of the job subdirectory and a task result
+
+        :return Callable[[str], Awaitable[None]]: line handler
+        """
+        current_job: str | None = None
+
+        async def on_job_task(task: TaskReport) -> None:
+            if current_job is not None:
+                await on_task(current_job, task)
+
+        read_task = DockerBuilder._task_reader(on_job_task)
+
+        async def read_line(line: str) -> None:
+            nonlocal current_job
+            if line.startswith(BATCH_JOB_PREFIX):
+                current_job = line[len(BATCH_JOB_PREFIX):].strip()
+                return
+            await read_task(line)
+        return read_line
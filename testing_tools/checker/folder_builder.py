@@ -1,15 +1,78 @@
 """This module contains a file directory builder with answers and tests"""
-import glob
 import json
+import os
 import shutil
 import uuid
 from datetime import datetime
 from pathlib import Path
 from pydantic.json import pydantic_encoder
-from database.main_db import common_crud
+from model.main_db.discipline import Discipline
 from model.pydantic.queue_in_raw import QueueInRaw
+from model.pydantic.test_manifest import LabTestManifest
+from model.pydantic.test_settings import TestSettings
 from model.queue_db.queue_in import QueueIn
 from testing_tools.logger.report_model import TestLogInit
+from utils.test_manifest import get_dataset_paths, get_manifest,\
+    get_lab_path
+
+
+# the file is present in the job directory while the job is being checked,
+# so that the garbage collector does not remove it
+JOB_RUNNING_MARK = '.running'
+
+
+def _link_or_copy(path_to_file: Path, path_to_dir: Path) -> None:
+    """
+    Hardlink the file into the directory, or copy it
+    if the directory is on another file system.
+
+    :param path_to_file: path to the file
+    :param path_to_dir: directory where the file should appear
+
+    :return None:
+    """
+    try:
+        os.link(path_to_file, path_to_dir.joinpath(path_to_file.name))
+    except OSError:
+        shutil.copy(path_to_file, path_to_dir)
+
+
+def build_batch_folder(folders: list[Path]) -> Path:
+    """
+    Form the directory of a batch of jobs of the same lab, in which
+    the directory of each job becomes a subdirectory with the same name.
+    The files are hardlinked. Blocking: is run in the worker pool.
+
+    :param folders: directories of the jobs of the batch
+
+    :return Path: batch directory, marked as running
+        (remove the mark by release_batch_folder)
+    """
+    batch_folder = folders[0].parent.joinpath(f'batch_{uuid.uuid4()}')
+    batch_folder.mkdir()
+    batch_folder.joinpath(JOB_RUNNING_MARK).touch()
+    for it in folders:
+        shutil.copytree(
+            it,
+            batch_folder.joinpath(it.name),
+            ignore=shutil.ignore_patterns(JOB_RUNNING_MARK),
+            copy_function=lambda src, dst: _link_or_copy(
+                Path(src),
+                Path(dst).parent
+            )
+        )
+    return batch_folder
+
+
+def release_batch_folder(batch_folder: Path) -> None:
+    """
+    Mark the batch directory as no longer used by the check.
+
+    :param batch_folder: batch directory
+
+    :return None:
+    """
+    batch_folder.joinpath(JOB_RUNNING_MARK).unlink(missing_ok=True)
 
 
 class FolderBuilder:
@@ -30,6 +93,8 @@ class FolderBuilder:
         self.docker_folder: Path | None = None
         self.rejected_files = []
         self.is_test_available = False
+        self.lab_manifest: LabTestManifest | None = None
+        self.dataset_paths: list[Path] = []
 
     def get_lab_number(self) -> int:
         """
@@ -39,25 +104,63 @@ class FolderBuilder:
         """
         return self.answer.lab_number
 
-    async def build(self) -> Path:
+    def get_test_settings(self) -> TestSettings | None:
+        """
+        Obtain the testing policies of the lab work from the tests manifest.
+
+        :return TestSettings | None: lab testing policies,
+            None IF there are no tests for this lab
+        """
+        if self.lab_manifest is None:
+            return None
+        return self.lab_manifest.settings
+
+    def get_dataset_paths(self) -> list[Path]:
+        """
+        Obtain the datasets of the lab work from the dataset store
+        of the discipline. They are not copied into the job directory,
+        but placed into the base image of the lab.
+
+        :return list[Path]: paths to the datasets
+        """
+        return self.dataset_paths
+
+    def get_discipline_id(self) -> int:
+        """
+        Obtain the discipline of the submitted work.
+
+        :return int: discipline ID
+        """
+        return self.answer.discipline_id
+
+    def build(self, discipline: Discipline) -> Path:
         """
         Forms a path in a pre-defined directory where the student's 
             answers will be located. And copies his files with the work there.
+        Blocking: is run in the worker pool of the verification subsystem.
+
+        :param discipline: discipline of the submitted work
 
         :return Path: group_name/answers/student_full_name--uuid/...
         """
-        discipline = await common_crud.get_discipline(self.answer.discipline_id)
-        test_path = Path.cwd().joinpath(
-            discipline.path_to_test
-        ).joinpath(str(self.answer.lab_number))
-        original_test_files = glob.glob(f"{test_path}/*")
+        manifest = get_manifest(discipline.path_to_test)
+        self.lab_manifest = manifest.labs.get(self.answer.lab_number)
+        test_path = get_lab_path(
+            discipline.path_to_test,
+            manifest,
+            self.answer.lab_number
+        )
+
+        if self.lab_manifest is not None:
+            self.dataset_paths = get_dataset_paths(
+                discipline.path_to_test,
+                self.lab_manifest.settings
+            )
 
         answers = {Path(file).name for file in self.answer.files_path}
-        tests = {
-            Path(file).name.split("_", 1)[1]
-            for file in original_test_files
-            if 'settings.json' not in file
-        }
+        tests = set()
+        if self.lab_manifest is not None:
+            tests = set(self.lab_manifest.tasks)
 
         self.rejected_files = list(answers.difference(tests))
 
@@ -65,10 +168,6 @@ class FolderBuilder:
         for test_file in answers.intersection(tests):
             temp_test_files.append(test_path.joinpath(f"test_{test_file}"))
 
-        temp_test_files.append(
-            test_path.joinpath('settings.json')
-        )
-
         current_time = datetime.now()
 
         self.docker_folder = self.temp_path.joinpath(
@@ -79,13 +178,18 @@ class FolderBuilder:
             f'{self.student_id}_{uuid.uuid4()}'
         )
         Path(self.docker_folder).mkdir(parents=True, exist_ok=True)
+        self.docker_folder.joinpath(JOB_RUNNING_MARK).touch()
 
         for answer_file in self.answer.files_path:
             if Path(answer_file).name not in self.rejected_files:
                 shutil.copy(answer_file, self.docker_folder)
 
+        # each version of tests is unpacked into its own directory
+        # and never rewritten, so test files can be safely hardlinked;
+        # answers are copied, since the student may overwrite them
+        # by a new upload while this job is waiting for a container
         for test_file in temp_test_files:
-            shutil.copy(test_file, self.docker_folder)
+            _link_or_copy(test_file, self.docker_folder)
 
         formatted_current_time = current_time.replace(microsecond=0)
 
@@ -108,10 +212,24 @@ class FolderBuilder:
                 default=pydantic_encoder
             )
 
-        self.is_test_available = len(self.rejected_files) <= len(answers)
+        # IF every answer is rejected there is nothing to test,
+        # and the job must not take a container slot
+        self.is_test_available = len(self.rejected_files) < len(answers)
 
         return self.docker_folder
 
+    def release(self) -> None:
+        """
+        Mark the job directory as no longer used by the check,
+        after which it can be removed by the garbage collector.
+
+        :return None:
+        """
+        if self.docker_folder is not None:
+            self.docker_folder.joinpath(JOB_RUNNING_MARK).unlink(
+                missing_ok=True
+            )
+
     def get_rejected_file_names(self) -> list[str]:
         """
         Get files that were rejected (failed to pass verification).
@@ -0,0 +1,264 @@
+"""
+This module contains the garbage collector of the verification subsystem:
+it removes the job directories created by the FolderBuilder,
+the images and containers of jobs left by the DockerBuilder
+and the lab images no longer referenced by the tests of the disciplines.
+"""
+import asyncio
+import re
+import shutil
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from database.main_db import admin_crud
+from testing_tools.checker.docker_api import DockerApiException, docker_api
+from testing_tools.checker.docker_builder import JOB_LABEL, LAB_LABEL,\
+    LabImageUsage, get_lab_image_tag
+from testing_tools.checker.folder_builder import JOB_RUNNING_MARK
+from testing_tools.checker.warm_runner import RUNNER_LABEL
+from utils.test_manifest import get_dataset_paths, get_manifest
+
+
+# a job directory marked as running, but not changed for this time (sec),
+# is considered to be left by a stopped or crashed checker
+STALE_JOB_TIME = 24 * 60 * 60
+# images younger than this (sec) may have just been built by a job
+# whose container has not started yet, and containers stopped
+# less than this time ago may still have their logs unread
+FRESH_JOB_TIME = 60 * 60
+
+# job directories of the FolderBuilder and batch directories
+_job_folder_name = re.compile(r'^(\d+|batch)_[0-9a-f-]{36}$')
+
+
+@dataclass
+class ReapReport:
+    """The result of one garbage collection pass"""
+    removed_folders: int = 0
+    removed_containers: int = 0
+    removed_images: int = 0
+    reclaimed_bytes: int = 0
+
+    def __str__(self) -> str:
+        return f'Удалено каталогов заданий: {self.removed_folders}, ' \
+            f'контейнеров: {self.removed_containers}, ' \
+            f'образов: {self.removed_images}, ' \
+            f'освобождено: {self.reclaimed_bytes / 2 ** 20:.1f} МБ'
+
+
+def _get_folder_usage(path: Path) -> tuple[int, float]:
+    """
+    Return the size of the directory and the time of its last change.
+    Hardlinked test files are not counted, since removing them
+    does not free any space.
+
+    :param path: path to the directory
+
+    :return tuple[int, float]: size in bytes, time of the last change
+    """
+    size = 0
+    last_used = path.stat().st_mtime
+    for it in path.rglob('*'):
+        if it.is_file():
+            info = it.stat()
+            if info.st_nlink == 1:
+                size += info.st_size
+            last_used = max(last_used, info.st_mtime)
+    return size, last_used
+
+
+def _parse_time(value: str | None) -> float | None:
+    """
+    :param value: time returned by the Docker Engine API,
+        eg 2024-01-01T00:00:00.123456789Z
+
+    :return float | None: timestamp, None IF the time is not set
+    """
+    if not value or value.startswith('0001-'):
+        return None
+    return datetime.fromisoformat(value).timestamp()
+
+
+def _get_lab_image_tags(paths_to_test: list[str]) -> set[str]:
+    """
+    :param paths_to_test: root directories of the tests of the disciplines
+
+    :return set[str]: tags of the lab images of the current tests
+    """
+    result = set()
+    for path_to_test in paths_to_test:
+        try:
+            manifest = get_manifest(path_to_test)
+        except Exception as ex:
+            print(f"Не удалось прочитать манифест {path_to_test}: {ex}")
+            continue
+        for it in manifest.labs.values():
+            result.add(get_lab_image_tag(
+                it.settings.dependencies,
+                get_dataset_paths(path_to_test, it.settings)
+            ))
+    return result
+
+
+class JobReaper:
+    """
+    Class that periodically keeps the total size of job directories
+    within the disk budget, removing the least recently used ones,
+    and removes images and containers of finished jobs
+    and the lab images of the replaced tests.
+    """
+    def __init__(self,
+                 temp_folder_path: Path,
+                 disk_budget: int,
+                 interval: int = 600,
+                 lab_image_usage: LabImageUsage | None = None):
+        """
+        :param temp_folder_path: path to the temporary directory
+            where the job directories are formed
+        :param disk_budget: allowed total size of job directories (bytes)
+        :param interval: pause between garbage collection passes (sec)
+        :param lab_image_usage: usage times of the lab images
+        """
+        self.temp_folder_path = temp_folder_path
+        self.disk_budget = disk_budget
+        self.interval = interval
+        self.lab_image_usage = lab_image_usage or LabImageUsage(
+            temp_folder_path.joinpath('.lab_images')
+        )
+
+    async def run(self):
+        """
+        Run garbage collection passes with the specified interval
+        and log their results.
+        """
+        while True:
+            report = await self.collect()
+            if report.reclaimed_bytes or report.removed_containers:
+                print(report)
+            await asyncio.sleep(self.interval)
+
+    async def collect(self) -> ReapReport:
+        """
+        Make one garbage collection pass. The job directories are scanned
+        in a separate thread, the docker objects are removed
+        through the Docker Engine API.
+
+        :return ReapReport: what was removed and how much space was reclaimed
+        """
+        report = ReapReport()
+        await asyncio.to_thread(self._collect_folders, report)
+        try:
+            await self._collect_docker(report)
+        except DockerApiException as ex:
+            print(f"Не удалось очистить образы и контейнеры: {ex}")
+        try:
+            await self._collect_lab_images(report)
+        except Exception as ex:
+            # eg the main database is not available
+            print(f"Не удалось очистить образы работ: {ex!r}")
+        return report
+
+    def _collect_folders(self, report: ReapReport) -> None:
+        """
+        Remove the least recently used job directories
+        until their total size fits into the disk budget.
+        Directories of running jobs are skipped.
+
+        :param report: report of the current pass
+
+        :return None:
+        """
+        jobs = []
+        for it in self.temp_folder_path.glob('*/*/*'):
+            if it.is_dir() and _job_folder_name.match(it.name):
+                size, last_used = _get_folder_usage(it)
+                jobs.append((last_used, size, it))
+
+        total = sum(size for _, size, _ in jobs)
+        now = time.time()
+        for last_used, size, path in sorted(jobs, key=lambda x: x[0]):
+            if total <= self.disk_budget:
+                break
+            if path.joinpath(JOB_RUNNING_MARK).exists() and \
+                    now - last_used < STALE_JOB_TIME:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            report.removed_folders += 1
+            report.reclaimed_bytes += size
+
+    async def _collect_docker(self, report: ReapReport) -> None:
+        """
+        Remove stopped containers and unused images of jobs.
+
+        :param report: report of the current pass
+
+        :return None:
+        """
+        now = time.time()
+        for container in await docker_api.list_containers(JOB_LABEL):
+            if container['State'] not in ['exited', 'dead']:
+                continue
+            details = await docker_api.inspect_container(container['Id'])
+            finished_at = _parse_time(details['State'].get('FinishedAt'))
+            if finished_at is not None and \
+                    now - finished_at < FRESH_JOB_TIME:
+                continue
+            await docker_api.remove_container(container['Id'])
+            report.removed_containers += 1
+
+        for image in await docker_api.list_images(JOB_LABEL):
+            if now - image['Created'] < FRESH_JOB_TIME:
+                continue
+            try:
+                await docker_api.remove_image(image['Id'])
+            except DockerApiException:
+                # the image is still used by a running container
+                continue
+            report.removed_images += 1
+            report.reclaimed_bytes += image.get('Size') or 0
+
+    async def _collect_lab_images(self, report: ReapReport) -> None:
+        """
+        Remove the lab images that no lab of the current tests refers to
+        (eg after its dependencies or datasets were changed), the least
+        recently used first. The images used by the warm runners
+        and the images used less than FRESH_JOB_TIME ago are kept.
+
+        :param report: report of the current pass
+
+        :return None:
+        """
+        paths = [it.path_to_test for it in await admin_crud.get_all_disciplines()]
+        referenced = await asyncio.to_thread(_get_lab_image_tags, paths)
+        in_use = {
+            it['ImageID']
+            for it in await docker_api.list_containers(
+                RUNNER_LABEL,
+                all_containers=False
+            )
+        }
+        now = time.time()
+        images = []
+        for image in await docker_api.list_images(LAB_LABEL):
+            tags = image.get('RepoTags') or []
+            if image['Id'] in in_use or referenced.intersection(tags):
+                continue
+            last_used = max(
+                [image['Created']] +
+                [self.lab_image_usage.get_last_used(it) or 0 for it in tags]
+            )
+            images.append((last_used, tags, image))
+        for last_used, tags, image in sorted(images, key=lambda x: x[0]):
+            if now - last_used < FRESH_JOB_TIME:
+                break
+            try:
+                await docker_api.remove_image(image['Id'])
+            except DockerApiException:
+                # the image is still used by a job image or a container
+                continue
+            for it in tags:
+                self.lab_image_usage.forget(it)
+            report.removed_images += 1
+            report.reclaimed_bytes += image.get('Size') or 0
@@ -3,7 +3,6 @@ This module contains the necessary functionality to check the student's
 answers (solution files) to global and local policies.
 """
 import glob
-import json
 import os
 import re
 from pathlib import Path
@@ -17,16 +16,19 @@ class KeyWordsController:
     and rejects answer files that do not meet the conditions 
     (presence of imports, presence or absence of keywords)
     """
-    def __init__(self, path_to_folder: Path) -> None:
+    def __init__(self,
+                 path_to_folder: Path,
+                 test_settings: TestSettings) -> None:
         """
-        :param path_to_folder: The path where the policy file for testing 
-            a specific lab is located.
+        :param path_to_folder: The path where the student's answers
+            and tests for a specific lab are located.
+        :param test_settings: testing policies of the lab
+            from the tests manifest
         """
         self.test_dir = path_to_folder
-        self.file_path = path_to_folder.joinpath('settings.json')
-        with open(self.file_path, encoding='utf-8') as file:
-            data = json.load(file)
-        self.test_settings = TestSettings(**data)
+        # the local policies are cleaned during the check,
+        # so the manifest shared by all jobs must not be changed
+        self.test_settings = test_settings.copy(deep=True)
         self.rejected_files: list[str] = []
         self.is_test_available = False
 
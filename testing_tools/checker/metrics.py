@@ -0,0 +1,221 @@
+"""
+This module contains the in-process registry of the timing histograms
+of the verification subsystem: how long each step of a job takes
+(building the job directory, keywords check, image build, container run,
+writing and sending the result). The histograms are exported in the
+Prometheus text format and summarized in the periodic log line.
+"""
+import math
+import time
+from contextlib import contextmanager
+from aiohttp import web
+from utils.tracing import record_span
+
+
+# upper bounds of the histogram buckets (sec)
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+# prefix of the keys of the histograms in the checker statistics
+TIMING_PREFIX = 'timing:'
+
+
+class Histogram:
+    """Cumulative histogram of durations"""
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        :param buckets: upper bounds of the buckets in ascending order
+        """
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """
+        :param value: measured duration (sec)
+        """
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self) -> dict[str, float]:
+        """
+        :return dict[str, float]: number and sum of the durations
+            and the number of durations in each bucket (not cumulative),
+            so that the snapshots of several processes can be summed
+        """
+        result = {'count': self.count, 'sum': self.sum}
+        for bound, count in zip(self.buckets, self.counts):
+            result[f'le_{bound}'] = count
+        result['le_inf'] = self.counts[-1]
+        return result
+
+
+def quantile(snapshot: dict[str, float], q: float) -> float:
+    """
+    Estimate the quantile of the durations as the upper bound
+    of the bucket it falls into.
+
+    :param snapshot: histogram snapshot (see Histogram.snapshot)
+    :param q: quantile, eg 0.95
+
+    :return float: estimated duration (sec), inf IF it exceeds
+        the largest bucket, 0 IF there are no durations
+    """
+    if not snapshot['count']:
+        return 0.0
+    rank = q * snapshot['count']
+    total = 0
+    for key, count in snapshot.items():
+        if not key.startswith('le_'):
+            continue
+        total += count
+        if total >= rank:
+            return float(key[len('le_'):])
+    return math.inf
+
+
+class MetricsRegistry:
+    """Named timing histograms of the checker"""
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        :param buckets: upper bounds of the buckets of the histograms
+        """
+        self.buckets = buckets
+        self.histograms: dict[str, Histogram] = {}
+
+    def observe(self,
+                name: str,
+                seconds: float,
+                trace_id: str | None = None) -> None:
+        """
+        :param name: name of the measured step
+        :param seconds: duration of the step, which has just ended
+        :param trace_id: IF set, the step is also recorded
+            as a span of the submission trace
+        """
+        if name not in self.histograms:
+            self.histograms[name] = Histogram(self.buckets)
+        self.histograms[name].observe(seconds)
+        if trace_id is not None:
+            end = time.time()
+            record_span(trace_id, 'checker', name, end - seconds, end)
+
+    @contextmanager
+    def timer(self, name: str, trace_id: str | None = None):
+        """
+        Measure the duration of the block, including the time
+        spent waiting in the event loop. A failed step is measured too.
+
+        :param name: name of the measured step
+        :param trace_id: IF set, the step is also recorded
+            as a span of the submission trace
+        """
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - start, trace_id)
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        """
+        :return dict[str, dict[str, float]]: snapshots of the histograms
+            with keys prefixed by TIMING_PREFIX, to be added
+            to the checker statistics
+        """
+        return {
+            f'{TIMING_PREFIX}{name}': histogram.snapshot()
+            for name, histogram in self.histograms.items()
+        }
+
+
+def render_prometheus(stats: dict[str, dict[str, float]]) -> str:
+    """
+    Make the Prometheus text exposition of the timing histograms.
+
+    :param stats: checker statistics with the histogram snapshots
+
+    :return str: metrics in the Prometheus text format
+    """
+    lines = [
+        '# HELP checker_step_duration_seconds Duration of the job steps',
+        '# TYPE checker_step_duration_seconds histogram',
+    ]
+    for key, snapshot in sorted(stats.items()):
+        if not key.startswith(TIMING_PREFIX):
+            continue
+        step = key[len(TIMING_PREFIX):]
+        total = 0
+        for bucket, count in snapshot.items():
+            if not bucket.startswith('le_'):
+                continue
+            total += count
+            bound = bucket[len('le_'):]
+            bound = '+Inf' if bound == 'inf' else bound
+            lines.append(
+                f'checker_step_duration_seconds_bucket'
+                f'{{step="{step}",le="{bound}"}} {total}'
+            )
+        lines.append(
+            f'checker_step_duration_seconds_sum{{step="{step}"}} '
+            f'{snapshot["sum"]}'
+        )
+        lines.append(
+            f'checker_step_duration_seconds_count{{step="{step}"}} '
+            f'{snapshot["count"]}'
+        )
+    return '\n'.join(lines) + '\n'
+
+
+def format_timings(stats: dict[str, dict[str, float]]) -> str:
+    """
+    Make the part of the log line with the durations of the job steps.
+
+    :param stats: checker statistics with the histogram snapshots
+
+    :return str: average and 95th percentile of each step
+    """
+    parts = []
+    for key, snapshot in stats.items():
+        if not key.startswith(TIMING_PREFIX) or not snapshot['count']:
+            continue
+        parts.append(
+            f"{key[len(TIMING_PREFIX):]} "
+            f"{snapshot['sum'] / snapshot['count']:.2f}/"
+            f"{quantile(snapshot, 0.95):g} с"
+        )
+    if not parts:
+        return ''
+    return 'время шагов (средне/p95): ' + ', '.join(parts)
+
+
+async def start_metrics_server(registry: MetricsRegistry,
+                               port: int,
+                               host: str = '0.0.0.0') -> web.AppRunner:
+    """
+    Start the HTTP endpoint /metrics with the timing histograms
+    in the Prometheus text format.
+
+    :param registry: registry of the histograms
+    :param port: port of the endpoint
+    :param host: address of the endpoint
+
+    :return web.AppRunner: runner to stop the endpoint with
+    """
+    async def handle_metrics(request: web.Request) -> web.Response:
+        return web.Response(
+            text=render_prometheus(registry.snapshot()),
+            content_type='text/plain',
+            charset='utf-8'
+        )
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
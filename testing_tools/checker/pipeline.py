@@ -0,0 +1,106 @@
+"""
+This module contains a pipeline of job processing stages connected
+by bounded queues. Each stage has its own number of workers,
+so the stages of different jobs are executed at the same time,
+and a full queue of the next stage slows down the previous one.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable
+from testing_tools.checker.worker_pool import ConcurrencyMeter
+
+
+class PipelineStage:
+    """A stage of the pipeline with its input queue and workers"""
+    def __init__(self,
+                 name: str,
+                 handler: Callable[[Any], Awaitable[Any | None]],
+                 workers: int = 1,
+                 queue_size: int = 1):
+        """
+        :param name: stage name, used in logs and statistics
+        :param handler: coroutine function processing a job. Returns
+            the job for the next stage, or None IF the job is finished
+        :param workers: number of jobs processed by the stage at a time
+        :param queue_size: number of jobs waiting for the stage
+        """
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.meter = ConcurrencyMeter()
+
+
+class Pipeline:
+    """Runs jobs through the sequence of stages"""
+    def __init__(self,
+                 stages: list[PipelineStage],
+                 on_finish: Callable[[Any], Awaitable[None]],
+                 on_fail: Callable[[Any, Exception], Awaitable[None]]):
+        """
+        :param stages: stages in the order of processing
+        :param on_finish: coroutine function called for each job
+            that left the pipeline: passed all the stages
+            or was finished early
+        :param on_fail: coroutine function called for each job
+            whose stage handler raised an exception, with the exception
+        """
+        self.stages = stages
+        self.on_finish = on_finish
+        self.on_fail = on_fail
+
+    async def put(self, job: Any) -> None:
+        """
+        Put the job into the first stage, waiting while its queue is full.
+
+        :param job: job to process
+        """
+        await self.stages[0].queue.put(job)
+
+    async def run(self) -> None:
+        """Start the workers of all stages"""
+        async with asyncio.TaskGroup() as tg:
+            for index, stage in enumerate(self.stages):
+                for _ in range(stage.workers):
+                    tg.create_task(self._work(index))
+
+    async def _work(self, index: int) -> None:
+        """
+        Worker of the stage: takes jobs from the stage queue,
+        processes them and passes them to the next stage.
+
+        :param index: stage index
+        """
+        stage = self.stages[index]
+        while True:
+            job = await stage.queue.get()
+            try:
+                with stage.meter:
+                    result = await stage.handler(job)
+            except Exception as ex:
+                print(f"Ошибка на этапе {stage.name}: {ex!r}")
+                await self.on_fail(job, ex)
+                continue
+            finally:
+                stage.queue.task_done()
+
+            if result is None or index + 1 == len(self.stages):
+                await self.on_finish(job)
+            else:
+                await self.stages[index + 1].queue.put(result)
+
+    def get_stats(self, reset: bool = True) -> dict[str, dict[str, float]]:
+        """
+        Return the measurements of each stage.
+
+        :param reset: start a new measurement period
+
+        :return dict[str, dict[str, float]]: for each stage the length
+            of its queue, the current, peak and average number
+            of processed jobs and the number of completed ones
+        """
+        return {
+            stage.name: {
+                'queue': stage.queue.qsize(),
+                **stage.meter.snapshot(reset)
+            } for stage in self.stages
+        }
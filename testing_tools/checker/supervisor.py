@@ -0,0 +1,326 @@
+"""
+This module contains the supervisor of the checker worker processes.
+Each worker process runs its own TaskProcessing with its own event loop
+and claims jobs from the shared input queue, so the folder building,
+keyword scanning and report parsing of different jobs use different
+CPU cores instead of sharing one GIL.
+"""
+import asyncio
+import multiprocessing
+import os
+import queue
+import signal
+import time
+from multiprocessing.queues import Queue
+from pathlib import Path
+from sys import platform
+from testing_tools.checker.cpu_allocator import CpuAllocator, format_cpuset
+from testing_tools.checker.task_processing import TaskProcessing, format_stats
+
+
+# a worker that crashed earlier than this time (sec) after its start
+# is restarted with a growing delay, so that a worker failing
+# at startup does not restart in a busy loop
+MIN_WORKER_UPTIME = 60
+MAX_RESTART_DELAY = 60
+
+
+def _run_worker(index: int,
+                temp_folder_path: Path,
+                docker_amount_restriction: int,
+                run_reaper: bool,
+                stats_queue: Queue,
+                cpuset: str,
+                metrics_port: int,
+                min_slots: int,
+                max_slots: int) -> None:
+    """
+    Entry point of the checker worker process.
+    IF the CHECKER_NODE_ID environment variable is set,
+    the worker number and pid are appended to it, so that each worker
+    is a separate node of the fleet with its own records and containers.
+
+    :param index: worker number
+    :param temp_folder_path: path to the temporary directory
+    :param docker_amount_restriction: limit on the number
+        of simultaneously running containers of the worker
+    :param run_reaper: the worker runs the garbage collector
+    :param stats_queue: queue for sending statistics to the supervisor
+    :param cpuset: CPU cores distributed between the checks of the worker
+    :param metrics_port: port of the Prometheus endpoint of the worker,
+        0 IF the endpoint is disabled
+    :param min_slots: lower bound of the container limit of the worker
+    :param max_slots: upper bound of the container limit of the worker
+
+    :return None:
+    """
+    os.environ["CHECKER_CPUSET"] = cpuset
+    if os.getenv("CHECKER_NODE_ID"):
+        os.environ["CHECKER_NODE_ID"] += f'-{index}-{os.getpid()}'
+    if metrics_port:
+        os.environ["CHECKER_METRICS_PORT"] = str(metrics_port)
+    if platform == 'win32':
+        # IF OS == WINDOWS:
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    try:
+        asyncio.run(
+            TaskProcessing(
+                temp_folder_path,
+                docker_amount_restriction,
+                run_reaper,
+                stats_queue,
+                handle_sigterm=True,
+                min_slots=min_slots,
+                max_slots=max_slots
+            ).run()
+        )
+    except KeyboardInterrupt:
+        pass
+
+
+def _split_amount(amount: int, processes: int, index: int) -> int:
+    """
+    Get the share of the worker in the amount divided between the workers.
+
+    :param amount: total amount
+    :param processes: number of worker processes
+    :param index: worker number
+
+    :return int: share of the worker, at least one
+    """
+    return max(1, amount // processes + (index < amount % processes))
+
+
+def _merge_stats(
+        stats: list[dict[str, dict[str, float]]]
+) -> dict[str, dict[str, float]]:
+    """
+    Sum the measurements of the worker processes.
+    The peak values are summed too, so they are an upper bound.
+
+    :param stats: measurements of each worker
+
+    :return dict[str, dict[str, float]]: total measurements
+    """
+    result = {}
+    for it in stats:
+        for name, values in it.items():
+            total = result.setdefault(name, {})
+            for key, value in values.items():
+                total[key] = total.get(key, 0) + value
+    return result
+
+
+class WorkerSlot:
+    """A worker process and the information needed to restart it"""
+    def __init__(self,
+                 index: int,
+                 docker_amount_restriction: int,
+                 cpus: list[int],
+                 min_slots: int,
+                 max_slots: int):
+        """
+        :param index: worker number
+        :param docker_amount_restriction: limit on the number
+            of simultaneously running containers of the worker
+        :param cpus: CPU cores distributed between the checks of the worker
+        :param min_slots: lower bound of the container limit of the worker
+        :param max_slots: upper bound of the container limit of the worker
+        """
+        self.index = index
+        self.docker_amount_restriction = docker_amount_restriction
+        self.cpus = cpus
+        self.min_slots = min_slots
+        self.max_slots = max_slots
+        self.process: multiprocessing.Process | None = None
+        self.started_at = 0.0
+        self.restart_delay = 0
+        self.restart_at = 0.0
+
+
+class CheckerSupervisor:
+    """
+    Class that starts the checker worker processes, restarts the crashed
+    ones and periodically logs their total statistics.
+    """
+    def __init__(self,
+                 temp_folder_path: Path,
+                 docker_amount_restriction: int,
+                 processes: int):
+        """
+        :param temp_folder_path: path to the temporary directory
+            where directories for creating docker containers will be formed
+        :param docker_amount_restriction: limit on the number
+            of simultaneously running containers of all workers.
+            It is divided between the workers, each gets at least one.
+            The CPU cores for the checks and the bounds of the container
+            limit (CHECKER_MIN_SLOTS / CHECKER_MAX_SLOTS) are divided
+            between them too
+        :param processes: number of worker processes, no more than
+            the number of the CPU cores for the checks, so that the cores
+            of the workers do not overlap
+        """
+        self.temp_folder_path = temp_folder_path
+        self.stats_interval = int(os.getenv("CHECKER_STATS_INTERVAL", "60"))
+        # spawn: the workers must not inherit the event loop
+        # and the DB connections of the supervisor
+        self.context = multiprocessing.get_context('spawn')
+        self.stats_queue = self.context.Queue()
+        self.stats: dict[int, dict[str, dict[str, float]]] = {}
+        self.pool_size = int(os.getenv("CHECKER_POOL_SIZE", "0"))
+        # the workers are given this time (sec) to finish their jobs on stop
+        self.drain_timeout = int(os.getenv("CHECKER_DRAIN_TIMEOUT", "120"))
+        self.stopping = False
+        # each worker exports its metrics on its own port: port + index
+        self.metrics_port = int(os.getenv("CHECKER_METRICS_PORT", "0"))
+        cpus = CpuAllocator().cpus
+        if processes > len(cpus):
+            print(f"Процессов проверки ({processes}) больше, чем ядер "
+                  f"процессора для проверок ({len(cpus)}), "
+                  f"запускается {len(cpus)}")
+            processes = len(cpus)
+        max_slots = int(
+            os.getenv("CHECKER_MAX_SLOTS", str(docker_amount_restriction))
+        )
+        min_slots = int(
+            os.getenv("CHECKER_MIN_SLOTS", str(docker_amount_restriction))
+        )
+        self.slots = [
+            WorkerSlot(
+                index,
+                _split_amount(docker_amount_restriction, processes, index),
+                cpus[index * len(cpus) // processes:
+                     (index + 1) * len(cpus) // processes],
+                _split_amount(min_slots, processes, index),
+                _split_amount(max_slots, processes, index)
+            ) for index in range(processes)
+        ]
+
+    def _start(self, slot: WorkerSlot) -> None:
+        """
+        Start the worker process of the slot.
+        Only the first worker runs the garbage collector.
+
+        :param slot: worker slot
+
+        :return None:
+        """
+        slot.process = self.context.Process(
+            target=_run_worker,
+            args=(slot.index,
+                  self.temp_folder_path,
+                  slot.docker_amount_restriction,
+                  slot.index == 0,
+                  self.stats_queue,
+                  format_cpuset(slot.cpus),
+                  self.metrics_port + slot.index if self.metrics_port else 0,
+                  slot.min_slots,
+                  slot.max_slots),
+            name=f'checker-{slot.index}',
+            daemon=True
+        )
+        slot.process.start()
+        slot.started_at = time.monotonic()
+        print(f"Запущен процесс проверки {slot.index} (pid {slot.process.pid})")
+
+    def _watch(self, slot: WorkerSlot) -> None:
+        """
+        Restart the worker IF its process has exited.
+
+        :param slot: worker slot
+
+        :return None:
+        """
+        now = time.monotonic()
+        if slot.process is not None:
+            if slot.process.is_alive():
+                return
+            print(
+                f"Процесс проверки {slot.index} (pid {slot.process.pid}) "
+                f"завершился с кодом {slot.process.exitcode}"
+            )
+            self.stats.pop(slot.process.pid, None)
+            if now - slot.started_at < MIN_WORKER_UPTIME:
+                slot.restart_delay = min(
+                    MAX_RESTART_DELAY,
+                    max(1, slot.restart_delay * 2)
+                )
+            else:
+                slot.restart_delay = 0
+            slot.restart_at = now + slot.restart_delay
+            slot.process = None
+        if now >= slot.restart_at:
+            self._start(slot)
+
+    def _receive_stats(self, timeout: float) -> None:
+        """
+        Receive the statistics sent by the workers.
+
+        :param timeout: time to wait for the first message (sec)
+
+        :return None:
+        """
+        try:
+            pid, stats = self.stats_queue.get(timeout=timeout)
+            self.stats[pid] = stats
+            while True:
+                pid, stats = self.stats_queue.get_nowait()
+                self.stats[pid] = stats
+        except queue.Empty:
+            pass
+
+    def get_stats(self) -> dict[str, dict[str, float]]:
+        """
+        :return dict[str, dict[str, float]]: total measurements
+            of the workers for the last reported period
+        """
+        return _merge_stats(list(self.stats.values()))
+
+    def stop(self, *_) -> None:
+        """
+        Stop supervising: the workers are sent SIGTERM and finish
+        the jobs being checked. Used as the SIGTERM handler.
+        """
+        self.stopping = True
+
+    def run(self) -> None:
+        """
+        Start the workers and supervise them until interrupted or stopped.
+        The workers are stopped gracefully, those still running
+        after the drain timeout are killed.
+
+        :return None:
+        """
+        if platform != 'win32':
+            signal.signal(signal.SIGTERM, self.stop)
+        for slot in self.slots:
+            self._start(slot)
+        last_report = time.monotonic()
+        try:
+            while not self.stopping:
+                self._receive_stats(timeout=1)
+                for slot in self.slots:
+                    self._watch(slot)
+                if self.stats and \
+                        time.monotonic() - last_report >= self.stats_interval:
+                    last_report = time.monotonic()
+                    pool_size = self.pool_size * len(self.slots) or sum(
+                        it.docker_amount_restriction for it in self.slots
+                    )
+                    print(
+                        f"[{len(self.stats)} проц.] " +
+                        format_stats(self.get_stats(), pool_size)
+                    )
+                    self.stats.clear()
+        finally:
+            for slot in self.slots:
+                if slot.process is not None and slot.process.is_alive():
+                    slot.process.terminate()
+            deadline = time.monotonic() + self.drain_timeout + 30
+            for slot in self.slots:
+                if slot.process is None:
+                    continue
+                slot.process.join(timeout=max(0.0, deadline - time.monotonic()))
+                if slot.process.is_alive():
+                    slot.process.kill()
+                    slot.process.join()
@@ -4,126 +4,978 @@ answers directly from the student
 """
 import asyncio
 import json
+import os
+import shutil
+import signal
+import socket
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import timedelta
+from multiprocessing.queues import Queue
 from pathlib import Path
+from sys import platform
 from database.main_db import common_crud
-from database.queue_db import queue_in_crud, rejected_crud, queue_out_crud
+from database.queue_db import checker_node_crud, progress_crud, \
+    queue_in_crud, rejected_crud, queue_out_crud
 from model.pydantic.queue_in_raw import QueueInRaw
-from model.pydantic.queue_out_raw import TaskResult, TestResult
+from model.pydantic.queue_out_raw import TaskResult, TestProgress,\
+    TestResult
 from model.pydantic.test_rejected_files import TestRejectedFiles, RejectedType
+from model.pydantic.test_settings import TestSettings
 from model.queue_db.queue_in import QueueIn
-from testing_tools.checker.docker_builder import DockerBuilder
-from testing_tools.checker.folder_builder import FolderBuilder
+from testing_tools.checker.autoscaler import Autoscaler, SlotLimiter
+from testing_tools.checker.cpu_allocator import CpuAllocator
+from testing_tools.checker.docker_api import DockerApiException, docker_api
+from testing_tools.checker.docker_builder import BatchDockerBuilder,\
+    DockerBuilder, LabImageUsage
+from testing_tools.checker.folder_builder import FolderBuilder,\
+    build_batch_folder, release_batch_folder
+from testing_tools.checker.job_reaper import JobReaper
 from testing_tools.checker.keywords_controller import KeyWordsController
-from testing_tools.logger.report_model import LabReport, LabReportException
+from testing_tools.checker.metrics import MetricsRegistry, format_timings,\
+    start_metrics_server
+from testing_tools.checker.pipeline import Pipeline, PipelineStage
+from testing_tools.checker.warm_runner import WarmRunners
+from testing_tools.checker.worker_pool import ConcurrencyMeter, WorkerPool
+from testing_tools.logger.report_model import LabReport, TaskReport
+from utils.tracing import record_span
+
+
+STAGES = ['prepare', 'policy', 'run', 'persist', 'notify']
+# period (sec) over which the throughput of the node is measured
+THROUGHPUT_WINDOW = 300
+# number of the last checks whose duration is averaged
+JOB_TIME_SAMPLES = 20
+
+
+class CheckerShutdown(Exception):
+    """The node has finished draining and stops the pipeline"""
+
+
+def _parse_stage_workers(value: str | None) -> dict[str, int]:
+    """
+    Parse the number of workers of the pipeline stages.
+
+    :param value: string like "prepare:2,policy:2,persist:1"
+
+    :return dict[str, int]: stage name: number of workers
+    """
+    result = {}
+    if not value:
+        return result
+    for it in value.split(','):
+        name, amount = it.split(':')
+        if name.strip() not in STAGES:
+            raise ValueError(f'Неизвестный этап проверки: {name}')
+        result[name.strip()] = int(amount)
+    return result
+
+
+@dataclass
+class CheckerJob:
+    """
+    The state of the student's answers passing through the stages
+    of the verification pipeline
+    """
+    record: QueueIn
+    folder_builder: FolderBuilder
+    docker_folder_path: Path | None = None
+    lab_report: LabReport | None = None
+    # CPU time (sec) of the tests, measured by the checker
+    cpu_time: float = 0.0
+    claimed_at: float = 0.0
+    failed: bool = False
+    # the result is written to the main DB / sent to the bot
+    persisted: bool = False
+    notified: bool = False
+
+    @property
+    def trace_id(self) -> str | None:
+        """Trace of the submission, generated when it was uploaded"""
+        return self.folder_builder.answer.trace_id
+
+
+@dataclass
+class CheckerBatch:
+    """
+    Jobs of the same lab passing through the pipeline together,
+    whose tests are run in one container. Without batching
+    (CHECKER_BATCH_SIZE = 1) each batch consists of one job.
+    The jobs finished early leave the batch.
+    """
+    jobs: list[CheckerJob]
 
 
 class TaskProcessing:
-    """Main class of the verification subsystem"""
+    """
+    Main class of the verification subsystem.
+    Jobs pass through the pipeline of stages: prepare (job directory),
+    policy (keywords check), run (docker container), persist (writing
+    the result to the main DB) and notify (sending the result to the bot).
+    The stages are connected by bounded queues and have their own
+    number of workers, so that preparing the next job overlaps
+    with the container run of the previous one.
+    Jobs pass through the pipeline in batches of the jobs of the same lab
+    (see CheckerBatch), the stages process the jobs of a batch together.
+    """
     def __init__(
             self,
             temp_folder_path: Path,
-            docker_amount_restriction: int = 1):
+            docker_amount_restriction: int = 1,
+            run_reaper: bool = True,
+            stats_queue: Queue | None = None,
+            handle_sigterm: bool = False,
+            min_slots: int | None = None,
+            max_slots: int | None = None):
         """
         :param temp_folder: path to the temporary directory 
-            where directories for creating docker containers will be formed
+            where directories for creating docker containers will be formed.
+            IF the JOB_TMPFS_DIR environment variable is set, 
+            the directories are formed there (eg on tmpfs) instead
         :param docker_amount_restriction: limit on the number 
-            of simultaneously running containers
+            of simultaneously running containers (workers of the run stage).
+            IF CHECKER_MIN_SLOTS / CHECKER_MAX_SLOTS environment variables
+            set different bounds, the limit is adjusted between them
+            by the autoscaler, starting from this value
+            (see min_slots and max_slots).
+            The number of threads for the blocking stages of jobs is set
+            by the CHECKER_POOL_SIZE environment variable (by default
+            equal to this limit), the number of workers of the other stages
+            by CHECKER_STAGE_WORKERS, the size of the stage queues
+            by CHECKER_STAGE_QUEUE_SIZE
+        :param run_reaper: run the garbage collector of job directories,
+            images and containers. Only one of the checker processes
+            sharing the temporary directory should run it
+        :param stats_queue: IF set, the statistics are sent to this queue
+            of the supervisor of the checker processes instead of the log
+        :param handle_sigterm: stop gracefully on SIGTERM (see stop).
+            Only the processes running nothing but the checker should set it
+        :param min_slots: lower bound of the container limit,
+            by default read from CHECKER_MIN_SLOTS
+        :param max_slots: upper bound of the container limit,
+            by default read from CHECKER_MAX_SLOTS. The supervisor
+            of the checker processes divides these bounds between them
+
+        Each instance is a node of the checker fleet registered in the queue DB
+        (ID from the CHECKER_NODE_ID environment variable or hostname-pid).
+        It reports every CHECKER_HEARTBEAT_INTERVAL seconds and returns
+        to the queue the records of nodes silent for 4 such intervals.
+
+        IF the CHECKER_BATCH_SIZE environment variable is greater than 1,
+        together with a record up to this number of waiting records
+        of the same lab are taken, and their tests are run in one container,
+        each job in its own subdirectory with its own logger and report.
+
+        IF the CHECKER_WARM_RUNNER_IDLE environment variable is set,
+        single jobs are run in the warm runner containers of the lab images
+        (see WarmRunners), which exit after this number of idle seconds.
+
+        When stopped (see stop), the node stops taking records and waits
+        CHECKER_DRAIN_TIMEOUT seconds for the jobs being checked.
+
+        A job whose check has failed is returned to the queue,
+        up to CHECKER_MAX_ATTEMPTS checks of the record in total.
+
+        The durations of the job steps are collected into histograms,
+        which are added to the statistics and, IF the CHECKER_METRICS_PORT
+        environment variable is set, exported at http://host:port/metrics
+        in the Prometheus text format.
         """
         self.temp_folder_path = temp_folder_path
+        if os.getenv("JOB_TMPFS_DIR"):
+            self.temp_folder_path = Path(os.getenv("JOB_TMPFS_DIR"))
         self.docker_amount_restriction = docker_amount_restriction
+        if max_slots is None:
+            max_slots = int(
+                os.getenv("CHECKER_MAX_SLOTS", str(docker_amount_restriction))
+            )
+        if min_slots is None:
+            min_slots = int(
+                os.getenv("CHECKER_MIN_SLOTS", str(docker_amount_restriction))
+            )
+        min_slots = min(min_slots, max_slots)
+        self.slots = SlotLimiter(
+            max(min_slots, min(docker_amount_restriction, max_slots))
+        )
+        self.autoscaler = Autoscaler(
+            self.slots,
+            min_slots,
+            max_slots,
+            int(os.getenv("CHECKER_AUTOSCALE_INTERVAL", "30"))
+        )
+        self.lab_image_usage = LabImageUsage(
+            self.temp_folder_path.joinpath('.lab_images')
+        )
+        self.job_reaper = JobReaper(
+            self.temp_folder_path,
+            int(os.getenv("JOB_DISK_BUDGET", "1024")) * 2 ** 20,
+            int(os.getenv("JOB_REAPER_INTERVAL", "600")),
+            self.lab_image_usage
+        )
+        self.cpu_allocator = CpuAllocator()
+        self.job_cpus = int(os.getenv("CHECKER_JOB_CPUS", "0"))
+        self.pool = WorkerPool(
+            int(os.getenv("CHECKER_POOL_SIZE", str(max_slots)))
+        )
+        self.job_meter = ConcurrencyMeter()
+        self.metrics = MetricsRegistry()
+        self.metrics_port = int(os.getenv("CHECKER_METRICS_PORT", "0"))
+        self.stats_interval = int(os.getenv("CHECKER_STATS_INTERVAL", "60"))
+        self.run_reaper = run_reaper
+        self.stats_queue = stats_queue
+        self.host = socket.gethostname()
+        self.node_id = os.getenv("CHECKER_NODE_ID", f'{self.host}-{os.getpid()}')
+        self.heartbeat_interval = int(
+            os.getenv("CHECKER_HEARTBEAT_INTERVAL", "15")
+        )
+        self.batch_size = max(1, int(os.getenv("CHECKER_BATCH_SIZE", "1")))
+        self.handle_sigterm = handle_sigterm
+        self.drain_timeout = int(os.getenv("CHECKER_DRAIN_TIMEOUT", "120"))
+        self.max_attempts = int(os.getenv("CHECKER_MAX_ATTEMPTS", "3"))
+        self.stopping = asyncio.Event()
+        self.drain_deadline = 0.0
+        # jobs taken from the queue and not finished yet: record ID: job
+        self.jobs: dict[int, CheckerJob] = {}
+        # images and containers (named the same) of the running checks
+        self.docker_tags: set[str] = set()
+        # end time and duration of the recent checks, reported
+        # in the heartbeats to estimate the waiting time of the queue
+        self.checked_jobs: deque[tuple[float, float]] = deque(maxlen=1000)
+        self.started_at = time.monotonic()
+        runner_idle_time = int(os.getenv("CHECKER_WARM_RUNNER_IDLE", "0"))
+        self.warm_runners = None
+        if runner_idle_time > 0:
+            self.warm_runners = WarmRunners(
+                self.temp_folder_path,
+                self.node_id,
+                runner_idle_time
+            )
+
+        workers = {
+            'prepare': 1,
+            'policy': 1,
+            'run': max_slots,
+            'persist': 1,
+            'notify': 1,
+        }
+        workers.update(_parse_stage_workers(os.getenv("CHECKER_STAGE_WORKERS")))
+        queue_size = int(os.getenv("CHECKER_STAGE_QUEUE_SIZE", "2"))
+        handlers = {
+            'prepare': self.__for_each(self.__prepare),
+            'policy': self.__for_each(self.__check_policy),
+            'run': self.__run_batch,
+            'persist': self.__for_each(self.__persist),
+            'notify': self.__for_each(self.__notify),
+        }
+        self.pipeline = Pipeline(
+            [PipelineStage(name, handlers[name], workers[name], queue_size)
+             for name in STAGES],
+            self.__finish_batch,
+            self.__fail_batch
+        )
 
     async def run(self):
         """
-        Run creating task groups according to the allowed number 
-        of containers to be launched at a time.
+        Run the pipeline stages, taking jobs from the queue, the heartbeats,
+        the garbage collector and the statistics output until stopped.
+        On exit the unfinished jobs are returned to the queue,
+        and their containers, images and directories are removed.
+        """
+        if self.handle_sigterm and platform != 'win32':
+            asyncio.get_running_loop().add_signal_handler(
+                signal.SIGTERM,
+                self.stop
+            )
+        await self.__send_heartbeat()
+        metrics_server = None
+        if self.metrics_port:
+            metrics_server = await start_metrics_server(
+                self.metrics,
+                self.metrics_port
+            )
+        try:
+            async with asyncio.TaskGroup() as tg:
+                tg.create_task(self.__heartbeat())
+                if self.run_reaper:
+                    tg.create_task(self.job_reaper.run())
+                tg.create_task(self.__report_stats())
+                if self.autoscaler.min_slots < self.autoscaler.max_slots:
+                    tg.create_task(self.autoscaler.run())
+                tg.create_task(self.pipeline.run())
+                tg.create_task(self.__claim_jobs())
+                tg.create_task(self.__drain())
+        except* CheckerShutdown:
+            pass
+        finally:
+            self.pool.shutdown()
+            if metrics_server is not None:
+                await metrics_server.cleanup()
+            if self.warm_runners is not None:
+                await self.warm_runners.close()
+            await self.__remove_orphans()
+            requeued = await checker_node_crud.remove_node(self.node_id)
+            if requeued:
+                print(f"Возвращено в очередь незавершённых заданий: {requeued}")
+
+    def stop(self) -> None:
+        """
+        Stop the node gracefully: no more jobs are taken from the queue,
+        and the jobs being checked are given CHECKER_DRAIN_TIMEOUT seconds
+        to finish. The second call stops the node at once.
+        """
+        if self.stopping.is_set():
+            self.drain_deadline = 0.0
+            return
+        self.drain_deadline = time.monotonic() + self.drain_timeout
+        self.stopping.set()
+
+    async def __drain(self):
+        """
+        Wait for the stop of the node and for the jobs being checked,
+        then stop the pipeline. The jobs not finished by the deadline
+        are cancelled and returned to the queue.
+        """
+        await self.stopping.wait()
+        print(f"Остановка узла {self.node_id}, "
+              f"проверяемых заданий: {len(self.jobs)}")
+        while self.jobs and time.monotonic() < self.drain_deadline:
+            await asyncio.sleep(0.5)
+        raise CheckerShutdown()
+
+    async def __remove_orphans(self):
+        """
+        Remove the containers, images and directories
+        of the checks cancelled by the stop of the node.
+        The records of the cancelled jobs whose result is already written
+        are deleted instead of being returned to the queue,
+        so that they are not graded twice.
         """
-        async with asyncio.TaskGroup() as tg:
-            for _ in range(self.docker_amount_restriction):
-                tg.create_task(self.__task_processing())
+        for tag in list(self.docker_tags):
+            try:
+                await docker_api.remove_container(tag)
+                await docker_api.remove_image(tag, force=True)
+            except DockerApiException as ex:
+                print(f"Не удалось удалить контейнер {tag}: {ex}")
+        self.docker_tags.clear()
+        for job in self.jobs.values():
+            if job.persisted:
+                if not job.notified:
+                    await _send_test_result_to_bot(job.lab_report, job.record)
+                await queue_in_crud.delete_record(job.record.id)
+            if job.docker_folder_path is not None:
+                await asyncio.to_thread(
+                    shutil.rmtree,
+                    job.docker_folder_path,
+                    ignore_errors=True
+                )
+        self.jobs.clear()
+
+    async def __send_heartbeat(self):
+        """Register the node in the fleet or update its report"""
+        job_time, throughput = _summarize_jobs(
+            self.checked_jobs,
+            time.monotonic(),
+            self.started_at
+        )
+        await checker_node_crud.heartbeat(
+            self.node_id,
+            self.host,
+            self.slots.limit,
+            self.job_meter.current,
+            job_time,
+            throughput
+        )
 
-    async def __task_processing(self):
+    async def __heartbeat(self):
         """
-        Take the first record from the input table of the intermediate DB 
-        and send it for verification in a separate docker container, 
-        in a separate thread.
+        Periodically report that the node is alive and return to the queue
+        the records taken by the nodes that stopped reporting.
         """
         while True:
-            await asyncio.sleep(2)
-            if await queue_in_crud.is_not_empty():
-                record = await queue_in_crud.get_first_record()
-                await asyncio.gather(
-                    await asyncio.to_thread(
-                        _run_prepare_docker,
-                        record,
-                        self.temp_folder_path
+            await asyncio.sleep(self.heartbeat_interval)
+            await self.__send_heartbeat()
+            reclaimed = await checker_node_crud.reclaim_jobs(
+                timedelta(seconds=4 * self.heartbeat_interval)
+            )
+            if reclaimed:
+                print(f"Возвращено в очередь заданий остановленных узлов: "
+                      f"{reclaimed}")
+
+    async def __claim_jobs(self):
+        """
+        Take the first record from the input table of the intermediate DB
+        (with the records of the same lab, IF batching is enabled)
+        and put it into the pipeline. A new record is taken only when
+        the worker pool has a free thread and the queue of the first
+        stage has room for it. No records are taken after the stop.
+        """
+        while not self.stopping.is_set():
+            await self.pool.wait_capacity()
+            if self.stopping.is_set():
+                break
+            if not await queue_in_crud.is_not_empty():
+                await asyncio.sleep(2)
+                continue
+            record = await queue_in_crud.get_first_record(self.node_id)
+            if record is None:
+                # the record was taken by another checker node
+                continue
+            records = [record]
+            if self.batch_size > 1:
+                records += await queue_in_crud.get_similar_records(
+                    self.node_id,
+                    record,
+                    self.batch_size - 1
+                )
+            jobs = []
+            for it in records:
+                self.job_meter.enter()
+                job = CheckerJob(
+                    it,
+                    FolderBuilder(self.temp_folder_path, it),
+                    claimed_at=time.monotonic()
+                )
+                self.jobs[it.id] = job
+                jobs.append(job)
+            await self.pipeline.put(CheckerBatch(jobs))
+
+    def __for_each(self, handler):
+        """
+        Make the stage handler that applies the job handler
+        to all jobs of the batch at the same time.
+        The jobs finished early by the handler or failed in it
+        leave the batch and are finished at once.
+
+        :param handler: coroutine function processing a job,
+            returns None IF the job is finished
+
+        :return: coroutine function processing a batch,
+            returns None IF no jobs are left
+        """
+        async def handle(batch: CheckerBatch) -> CheckerBatch | None:
+            results = await asyncio.gather(
+                *(handler(it) for it in batch.jobs),
+                return_exceptions=True
+            )
+            jobs = []
+            for job, result in zip(batch.jobs, results):
+                if isinstance(result, BaseException):
+                    print(f"Ошибка при проверке записи {job.record.id}: "
+                          f"{result!r}")
+                    job.failed = True
+                    await self.__finish_job(job)
+                elif result is None:
+                    await self.__finish_job(job)
+                else:
+                    jobs.append(job)
+            batch.jobs = jobs
+            return batch if jobs else None
+        return handle
+
+    async def __finish_batch(self, batch: CheckerBatch) -> None:
+        """
+        Called when the batch has left the pipeline:
+        the jobs left in the batch are finished.
+
+        :param batch: finished batch
+        """
+        for it in batch.jobs:
+            await self.__finish_job(it)
+
+    async def __fail_batch(self, batch: CheckerBatch, ex: Exception) -> None:
+        """
+        Called when a stage has failed to process the batch:
+        the jobs left in the batch are finished as failed.
+
+        :param batch: failed batch
+        :param ex: exception raised by the stage
+        """
+        for it in batch.jobs:
+            it.failed = True
+            await self.__finish_job(it)
+
+    async def __finish_job(self, job: CheckerJob) -> None:
+        """
+        Called when the job has left the pipeline:
+        the record of the job is deleted from the input table.
+        IF the check of the job has failed, the record is returned
+        to the queue, and after the last attempt the student is told,
+        so that the answers are not lost silently.
+
+        :param job: finished job
+        """
+        job.folder_builder.release()
+        self.job_meter.leave()
+        duration = time.monotonic() - job.claimed_at
+        self.metrics.observe('job', duration, job.trace_id)
+        if job.lab_report is not None:
+            # the jobs rejected before the run do not show the check time
+            self.checked_jobs.append((time.monotonic(), duration))
+        # the job with the written result is not checked again,
+        # so that it is not graded twice
+        if job.failed and not job.persisted and \
+                job.record.attempts + 1 < self.max_attempts:
+            await queue_in_crud.release_record(job.record.id)
+        else:
+            if job.failed:
+                await rejected_crud.add_record(
+                    job.record.telegram_id,
+                    job.record.chat_id,
+                    TestRejectedFiles(
+                        type=RejectedType.CHECKERERROR,
+                        description='Ошибка при проверке ответов, '
+                            'отправьте их повторно',
+                        files=[Path(it).name
+                               for it in job.folder_builder.answer.files_path]
                     )
                 )
+            await queue_in_crud.delete_record(job.record.id)
+        self.jobs.pop(job.record.id, None)
+
+    async def __prepare(self, job: CheckerJob) -> CheckerJob | None:
+        """
+        Build the job directory with the answers and tests
+        and report the answers for which there are no tests.
 
+        :param job: job to process
 
-async def _run_prepare_docker(record: QueueIn, temp_folder_path: Path) -> None:
-    """
-    The function of preparing files for a container and its subsequent launch
+        :return CheckerJob | None: job IF there are answers to check
+        """
+        folder_builder = job.folder_builder
+        discipline = await common_crud.get_discipline(
+            folder_builder.get_discipline_id()
+        )
+        with self.metrics.timer('folder_build', job.trace_id):
+            job.docker_folder_path = await self.pool.run(
+                folder_builder.build,
+                discipline
+            )
+        if folder_builder.has_rejected_files():
+            await rejected_crud.add_record(
+                job.record.telegram_id,
+                job.record.chat_id,
+                TestRejectedFiles(
+                    type=RejectedType.TEMPLATEERROR,
+                    description='Имя файла(-ов) не соответствует \
+                        шаблону для тестирования',
+                    files=folder_builder.get_rejected_file_names()
+                )
+            )
+        if not folder_builder.has_file_for_test():
+            return None
+        return job
 
-    :param record: record from the intermediate database, 
-        with data on the student's uploaded answers
-    :param temp_folder_path: path to the temporary directory where directories
-        for creating docker containers will be formed
-    """
-    folder_builder = FolderBuilder(temp_folder_path, record)
-    docker_folder_path = await folder_builder.build()
-    if folder_builder.has_rejected_files():
-        await rejected_crud.add_record(
-            record.telegram_id,
-            record.chat_id,
-            TestRejectedFiles(
-                type=RejectedType.TEMPLATEERROR,
-                description='Имя файла(-ов) не соответствует \
-                    шаблону для тестирования',
-                files=folder_builder.get_rejected_file_names()
-            )
-        )
-    if not folder_builder.has_file_for_test():
-        return None
+    async def __check_policy(self, job: CheckerJob) -> CheckerJob | None:
+        """
+        Check the answers for the testing policies of the lab
+        and report the rejected ones.
 
-    keywords_controller = KeyWordsController(docker_folder_path)
-    keywords_controller.run()
-    if keywords_controller.has_rejected_files():
-        await rejected_crud.add_record(
-            record.telegram_id,
-            record.chat_id,
-            TestRejectedFiles(
-                type=RejectedType.KEYWORDSERROR,
-                description="В файле(-ах) имеются запрещенные \
-                    ключевые слова, " +
-                    "либо не используются необходимые для решения задачи",
-                files=keywords_controller.get_rejected_file_names()
+        :param job: job to process
+
+        :return CheckerJob | None: job IF there are answers to check
+        """
+        keywords_controller = KeyWordsController(
+            job.docker_folder_path,
+            job.folder_builder.get_test_settings()
+        )
+        with self.metrics.timer('keywords', job.trace_id):
+            await self.pool.run(keywords_controller.run)
+        if keywords_controller.has_rejected_files():
+            await rejected_crud.add_record(
+                job.record.telegram_id,
+                job.record.chat_id,
+                TestRejectedFiles(
+                    type=RejectedType.KEYWORDSERROR,
+                    description="В файле(-ах) имеются запрещенные \
+                        ключевые слова, " +
+                        "либо не используются необходимые для решения задачи",
+                    files=keywords_controller.get_rejected_file_names()
+                )
             )
+
+        if not keywords_controller.has_file_for_test():
+            return None
+        return job
+
+    async def __run_batch(self, batch: CheckerBatch) -> CheckerBatch | None:
+        """
+        Run the tests of the jobs of the batch in one container.
+        The jobs left without a report (eg the tests of a previous job
+        of the batch crashed the runner) and single jobs are run
+        in their own containers.
+
+        :param batch: batch to process
+
+        :return CheckerBatch | None: batch of the jobs whose report was read
+        """
+        if len(batch.jobs) > 1:
+            await self.__run_batch_container(batch.jobs)
+
+        async def run_container(job: CheckerJob) -> CheckerJob | None:
+            if job.lab_report is not None:
+                return job
+            return await self.__run_container(job)
+        return await self.__for_each(run_container)(batch)
+
+    async def __run_docker(self,
+                           docker_builder: DockerBuilder,
+                           settings: TestSettings,
+                           on_task,
+                           trace_id: str | None = None,
+                           jobs: int = 1) -> None:
+        """
+        Run the container (or the job in the warm runner) in a free
+        container slot, pinned to the CPU cores of the check
+        IF the lab (or CHECKER_JOB_CPUS) requires it.
+
+        :param docker_builder: builder of the job or batch image
+        :param settings: testing policies of the lab
+        :param on_task: handler of the task results
+            received while the tests are running
+        :param trace_id: trace of the submission the steps are recorded to
+        :param jobs: number of jobs checked by the container
+        """
+        cpus = settings.cpus or self.job_cpus
+        # a batch is run by its own runner process (batch_runner.py)
+        runners = None if isinstance(docker_builder, BatchDockerBuilder) \
+            else self.warm_runners
+        async with self.slots:
+            start = time.monotonic()
+            # the tag is kept IF the check is cancelled, since
+            # the removal of its container and image may be cancelled too
+            self.docker_tags.add(docker_builder.tag_name)
+            try:
+                if cpus:
+                    taken = await self.cpu_allocator.acquire(cpus)
+                    try:
+                        await docker_builder.run_docker(
+                            self.pool,
+                            taken,
+                            on_task=on_task,
+                            metrics=self.metrics,
+                            trace_id=trace_id,
+                            runners=runners,
+                            usage=self.lab_image_usage
+                        )
+                    finally:
+                        await self.cpu_allocator.release(taken)
+                else:
+                    # without pinning the cores are shared equally
+                    await docker_builder.run_docker(
+                        self.pool,
+                        threads=len(self.cpu_allocator.cpus) // self.slots.limit,
+                        on_task=on_task,
+                        metrics=self.metrics,
+                        trace_id=trace_id,
+                        runners=runners,
+                        usage=self.lab_image_usage
+                    )
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.docker_tags.discard(docker_builder.tag_name)
+                raise
+            self.docker_tags.discard(docker_builder.tag_name)
+            self.autoscaler.observe_duration(
+                (time.monotonic() - start) / jobs
+            )
+
+    async def __run_container(self, job: CheckerJob) -> CheckerJob | None:
+        """
+        Run the tests in the docker container and read the report.
+
+        :param job: job to process
+
+        :return CheckerJob | None: job IF the report was read
+        """
+        settings = job.folder_builder.get_test_settings()
+        docker_builder = DockerBuilder(
+            job.docker_folder_path,
+            job.record.telegram_id,
+            job.folder_builder.get_lab_number(),
+            settings,
+            job.folder_builder.get_dataset_paths()
         )
+        try:
+            await self.__run_docker(
+                docker_builder,
+                settings,
+                _make_progress_reporter(job.record),
+                job.trace_id
+            )
+        finally:
+            # the directory is no longer needed by the next stages
+            job.folder_builder.release()
 
-    if not keywords_controller.has_file_for_test():
-        return None
+        result = docker_builder.get_run_result()
+        if result is None:
+            print(f"Нет отчёта о проверке {docker_builder.tag_name}:\n"
+                  f"{docker_builder.get_diagnostics()}")
+            return None
+        job.lab_report = _read_lab_report(result, docker_builder)
+        job.cpu_time = docker_builder.cpu_time
+        return job if job.lab_report is not None else None
 
-    module_path = Path.cwd().joinpath('testing_tools')
+    async def __run_batch_container(self, jobs: list[CheckerJob]) -> None:
+        """
+        Run the tests of the jobs of the same lab in one container,
+        each job in the subdirectory of the batch directory named
+        as its own directory, and read their reports.
 
-    folder_builder.add_file(module_path.joinpath('conftest.py'))
-    folder_builder.add_file(module_path.joinpath('docker_output.py'))
-    folder_builder.add_dir(module_path.joinpath('logger'))
+        :param jobs: jobs of the batch
+        """
+        first = jobs[0].folder_builder
+        settings = first.get_test_settings()
+        named_jobs = {it.docker_folder_path.name: it for it in jobs}
+        batch_folder = await self.pool.run(
+            build_batch_folder,
+            [it.docker_folder_path for it in jobs]
+        )
+        docker_builder = BatchDockerBuilder(
+            batch_folder,
+            list(named_jobs),
+            first.get_lab_number(),
+            settings,
+            first.get_dataset_paths()
+        )
+        reporters = {
+            name: _make_progress_reporter(job.record)
+            for name, job in named_jobs.items()
+        }
 
-    docker_builder = DockerBuilder(
-        docker_folder_path,
-        record.telegram_id,
-        folder_builder.get_lab_number()
+        async def on_task(name: str, task: TaskReport) -> None:
+            if reporters.get(name) is not None:
+                await reporters[name](task)
+
+        start = time.time()
+        try:
+            await self.__run_docker(
+                docker_builder,
+                settings,
+                on_task,
+                jobs=len(jobs)
+            )
+        except Exception as ex:
+            # the jobs are checked one by one
+            print(f"Ошибка при проверке пакета {docker_builder.tag_name}: "
+                  f"{ex!r}")
+        finally:
+            release_batch_folder(batch_folder)
+        end = time.time()
+
+        for name, job in named_jobs.items():
+            record_span(job.trace_id, 'checker', 'batch_run', start, end)
+            result = docker_builder.get_job_result(name)
+            if result is None:
+                continue
+            job.lab_report = _read_lab_report(result, docker_builder)
+            job.cpu_time = docker_builder.get_job_cpu_time(name)
+            if job.lab_report is not None:
+                job.folder_builder.release()
+        missing = [name for name, job in named_jobs.items()
+                   if job.lab_report is None]
+        if missing:
+            print(f"Нет отчёта о проверке {', '.join(missing)} "
+                  f"в пакете {docker_builder.tag_name}, "
+                  f"задания проверяются отдельно:\n"
+                  f"{docker_builder.get_diagnostics()}")
+
+    async def __persist(self, job: CheckerJob) -> CheckerJob:
+        """
+        Write the test results, the test durations and the CPU time
+        used by the student's check to the main database.
+
+        :param job: job to process
+
+        :return CheckerJob: job
+        """
+        with self.metrics.timer('write_result', job.trace_id):
+            await common_crud.write_test_result(job.lab_report, job.record)
+        job.persisted = True
+        await common_crud.write_test_durations(
+            job.folder_builder.get_discipline_id(),
+            job.lab_report
+        )
+        await common_crud.add_cpu_usage(
+            job.record.telegram_id,
+            job.folder_builder.get_discipline_id(),
+            job.cpu_time
+        )
+        return job
+
+    async def __notify(self, job: CheckerJob) -> CheckerJob:
+        """
+        Send the test results to the bot through the intermediate database.
+
+        :param job: job to process
+
+        :return CheckerJob: job
+        """
+        with self.metrics.timer('send_result', job.trace_id):
+            await _send_test_result_to_bot(job.lab_report, job.record)
+        job.notified = True
+        return job
+
+    def get_stats(self, reset: bool = True) -> dict[str, dict[str, float]]:
+        """
+        Return the measured concurrency of jobs, of the pipeline stages
+        and of the worker pool, the busy and allowed container slots
+        and the histograms of the durations of the job steps.
+        The histograms are not reset, they cover the whole run.
+
+        :param reset: start a new measurement period
+
+        :return dict[str, dict[str, float]]: measurements of jobs,
+            stages, pool and durations
+        """
+        return {
+            'jobs': self.job_meter.snapshot(reset),
+            **self.pipeline.get_stats(reset),
+            'pool': self.pool.meter.snapshot(reset),
+            'slots': {'active': self.slots.active, 'limit': self.slots.limit},
+            **self.metrics.snapshot(),
+        }
+
+    async def __report_stats(self):
+        """
+        Periodically log the effective concurrency of the checker
+        or, IF the checker runs in a worker process,
+        send it to the supervisor.
+        """
+        while True:
+            await asyncio.sleep(self.stats_interval)
+            stats = self.get_stats()
+            if self.stats_queue is not None:
+                self.stats_queue.put((os.getpid(), stats))
+            else:
+                print(format_stats(stats, self.pool.max_workers))
+
+
+def format_stats(stats: dict[str, dict[str, float]], pool_size: int) -> str:
+    """
+    Make the log line with the concurrency of the checker.
+
+    :param stats: measurements (see TaskProcessing.get_stats)
+    :param pool_size: number of threads of the worker pool(s)
+
+    :return str: log line
+    """
+    stages = ', '.join(
+        f"{name} {stats[name]['average']:.2f}"
+        f" (очередь {stats[name]['queue']})"
+        for name in STAGES
     )
-    docker_builder.run_docker()
+    timings = format_timings(stats)
+    return f"Проверка: заданий в работе {stats['jobs']['current']}, " \
+        f"средне {stats['jobs']['average']:.2f} " \
+        f"(пик {stats['jobs']['peak']}, " \
+        f"завершено {stats['jobs']['completed']}); " \
+        f"этапы: {stages}; " \
+        f"контейнеров {stats['slots']['active']} " \
+        f"из {stats['slots']['limit']}; " \
+        f"пул потоков: средне {stats['pool']['average']:.2f} " \
+        f"из {pool_size} (пик {stats['pool']['peak']})" + \
+        (f"; {timings}" if timings else "")
+
 
-    result = docker_builder.get_run_result()
+def _summarize_jobs(checked_jobs: deque[tuple[float, float]],
+                    now: float,
+                    started_at: float) -> tuple[float | None, float]:
+    """
+    :param checked_jobs: end time and duration of the recent checks
+    :param now: current time (time.monotonic)
+    :param started_at: start time of the node (time.monotonic)
+
+    :return tuple[float | None, float]: average duration of the last
+        JOB_TIME_SAMPLES checks (None IF there were none)
+        and the number of checks finished
+        per second during the last THROUGHPUT_WINDOW seconds
+    """
+    job_time = None
+    if checked_jobs:
+        samples = list(checked_jobs)[-JOB_TIME_SAMPLES:]
+        job_time = sum(it[1] for it in samples) / len(samples)
+    window = min(THROUGHPUT_WINDOW, now - started_at)
+    if window <= 0:
+        return job_time, 0.0
+    recent = sum(1 for end, _ in checked_jobs if now - end <= window)
+    return job_time, recent / window
+
+
+def _read_lab_report(result: str,
+                     docker_builder: DockerBuilder) -> LabReport | None:
+    """
+    :param result: report saved by the container
+    :param docker_builder: builder of the job, for diagnostics
+
+    :return LabReport | None: report, None IF it is invalid
+    """
     try:
-        lab_report = LabReport(**json.loads(result))
-    except LabReportException:
-        print("Произошла ошибка, при чтении docker.logs(output)")
+        return LabReport(**json.loads(result))
+    except (TypeError, ValueError) as ex:
+        print(f"Ошибка чтения отчёта о проверке {docker_builder.tag_name}: "
+              f"{ex}\n{docker_builder.get_diagnostics()}")
+        return None
+
+
+def _make_task_result(lab_number: int, task: TaskReport) -> TaskResult:
+    """
+    :param lab_number: lab work number
+    :param task: result of the task test
+
+    :return TaskResult: result of the task for the bot
+    """
+    return TaskResult(
+        task_id=task.task_id,
+        file_name=f'lab{lab_number}-{task.task_id}.py',
+        description=set() if task.status else task.description
+    )
+
+
+def _make_progress_reporter(record: QueueIn):
+    """
+    Make the handler of the task results received while the tests
+    are running, which sends the results collected so far to the bot
+    to update the message about the progress of the check.
+
+    :param record: record from the intermediate database,
+        with data on the student's uploaded answers
 
-    await common_crud.write_test_result(lab_report, record)
-    await _send_test_result_to_bot(lab_report, record)
+    :return: coroutine function receiving a TaskReport,
+        None IF the bot did not send a progress message
+    """
+    straw = QueueInRaw(**json.loads(record.data))
+    if straw.progress_message_id is None:
+        return None
+    tasks: dict[int, TaskReport] = {}
+
+    async def report_task(task: TaskReport) -> None:
+        tasks[task.task_id] = task
+        progress = TestProgress(
+            discipline_id=straw.discipline_id,
+            lab_number=straw.lab_number,
+            message_id=straw.progress_message_id
+        )
+        for it in tasks.values():
+            if it.status:
+                progress.successful_task.append(
+                    _make_task_result(straw.lab_number, it)
+                )
+            else:
+                progress.failed_task.append(
+                    _make_task_result(straw.lab_number, it)
+                )
+        try:
+            await progress_crud.add_record(
+                record.telegram_id,
+                record.chat_id,
+                progress
+            )
+        except Exception as ex:
+            # the progress is optional, the check goes on without it
+            print(f"Не удалось отправить ход проверки: {ex!r}")
+    return report_task
 
 
 async def _send_test_result_to_bot(lab_report: LabReport, record: QueueIn) -> None:
@@ -138,23 +990,17 @@ async def _send_test_result_to_bot(lab_report: LabReport, record: QueueIn) -> No
     straw = QueueInRaw(**json.loads(record.data))
     result_report = TestResult(
         discipline_id=straw.discipline_id,
-        lab_number=straw.lab_number
+        lab_number=straw.lab_number,
+        trace_id=straw.trace_id
     )
     for it in lab_report.tasks:
         if it.status:
             result_report.successful_task.append(
-                TaskResult(
-                    task_id=it.task_id,
-                    file_name=f'lab{straw.lab_number}-{it.task_id}.py'
-                )
+                _make_task_result(straw.lab_number, it)
             )
         else:
             result_report.failed_task.append(
-                TaskResult(
-                    task_id=it.task_id,
-                    file_name=f'lab{straw.lab_number}-{it.task_id}.py',
-                    description=it.description
-                )
+                _make_task_result(straw.lab_number, it)
             )
     await queue_out_crud.add_record(
         record.telegram_id,
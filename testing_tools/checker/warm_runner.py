@@ -0,0 +1,286 @@
+"""
+This module contains the warm runner containers of the verification
+subsystem. A runner is a long-lived container of a lab image running
+zygote.py, which has pytest and the lab dependencies already imported
+and forks a child for each job. The job directory is not packed into
+a new image: its archive is sent over a unix socket, and the child
+runs the tests in a private copy of it as a user of its own
+(see zygote.py). The output, the task results, the report and the CPU
+time of the tests come back in frames of their own types, and the task
+results are taken only from their frames, which the tests can not write to.
+The container of a runner is shared by the jobs, so its CPU time
+can not be split between them, and the CPU time of a job is taken
+by the zygote from the cgroup of the job.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import struct
+import time
+from collections import deque
+from pathlib import Path
+from typing import Awaitable, Callable
+from testing_tools.checker.docker_api import DockerApiException,\
+    OUTPUT_TAIL_LINES, docker_api
+
+
+# label of the runner containers
+RUNNER_LABEL = 'homeworkbot.runner'
+# directory of the runner container with the socket of the zygote
+SOCKET_DIR = '/run/zygote'
+SOCKET_NAME = 'zygote.sock'
+# time (sec) to wait for the zygote to import the dependencies
+RUNNER_START_TIMEOUT = 120
+# frames of the zygote: type byte and 4-byte size, then the data
+FRAME_HEADER = struct.Struct('>cI')
+OUTPUT_FRAME = b'o'
+TASK_FRAME = b't'
+CPU_TIME_FRAME = b'c'
+REPORT_FRAME = b'r'
+# maximum size of a frame and of a line of the job output (bytes)
+MAX_FRAME_SIZE = 2 ** 20
+
+
+class WarmRunnerException(Exception):
+    """The runner could not be started or has failed"""
+
+
+class WarmRunner:
+    """A running runner container of a lab image"""
+    def __init__(self, lab_image: str, container_id: str, socket_path: Path):
+        """
+        :param lab_image: tag of the lab image
+        :param container_id: container ID
+        :param socket_path: path to the socket of the zygote on the host
+        """
+        self.lab_image = lab_image
+        self.container_id = container_id
+        self.socket_path = socket_path
+
+    async def run(self,
+                  archive: bytes,
+                  cpus: list[int] | None = None,
+                  on_event: Callable[[str], Awaitable[None]] | None = None
+                  ) -> tuple[str, str | None, float]:
+        """
+        Run the tests of the job in a child of the zygote.
+
+        :param archive: tar archive of the job directory
+            (see make_build_context)
+        :param cpus: CPU cores the child is pinned to, IF any
+        :param on_event: coroutine function called with each line
+            of the task results as soon as it is received
+
+        :raises WarmRunnerException: IF the zygote is not available
+
+        :return tuple[str, str | None, float]: the last OUTPUT_TAIL_LINES
+            lines of the output, the report, None IF the child saved none,
+            and the CPU time (sec) of the tests measured by the child
+        """
+        try:
+            reader, writer = await asyncio.open_unix_connection(
+                str(self.socket_path)
+            )
+        except OSError as ex:
+            raise WarmRunnerException(
+                f'Раннер {self.lab_image} недоступен: {ex}'
+            ) from ex
+        output = deque(maxlen=OUTPUT_TAIL_LINES)
+        report = None
+        cpu_time = 0.0
+        buffers = {OUTPUT_FRAME: b'', TASK_FRAME: b''}
+
+        async def read_line(kind: bytes, line: bytes) -> None:
+            text = line.decode('utf-8', errors='replace')
+            if kind == OUTPUT_FRAME:
+                output.append(text)
+            elif on_event is not None:
+                await on_event(text)
+
+        try:
+            request = {'size': len(archive), 'cpus': cpus}
+            writer.write((json.dumps(request) + '\n').encode() + archive)
+            await writer.drain()
+            while True:
+                try:
+                    header = await reader.readexactly(FRAME_HEADER.size)
+                except asyncio.IncompleteReadError:
+                    break
+                kind, size = FRAME_HEADER.unpack(header)
+                if size > MAX_FRAME_SIZE:
+                    raise WarmRunnerException(
+                        f'Раннер {self.lab_image}: кадр размером {size} байт'
+                    )
+                try:
+                    data = await reader.readexactly(size)
+                except asyncio.IncompleteReadError:
+                    break
+                if kind == REPORT_FRAME:
+                    report = data.decode('utf-8', errors='replace')
+                    continue
+                if kind == CPU_TIME_FRAME:
+                    cpu_time = float(data)
+                    continue
+                if kind not in buffers:
+                    continue
+                *lines, buffers[kind] = (buffers[kind] + data).split(b'\n')
+                for it in lines:
+                    await read_line(kind, it)
+                if len(buffers[kind]) > MAX_FRAME_SIZE:
+                    await read_line(kind, buffers[kind])
+                    buffers[kind] = b''
+            for kind, buffer in buffers.items():
+                if buffer:
+                    await read_line(kind, buffer)
+        finally:
+            writer.close()
+        return '\n'.join(output), report, cpu_time
+
+
+class WarmRunners:
+    """
+    Class that starts a runner for each lab image on the first job
+    and reuses it for the next jobs. A runner idle for longer than
+    the idle time exits by itself and its container is removed,
+    so the runners of a crashed checker do not stay behind.
+    """
+    def __init__(self,
+                 temp_folder_path: Path,
+                 node_id: str,
+                 idle_time: int = 600):
+        """
+        :param temp_folder_path: directory of the jobs, where
+            the directories of the runner sockets are created
+        :param node_id: ID of the checker node, part of the container names
+        :param idle_time: time (sec) after which an idle runner exits
+        """
+        self.temp_folder_path = temp_folder_path.absolute()
+        self.node_id = node_id
+        self.idle_time = idle_time
+        self.runners: dict[str, WarmRunner] = {}
+        self._starting: dict[str, asyncio.Lock] = {}
+
+    def _get_name(self, lab_image: str) -> str:
+        """
+        :param lab_image: tag of the lab image
+
+        :return str: name of the runner container of the node
+        """
+        digest = hashlib.sha256(
+            f'{self.node_id}/{lab_image}'.encode()
+        ).hexdigest()
+        return f'runner-{digest[:16]}'
+
+    async def get(self,
+                  lab_image: str,
+                  dependencies: list[str] | None,
+                  env: dict[str, str]) -> WarmRunner:
+        """
+        Return the runner of the lab image, starting it IF necessary.
+
+        :param lab_image: tag of the lab image
+        :param dependencies: lab dependencies imported by the zygote
+        :param env: environment variables of the runner. The thread
+            limits of the numerical libraries are applied when they
+            are imported, so they are taken from the job starting the runner
+
+        :raises WarmRunnerException: IF the runner could not be started
+
+        :return WarmRunner: runner
+        """
+        lock = self._starting.setdefault(lab_image, asyncio.Lock())
+        async with lock:
+            runner = self.runners.get(lab_image)
+            if runner is not None and not runner.socket_path.exists():
+                # the runner has exited being idle
+                await self.discard(runner)
+            if lab_image not in self.runners:
+                self.runners[lab_image] = await self._start(
+                    lab_image,
+                    dependencies,
+                    env
+                )
+            return self.runners[lab_image]
+
+    async def _start(self,
+                     lab_image: str,
+                     dependencies: list[str] | None,
+                     env: dict[str, str]) -> WarmRunner:
+        """
+        Start the runner container and wait for the zygote socket.
+
+        :param lab_image: tag of the lab image
+        :param dependencies: lab dependencies imported by the zygote
+        :param env: environment variables of the runner
+
+        :raises WarmRunnerException: IF the runner could not be started
+
+        :return WarmRunner: runner
+        """
+        name = self._get_name(lab_image)
+        socket_dir = self.temp_folder_path.joinpath('.runners', name)
+        socket_dir.mkdir(parents=True, exist_ok=True)
+        socket_path = socket_dir.joinpath(SOCKET_NAME)
+        socket_path.unlink(missing_ok=True)
+        # the zygote runs as root to switch its children to the users
+        # of the jobs, and gives the socket to the checker user
+        owner = os.getuid() if hasattr(os, 'getuid') else 0
+        try:
+            # the runner left by a previous run of the node
+            await docker_api.remove_container(name)
+            container_id = await docker_api.create_container(
+                lab_image,
+                name,
+                labels={RUNNER_LABEL: 'true'},
+                Cmd=['python3', 'zygote.py', *(dependencies or [])],
+                Env=[f'{key}={value}' for key, value in env.items()] +
+                    [f'ZYGOTE_SOCKET_DIR={SOCKET_DIR}',
+                     f'ZYGOTE_IDLE_TIME={self.idle_time}',
+                     f'ZYGOTE_SOCKET_OWNER={owner}'],
+                HostConfig={
+                    'Binds': [f'{socket_dir}:{SOCKET_DIR}'],
+                    'AutoRemove': True,
+                    # the zygote remounts the cgroup tree of the runner
+                    # writable to run each job in a cgroup of its own,
+                    # the tests run without capabilities and privileges
+                    'CgroupnsMode': 'private',
+                    'CapAdd': ['SYS_ADMIN'],
+                    'SecurityOpt': ['apparmor=unconfined'],
+                }
+            )
+            await docker_api.start_container(container_id)
+        except DockerApiException as ex:
+            raise WarmRunnerException(
+                f'Не удалось запустить раннер {lab_image}: {ex}'
+            ) from ex
+
+        deadline = time.monotonic() + RUNNER_START_TIMEOUT
+        while not socket_path.exists():
+            if time.monotonic() > deadline:
+                stdout, stderr = await docker_api.container_logs(container_id)
+                await docker_api.remove_container(container_id)
+                raise WarmRunnerException(
+                    f'Раннер {lab_image} не запустился:\n{stdout}\n{stderr}'
+                )
+            await asyncio.sleep(0.2)
+        print(f"Запущен раннер {name} образа {lab_image}")
+        return WarmRunner(lab_image, container_id, socket_path)
+
+    async def discard(self, runner: WarmRunner) -> None:
+        """
+        Stop the failed runner, the next job of its image starts a new one.
+
+        :param runner: runner
+        """
+        if self.runners.get(runner.lab_image) is runner:
+            del self.runners[runner.lab_image]
+        try:
+            await docker_api.remove_container(runner.container_id)
+        except DockerApiException as ex:
+            print(f"Не удалось удалить раннер {runner.container_id}: {ex}")
+
+    async def close(self) -> None:
+        """Stop all runners"""
+        for it in list(self.runners.values()):
+            await self.discard(it)
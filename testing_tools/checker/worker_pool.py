@@ -0,0 +1,132 @@
+"""
+This module contains the execution model of the verification subsystem:
+jobs are orchestrated by coroutines in the event loop, while their blocking
+stages (file copying, keyword scanning, packing the build context)
+are run in a bounded thread pool, whose load is measured.
+"""
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+
+class ConcurrencyMeter:
+    """
+    Counts how many operations run at the same time: the current and peak
+    number, and the average number over the measurement period
+    (the time integral of the current number divided by the period).
+    """
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+        self.completed = 0
+        self._area = 0.0
+        self._period_start = time.monotonic()
+        self._last_change = self._period_start
+
+    def _update_area(self) -> None:
+        """Add the elapsed time at the current level to the integral"""
+        now = time.monotonic()
+        self._area += self.current * (now - self._last_change)
+        self._last_change = now
+
+    def enter(self) -> None:
+        """Register the start of an operation"""
+        self._update_area()
+        self.current += 1
+        self.peak = max(self.peak, self.current)
+
+    def leave(self) -> None:
+        """Register the end of an operation"""
+        self._update_area()
+        self.current -= 1
+        self.completed += 1
+
+    def __enter__(self):
+        self.enter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.leave()
+
+    def snapshot(self, reset: bool = True) -> dict[str, float]:
+        """
+        Return the measurements for the period since the previous reset.
+
+        :param reset: start a new measurement period
+
+        :return dict[str, float]: current, peak and average number
+            of operations, number of completed operations
+        """
+        self._update_area()
+        elapsed = self._last_change - self._period_start
+        result = {
+            'current': self.current,
+            'peak': self.peak,
+            'average': self._area / elapsed if elapsed > 0 else 0.0,
+            'completed': self.completed,
+        }
+        if reset:
+            self._area = 0.0
+            self._period_start = self._last_change
+            self.peak = self.current
+            self.completed = 0
+        return result
+
+
+class WorkerPool:
+    """
+    Bounded thread pool for the blocking stages of jobs.
+    A call waits for a free worker instead of queuing inside the executor,
+    and the job loops wait for a free worker before claiming a new job,
+    so that a saturated pool slows down taking jobs from the queue.
+    """
+    def __init__(self, max_workers: int):
+        """
+        :param max_workers: number of threads for the blocking stages
+        """
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='checker'
+        )
+        self.meter = ConcurrencyMeter()
+        self._free = asyncio.Condition()
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Run the blocking function in the pool.
+
+        :param func: blocking function
+        :param args: its positional arguments
+        :param kwargs: its keyword arguments
+
+        :return Any: the result of the function
+        """
+        async with self._free:
+            await self._free.wait_for(
+                lambda: self.meter.current < self.max_workers
+            )
+            self.meter.enter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.executor,
+                functools.partial(func, *args, **kwargs)
+            )
+        finally:
+            async with self._free:
+                self.meter.leave()
+                self._free.notify_all()
+
+    async def wait_capacity(self) -> None:
+        """Wait until the pool has a free worker"""
+        async with self._free:
+            await self._free.wait_for(
+                lambda: self.meter.current < self.max_workers
+            )
+
+    def shutdown(self) -> None:
+        """Stop the pool after the running calls are completed"""
+        self.executor.shutdown(wait=True)
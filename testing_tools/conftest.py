@@ -2,15 +2,64 @@
 The module is copied to the directory 
 from which the container will be launched.
 """
+import os
 import pytest
 from logger.docker_logger import DockerLogger
+from logger.report_model import TASK_EVENT_FD_ENV
 
 
+_config: pytest.Config | None = None
+# descriptor of the pipe of the runner for the results of the tasks
+_event_fd: int | None = None
+# duration of the stages (setup, call, teardown) of the running test
+_durations: dict[str, float] = {}
+
+
+def pytest_configure(config):
+    """
+    Keep the configuration to access the terminal reporter,
+    and the pipe of the runner for the results of the tasks,
+    which is removed from the environment of the tests.
+    """
+    global _config, _event_fd
+    _config = config
+    event_fd = os.environ.pop(TASK_EVENT_FD_ENV, None)
+    _event_fd = int(event_fd) if event_fd else None
+
 @pytest.fixture(scope="session")
 def logger() -> DockerLogger:
     """Returns an instance of the class required for logging test results"""
     return DockerLogger()
 
+def pytest_runtest_logreport(report):
+    """
+    The function runs after each stage of a test and, when the test
+    is completed, records its duration and passes the results
+    of the tasks changed by it to the pipe of the runner. Without
+    the runner they are printed by the terminal reporter,
+    since the output of tests is captured.
+    """
+    _durations[report.nodeid] = \
+        _durations.get(report.nodeid, 0.0) + report.duration
+    if report.when != 'teardown':
+        return
+    logger = DockerLogger()
+    logger.add_test_duration(report.nodeid, _durations.pop(report.nodeid))
+    events = logger.pop_task_events()
+    if _event_fd is not None:
+        if events:
+            os.write(_event_fd, ''.join(
+                f'{line}\n' for line in events).encode())
+        return
+    if _config is None:
+        return
+    reporter = _config.pluginmanager.get_plugin('terminalreporter')
+    if reporter is None:
+        return
+    for line in events:
+        reporter.write_line(line)
+    reporter.flush()
+
 def pytest_sessionfinish(session, exitstatus):
     """
     The function runs after all tests are completed 
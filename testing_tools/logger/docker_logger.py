@@ -8,7 +8,8 @@ import os
 from threading import Lock
 #from pydantic.json import pydantic_encoder
 from pydantic_core import to_jsonable_python
-from .report_model import LabReport, TestLogInit, TaskReport
+from .report_model import LabReport, TestLogInit, TaskReport, TestDuration,\
+    RESULT_DIR, RESULT_FILE_NAME, TASK_EVENT_PREFIX
 
 
 class _SingletonBaseClass(type):
@@ -23,6 +24,14 @@ class _SingletonBaseClass(type):
                 cls._instances[cls] = instance
         return cls._instances[cls]
 
+    def reset(cls) -> None:
+        """
+        Forget the instance, so that the next call creates a new one,
+        eg for the next job of the batch
+        """
+        with cls._lock:
+            cls._instances.pop(cls, None)
+
 
 class DockerLogger(metaclass=_SingletonBaseClass):
     """Class for logging results"""
@@ -45,6 +54,7 @@ class DockerLogger(metaclass=_SingletonBaseClass):
             self.lab_report = LabReport(
                 lab_id=self.test_settings.lab_id
             )
+        self.changed_tasks: list[int] = []
 
     def get_logfile_name(self) -> str:
         """
@@ -86,6 +96,8 @@ class DockerLogger(metaclass=_SingletonBaseClass):
 
         :return None:
         """
+        if task_id not in self.changed_tasks:
+            self.changed_tasks.append(task_id)
         task = None
         for it in self.lab_report.tasks:
             if task_id == it.task_id:
@@ -110,6 +122,47 @@ class DockerLogger(metaclass=_SingletonBaseClass):
                     if description is not None:
                         task.description.add(description)
 
+    def add_test_duration(self, name: str, duration: float) -> None:
+        """
+        Method for adding the duration of a completed test.
+        The duration is added to the tasks whose results
+        were changed by the test.
+
+        :param name: test name (pytest node id)
+        :param duration: duration of the test with its setup and teardown
+
+        :return None:
+        """
+        tasks = [it for it in self.lab_report.tasks
+                 if it.task_id in self.changed_tasks]
+        for it in tasks:
+            it.duration += duration / len(tasks)
+        self.lab_report.tests.append(
+            TestDuration(
+                name=name,
+                task_id=tasks[0].task_id if len(tasks) == 1 else None,
+                duration=duration
+            )
+        )
+
+    def pop_task_events(self) -> list[str]:
+        """
+        Return the lines with the current results of the tasks
+        changed since the previous call
+
+        :return list[str]: one line with the prefix and json per task
+        """
+        events = []
+        for it in self.lab_report.tasks:
+            if it.task_id in self.changed_tasks:
+                events.append(TASK_EVENT_PREFIX + json.dumps(
+                    it,
+                    ensure_ascii=False,
+                    default=to_jsonable_python
+                ))
+        self.changed_tasks.clear()
+        return events
+
     def save(self) -> None:
         """
         Saves the log to the previously specified directory
@@ -128,6 +181,20 @@ class DockerLogger(metaclass=_SingletonBaseClass):
                 #default=pydantic_encoder
             )
 
+    def save_result(self) -> None:
+        """
+        Saves the report to the result directory read by the
+        verification subsystem. The report is written to a temporary file
+        and then renamed, so a partial report is never read.
+
+        :return None:
+        """
+        result_dir = os.getenv('RESULT_DIR', RESULT_DIR)
+        temp_path = os.path.join(result_dir, f'{RESULT_FILE_NAME}.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            file.write(self.to_json())
+        os.replace(temp_path, os.path.join(result_dir, RESULT_FILE_NAME))
+
     def to_json(self) -> str:
         """
         Method for converting a data structure storing test results 
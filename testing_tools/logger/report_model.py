@@ -6,6 +6,37 @@ from datetime import datetime
 from pydantic import BaseModel
 
 
+# prefix of the lines with the result of a task, which are written
+# as soon as its test is completed and are read by the verification
+# subsystem while the tests are running
+TASK_EVENT_PREFIX = '##task-report '
+# environment variable with the descriptor of the pipe the lines
+# with the results of the tasks are written to: the runner passes them on
+# through a channel the tests can not write to (the stderr of the container
+# or the frames of the warm runner), since the output of the tests
+# is not trusted
+TASK_EVENT_FD_ENV = 'TASK_EVENT_FD'
+
+# directory of the container where the report of each job is saved
+# after its tests (RESULT_DIR/<job subdirectory>), and the name
+# of the report file: the reports are read from it by the verification
+# subsystem instead of the container output
+RESULT_DIR = '/result'
+RESULT_FILE_NAME = 'report.json'
+# file of the job result directory with the CPU time (sec)
+# of the tests of the job, and the file of RESULT_DIR
+# saved after the results of all jobs
+CPU_TIME_FILE_NAME = 'cpu_time'
+DONE_FILE_NAME = '.done'
+# line printed by the batch runner to the stderr of the container,
+# which the tests can not write to, after the results of all jobs are saved
+JOBS_DONE_MARKER = '##jobs-done'
+
+# prefix of the line printed by the batch runner to the stderr
+# of the container before the tests of each job of the batch,
+# followed by the name of the job subdirectory
+BATCH_JOB_PREFIX = '##batch-job '
+
 class LabReportException(Exception):
     """An error occurred while generating a report 
     on the completed laboratory work."""
@@ -24,17 +55,30 @@ class TestLogInit(BaseModel):
 class TaskReport(BaseModel):
     """
     Contains information about the task number, test time, 
-    status (whether the test was passed or not), and description.
+    status (whether the test was passed or not), description
+    and the total duration of the tests of the task (sec).
     """
     task_id: int
     time: datetime
     status: bool
     description: set[str] = []
+    duration: float = 0.0
+
+
+class TestDuration(BaseModel):
+    """
+    Contains the duration (sec) of a test, including its setup
+    and teardown, and the task checked by it, IF any.
+    """
+    name: str
+    task_id: int | None = None
+    duration: float
 
 
 class LabReport(BaseModel):
     """
-    A model containing information about the laboratory work and 
-    a list of tested tasks."""
+    A model containing information about the laboratory work, 
+    a list of tested tasks and the durations of the tests."""
     lab_id: int
     tasks: list[TaskReport] = []
+    tests: list[TestDuration] = []
@@ -0,0 +1,428 @@
+"""
+The module is copied to the base image of the lab.
+Zygote of the warm runner container: imports pytest, the logger
+and the lab dependencies once, then listens on a unix socket
+and forks a fresh child for each job, so that the checks do not pay
+for the startup of Python and the imports, while the modules imported
+by the answers and tests of a job do not get into the next one.
+The child unpacks the files of the job sent in the request into
+a private directory, gives it to a user of its own and runs the tests
+as this user, so that the tests of a job can neither read nor change
+the files of the other jobs. The users are allocated from a counter,
+and each job is run in a cgroup of its own: its cpuset pins the tests
+to the CPU cores of the job, its cpu.stat accounts the CPU time
+of all processes of the tests, and the processes left running
+by the tests are killed through it before the report is sent. The output of the tests and the task results
+written by the conftest of the tests to a pipe of their own, then
+the CPU time of the tests measured by the child and the report
+are sent back in frames: a type byte (OUTPUT_FRAME, TASK_FRAME,
+CPU_TIME_FRAME, REPORT_FRAME) and a 4-byte size, so that the output
+of the tests can pass neither for the task results, nor for the report,
+nor for the CPU time. The zygote exits after
+ZYGOTE_IDLE_TIME seconds without jobs, which removes its container.
+Usage:
+    python3 zygote.py [dependency ...]
+"""
+import ctypes
+import importlib
+import importlib.metadata
+import io
+import json
+import os
+import re
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+import traceback
+import pytest
+import conftest
+from batch_runner import JOB_UID_BASE, become_job_user, isolate_job,\
+    kill_job_processes, relay
+from logger.docker_logger import DockerLogger
+from logger.report_model import RESULT_FILE_NAME, TASK_EVENT_FD_ENV
+
+
+# directory of the socket, mounted from the checker
+SOCKET_DIR = os.getenv('ZYGOTE_SOCKET_DIR', '/run/zygote')
+SOCKET_NAME = 'zygote.sock'
+# user ID of the checker, the only user (except root) allowed
+# to connect to the socket, so that the tests can not send jobs
+SOCKET_OWNER = int(os.getenv('ZYGOTE_SOCKET_OWNER', '0'))
+RESULT_DIR_NAME = '.result'
+IDLE_TIME = int(os.getenv('ZYGOTE_IDLE_TIME', '600'))
+# cgroup v2 tree of the container (the runner has a cgroup namespace
+# of its own) and the cgroup the zygote is moved to, since the processes
+# can not stay in the cgroup whose controllers are given to the jobs
+CGROUP_DIR = '/sys/fs/cgroup'
+ZYGOTE_CGROUP = 'zygote'
+# prctl option forbidding the process and its descendants
+# to gain privileges (eg through setuid programs)
+PR_SET_NO_NEW_PRIVS = 38
+OUTPUT_FRAME = b'o'
+TASK_FRAME = b't'
+CPU_TIME_FRAME = b'c'
+REPORT_FRAME = b'r'
+# the report larger than this (bytes) is not sent
+MAX_REPORT_SIZE = 2 ** 20
+
+
+def _normalize(name: str) -> str:
+    """
+    :param name: distribution name or requirement, eg "scikit-learn>=1.3"
+
+    :return str: normalized distribution name, eg "scikit-learn"
+    """
+    name = re.split(r'[<>=!~;\[ ]', name.strip(), maxsplit=1)[0]
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+
+def preload(dependencies: list[str]) -> None:
+    """
+    Import the top-level modules of the lab dependencies.
+    A module that fails to import is left to the tests.
+
+    :param dependencies: requirements from settings.json
+    """
+    wanted = {_normalize(it) for it in dependencies}
+    for module, distributions in importlib.metadata.packages_distributions().items():
+        if module.startswith('_') or \
+                not any(_normalize(it) in wanted for it in distributions):
+            continue
+        try:
+            importlib.import_module(module)
+        except Exception as ex:
+            print(f'{module}: {ex!r}', flush=True)
+
+
+def send_frame(connection: socket.socket, kind: bytes, data: bytes) -> None:
+    """
+    :param connection: connection of the checker
+    :param kind: frame type
+    :param data: frame data
+    """
+    connection.sendall(struct.pack('>cI', kind, len(data)) + data)
+
+
+def read_report(path: str) -> bytes | None:
+    """
+    :param path: path to the report file
+
+    :return bytes | None: report, None IF it is missing or too large
+    """
+    try:
+        with open(path, 'rb') as file:
+            data = file.read(MAX_REPORT_SIZE + 1)
+    except OSError:
+        return None
+    return data if len(data) <= MAX_REPORT_SIZE else None
+
+
+def _write(path: str, value: str) -> None:
+    """
+    :param path: path to the cgroup file
+    :param value: value written to it
+    """
+    with open(path, 'w') as file:
+        file.write(value)
+
+
+def setup_cgroups() -> bool:
+    """
+    Make the cgroup tree of the container writable, move the processes
+    of the container to the cgroup of the zygote and give the cpuset
+    controller to the cgroups of the jobs.
+
+    :return bool: True IF the jobs can be run in cgroups of their own
+    """
+    if not os.path.isfile(os.path.join(CGROUP_DIR, 'cgroup.controllers')):
+        print('cgroups: no cgroup v2 tree', flush=True)
+        return False
+    try:
+        if not os.access(CGROUP_DIR, os.W_OK):
+            subprocess.run(
+                ['mount', '-o', 'remount,rw', CGROUP_DIR],
+                capture_output=True,
+                check=False
+            )
+        zygote_cgroup = os.path.join(CGROUP_DIR, ZYGOTE_CGROUP)
+        os.makedirs(zygote_cgroup, exist_ok=True)
+        with open(os.path.join(CGROUP_DIR, 'cgroup.procs')) as file:
+            pids = file.read().split()
+        for it in pids:
+            try:
+                _write(os.path.join(zygote_cgroup, 'cgroup.procs'), it)
+            except ProcessLookupError:
+                pass
+        _write(os.path.join(CGROUP_DIR, 'cgroup.subtree_control'), '+cpuset')
+    except OSError as ex:
+        print(f'cgroups: {ex!r}', flush=True)
+        return False
+    return True
+
+
+def create_job_cgroup(uid: int, cpus: list[int] | None) -> str:
+    """
+    :param uid: user and group ID of the job
+    :param cpus: CPU cores the tests are pinned to, IF any
+
+    :return str: path to the cgroup of the job
+    """
+    path = os.path.join(CGROUP_DIR, f'job-{uid}')
+    os.mkdir(path)
+    try:
+        if cpus:
+            _write(os.path.join(path, 'cpuset.cpus'),
+                   ','.join(str(it) for it in cpus))
+    except OSError:
+        os.rmdir(path)
+        raise
+    return path
+
+
+def read_cgroup_cpu_time(path: str) -> float | None:
+    """
+    :param path: path to the cgroup of the job
+
+    :return float | None: CPU time (sec) of all processes of the cgroup,
+        None IF it is not available
+    """
+    try:
+        with open(os.path.join(path, 'cpu.stat')) as file:
+            for line in file:
+                key, _, value = line.partition(' ')
+                if key == 'usage_usec':
+                    return int(value) / 10 ** 6
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _is_populated(path: str) -> bool:
+    """
+    :param path: path to the cgroup of the job
+
+    :return bool: True IF processes are left in the cgroup
+    """
+    try:
+        with open(os.path.join(path, 'cgroup.events')) as file:
+            return 'populated 1' in file.read()
+    except FileNotFoundError:
+        return False
+
+
+def remove_job_cgroup(path: str) -> float | None:
+    """
+    Kill the processes of the cgroup of the job and remove it.
+
+    :param path: path to the cgroup of the job
+
+    :return float | None: CPU time (sec) of all processes of the cgroup,
+        None IF it is not available
+    """
+    try:
+        _write(os.path.join(path, 'cgroup.kill'), '1')
+    except OSError:
+        pass
+    # the killed processes leave the cgroup asynchronously
+    for _ in range(50):
+        if not _is_populated(path):
+            break
+        time.sleep(0.1)
+    cpu_time = read_cgroup_cpu_time(path)
+    try:
+        os.rmdir(path)
+    except OSError as ex:
+        print(f'cgroups: {ex!r}', flush=True)
+    return cpu_time
+
+
+def run_tests(path: str,
+              uid: int,
+              output: int,
+              events: int,
+              cgroup: str | None) -> None:
+    """
+    Run the tests of the job as the user of the job
+    in the forked grandchild of the zygote.
+
+    :param path: private directory of the job
+    :param uid: user and group ID of the job
+    :param output: descriptor receiving the output of the tests
+    :param events: descriptor receiving the task results
+    :param cgroup: path to the cgroup of the job, IF any
+    """
+    if cgroup is not None:
+        # while still root: the tests can not leave the cgroup
+        # or change its cpuset
+        _write(os.path.join(cgroup, 'cgroup.procs'), str(os.getpid()))
+    os.dup2(output, 1)
+    os.dup2(output, 2)
+    os.close(output)
+    os.environ[TASK_EVENT_FD_ENV] = str(events)
+    # the runner has the capabilities to manage the cgroups
+    ctypes.CDLL(None, use_errno=True).prctl(PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0)
+    become_job_user(path, uid)
+    result_dir = os.path.join(path, RESULT_DIR_NAME)
+    os.makedirs(result_dir, exist_ok=True)
+    os.environ['RESULT_DIR'] = result_dir
+    DockerLogger.reset()
+    pytest.main(
+        ['--tb=no', '-p', 'no:cacheprovider', '--confcutdir', path, path],
+        plugins=[conftest]
+    )
+    DockerLogger().save_result()
+
+
+def run_job(connection: socket.socket,
+            request: dict,
+            archive: bytes,
+            uid: int,
+            cgroups: bool) -> None:
+    """
+    Run the tests of the job in the forked child.
+
+    :param connection: connection of the checker, receives the frames
+        of the output, the task results, the CPU time and the report
+    :param request: environment variables and CPU cores of the job
+    :param archive: tar archive of the job directory
+    :param uid: user and group ID of the job, not used by the other jobs
+    :param cgroups: True IF the job is run in a cgroup of its own
+    """
+    os.environ.update(request.get('env') or {})
+    cpus = request.get('cpus')
+    cgroup = None
+    if cgroups:
+        try:
+            cgroup = create_job_cgroup(uid, cpus)
+        except OSError as ex:
+            print(f'cgroups: {ex!r}', flush=True)
+    if cgroup is None and cpus and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+    path = tempfile.mkdtemp(prefix='job-')
+    try:
+        with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+            tar.extractall(path, filter='data')
+        isolate_job(path, uid)
+        output_read, output_write = os.pipe()
+        events_read, events_write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                os.close(output_read)
+                os.close(events_read)
+                run_tests(path, uid, output_write, events_write, cgroup)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        os.close(output_write)
+        os.close(events_write)
+        cpu_time = relay(pid, {
+            output_read: lambda data: send_frame(
+                connection, OUTPUT_FRAME, data),
+            events_read: lambda data: send_frame(
+                connection, TASK_FRAME, data),
+        })
+        # the processes left by the tests can not change the report
+        if cgroup is not None:
+            cpu_time = remove_job_cgroup(cgroup) or cpu_time
+            cgroup = None
+        kill_job_processes(uid)
+        send_frame(connection, CPU_TIME_FRAME, str(cpu_time).encode())
+        report = read_report(
+            os.path.join(path, RESULT_DIR_NAME, RESULT_FILE_NAME)
+        )
+        if report is not None:
+            send_frame(connection, REPORT_FRAME, report)
+    finally:
+        if cgroup is not None:
+            remove_job_cgroup(cgroup)
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def reap(children: set[int]) -> None:
+    """
+    Collect the finished children.
+
+    :param children: PIDs of the running children
+    """
+    while children:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            children.clear()
+            return
+        if pid == 0:
+            return
+        children.discard(pid)
+
+
+def serve() -> None:
+    """
+    Accept the jobs and fork a child for each of them
+    until there are no jobs for the idle time.
+    """
+    cgroups = setup_cgroups()
+    path = os.path.join(SOCKET_DIR, SOCKET_NAME)
+    if os.path.exists(path):
+        os.unlink(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # the checker waits for the socket to appear,
+    # so it appears with its owner and permissions already set
+    server.bind(f'{path}.tmp')
+    os.chown(f'{path}.tmp', SOCKET_OWNER, -1)
+    os.chmod(f'{path}.tmp', 0o600)
+    os.rename(f'{path}.tmp', path)
+    server.listen()
+    server.settimeout(min(10, IDLE_TIME))
+    print('ready', flush=True)
+    children: set[int] = set()
+    # each job gets a user not used by the other jobs of the runner
+    next_uid = JOB_UID_BASE
+    last_job = time.monotonic()
+    while True:
+        reap(children)
+        try:
+            connection, _ = server.accept()
+        except socket.timeout:
+            if not children and time.monotonic() - last_job > IDLE_TIME:
+                # the checker starts a new runner for the next job
+                os.unlink(path)
+                return
+            continue
+        last_job = time.monotonic()
+        connection.settimeout(None)
+        uid = next_uid
+        next_uid += 1
+        pid = os.fork()
+        if pid == 0:
+            server.close()
+            code = 0
+            try:
+                with connection.makefile('rb') as file:
+                    request = json.loads(file.readline())
+                    archive = file.read(request['size'])
+                run_job(connection, request, archive, uid, cgroups)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        children.add(pid)
+        connection.close()
+
+
+if __name__ == '__main__':
+    preload(sys.argv[1:])
+    serve()
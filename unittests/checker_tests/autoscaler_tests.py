@@ -0,0 +1,62 @@
+"""
+This module contains tests of the decisions of the checker autoscaler
+and of the container slot limiter.
+"""
+import asyncio
+import unittest
+from testing_tools.checker.autoscaler import HostMetrics, SlotLimiter, decide
+
+
+GB = 2 ** 30
+
+
+class TestAutoscaler(unittest.TestCase):
+    """
+    This class is designed to test how the number of container slots
+    follows the queue and the host load.
+    """
+    def test_scale_up_when_queue_is_not_drained(self):
+        metrics = HostMetrics(10, 60.0, 0.5, 4 * GB)
+        self.assertEqual(decide(2, 2, metrics, 1, 4, 30)[0], 3)
+        # the upper bound is not exceeded
+        self.assertEqual(decide(4, 4, metrics, 1, 4, 30)[0], 4)
+        # free slots are used before adding new ones
+        self.assertEqual(decide(2, 1, metrics, 1, 4, 30)[0], 2)
+
+    def test_scale_down_when_idle(self):
+        metrics = HostMetrics(0, 10.0, 0.1, 4 * GB)
+        self.assertEqual(decide(3, 0, metrics, 1, 4, 30)[0], 2)
+        self.assertEqual(decide(1, 0, metrics, 1, 4, 30)[0], 1)
+
+    def test_scale_down_when_host_is_overloaded(self):
+        busy_cpu = HostMetrics(10, 60.0, 2.0, 4 * GB)
+        self.assertEqual(decide(3, 3, busy_cpu, 1, 4, 30)[0], 2)
+        low_memory = HostMetrics(10, 60.0, 0.5, 100 * 2 ** 20)
+        self.assertEqual(decide(3, 3, low_memory, 1, 4, 30)[0], 2)
+        self.assertEqual(decide(1, 1, low_memory, 1, 4, 30)[0], 1)
+
+    def test_unknown_host_metrics(self):
+        metrics = HostMetrics(10, None, None, None)
+        self.assertEqual(decide(2, 2, metrics, 1, 4, 30)[0], 3)
+
+
+class TestSlotLimiter(unittest.IsolatedAsyncioTestCase):
+    """
+    This class is designed to test changing the limit
+    of the slot limiter while it is used.
+    """
+    async def test_raise_limit(self):
+        slots = SlotLimiter(1)
+        await slots.__aenter__()
+        waiting = asyncio.create_task(slots.__aenter__())
+        await asyncio.sleep(0)
+        self.assertFalse(waiting.done())
+
+        await slots.set_limit(2)
+        await asyncio.wait_for(waiting, 1)
+        self.assertEqual(slots.active, 2)
+
+        await slots.set_limit(1)
+        await slots.__aexit__(None, None, None)
+        await slots.__aexit__(None, None, None)
+        self.assertEqual(slots.active, 0)
@@ -0,0 +1,91 @@
+"""
+This module contains tests of checking a batch of jobs of the same lab
+in one container: the batch directory, the routing of the results
+of the tasks printed by the batch runner to their jobs and the split
+of the CPU time of the container between them.
+"""
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+from model.pydantic.test_settings import TestSettings
+from testing_tools.checker.docker_builder import BatchDockerBuilder,\
+    split_cpu_time
+from testing_tools.checker.folder_builder import JOB_RUNNING_MARK,\
+    build_batch_folder
+from testing_tools.logger.report_model import BATCH_JOB_PREFIX,\
+    TASK_EVENT_PREFIX
+
+
+class TestBatch(unittest.TestCase):
+    """
+    This class is designed to test the batch directory
+    and the batch output reader.
+    """
+    def test_batch_folder(self):
+        with tempfile.TemporaryDirectory() as temp:
+            folders = []
+            for name in ['1_a', '2_b']:
+                folder = Path(temp).joinpath(name)
+                folder.mkdir()
+                folder.joinpath('lab1_1.py').write_text(name)
+                folder.joinpath(JOB_RUNNING_MARK).touch()
+                folders.append(folder)
+            batch_folder = build_batch_folder(folders)
+            self.assertEqual(
+                batch_folder.joinpath('2_b', 'lab1_1.py').read_text(), '2_b'
+            )
+            self.assertTrue(batch_folder.joinpath(JOB_RUNNING_MARK).exists())
+            self.assertFalse(
+                batch_folder.joinpath('1_a', JOB_RUNNING_MARK).exists()
+            )
+
+    def test_task_results_are_routed_to_jobs(self):
+        builder = BatchDockerBuilder(
+            Path('.'),
+            ['1_a', '2_b'],
+            1,
+            TestSettings(
+                dependencies=None,
+                global_level={'prohibition': None, 'restriction': None},
+                local_level=[]
+            )
+        )
+        received = []
+
+        async def on_task(job, task):
+            received.append((job, task.task_id, task.status))
+
+        read_line = builder._task_reader(on_task)
+        task = '{"task_id": %d, "time": "2024-01-01T00:00:00", "status": %s}'
+
+        async def feed():
+            await read_line(TASK_EVENT_PREFIX + task % (1, 'true'))
+            await read_line(f'{BATCH_JOB_PREFIX}1_a')
+            await read_line(TASK_EVENT_PREFIX + task % (1, 'true'))
+            # only the lines starting with the prefix are task results
+            await read_line('test_lab1_1.py .' + TASK_EVENT_PREFIX +
+                            task % (3, 'true'))
+            await read_line(f'{BATCH_JOB_PREFIX}2_b')
+            await read_line(TASK_EVENT_PREFIX + task % (2, 'false'))
+        asyncio.run(feed())
+        self.assertEqual(received, [('1_a', 1, True), ('2_b', 2, False)])
+
+    def test_cpu_time_split(self):
+        self.assertEqual(
+            split_cpu_time(12.0, {'1_a': 1.0, '2_b': 3.0}),
+            {'1_a': 3.0, '2_b': 9.0}
+        )
+        self.assertEqual(
+            split_cpu_time(4.0, {'1_a': 0.0, '2_b': 0.0}),
+            {'1_a': 2.0, '2_b': 2.0}
+        )
+        # the container stopped before its CPU time was read
+        self.assertEqual(
+            split_cpu_time(0.0, {'1_a': 1.0, '2_b': 3.0}),
+            {'1_a': 1.0, '2_b': 3.0}
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
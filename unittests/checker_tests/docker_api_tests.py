@@ -0,0 +1,275 @@
+"""
+This module contains tests of the Docker Engine API client
+against a fake docker daemon listening on a local unix socket.
+"""
+import asyncio
+import io
+import json
+import os
+import struct
+import tarfile
+import tempfile
+import unittest
+from pathlib import Path
+from aiohttp import web
+from testing_tools.checker.docker_api import DockerApiClient,\
+    DockerApiException, demultiplex_logs, make_build_context
+from testing_tools.checker.docker_builder import extract_results
+
+
+def _frame(stream_type: int, text: str) -> bytes:
+    """Pack the text into a frame of the multiplexed logs stream"""
+    data = text.encode('utf-8')
+    return struct.pack('>BxxxL', stream_type, len(data)) + data
+
+
+def _archive(files: dict[str, bytes]) -> bytes:
+    """Pack the files into a tar archive as returned by the daemon"""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w') as tar:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+class TestDockerApi(unittest.IsolatedAsyncioTestCase):
+    """
+    This class is designed to test the image build and the container
+    lifecycle through the Docker Engine API client.
+    """
+    async def asyncSetUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.socket_path = str(Path(self.temp_dir.name).joinpath('docker.sock'))
+        self.images: set[str] = set()
+        self.containers: dict[str, str] = {}
+        self.contexts: list[bytes] = []
+
+        app = web.Application()
+        app.router.add_get('/images/{name}/json', self._inspect_image)
+        app.router.add_post('/build', self._build)
+        app.router.add_post('/containers/create', self._create)
+        app.router.add_get('/containers/json', self._list_containers)
+        app.router.add_get('/images/json', self._list_images)
+        app.router.add_post('/containers/{id}/start', self._start)
+        app.router.add_post('/containers/{id}/wait', self._wait)
+        app.router.add_get('/containers/{id}/logs', self._logs)
+        app.router.add_get('/containers/{id}/stats', self._stats)
+        app.router.add_get('/containers/{id}/archive', self._archive)
+        app.router.add_delete('/containers/{id}', self._remove_container)
+        app.router.add_delete('/images/{name}', self._remove_image)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.UnixSite(self.runner, self.socket_path).start()
+        self.client = DockerApiClient(socket_path=self.socket_path)
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.runner.cleanup()
+        self.temp_dir.cleanup()
+
+    async def _inspect_image(self, request: web.Request):
+        if request.match_info['name'] in self.images:
+            return web.json_response({'Id': request.match_info['name']})
+        return web.json_response({'message': 'no such image'}, status=404)
+
+    async def _build(self, request: web.Request):
+        context = await request.read()
+        self.contexts.append(context)
+        response = web.StreamResponse()
+        await response.prepare(request)
+        if b'FAIL' in context:
+            await response.write(b'{"error": "build failed"}\r\n')
+        else:
+            self.images.add(request.query['t'])
+            await response.write(b'{"stream": "Step 1/1\\n"}\r\n')
+            # a line may be split between several messages
+            await response.write(b'{"stream": "##task-report {\\"ta"}\r\n')
+            await response.write(b'{"stream": "sk_id\\": 1}\\nok"}\r\n')
+        return response
+
+    async def _create(self, request: web.Request):
+        body = await request.json()
+        self.containers[request.query['name']] = body['Image']
+        return web.json_response({'Id': request.query['name']}, status=201)
+
+    async def _list_containers(self, request: web.Request):
+        filters = json.loads(request.query.get('filters', '{}'))
+        return web.json_response([
+            {'Id': name, 'Image': image, 'State': 'exited'}
+            for name, image in self.containers.items()
+            if filters == {'label': ['job']} and request.query['all'] == '1'
+        ])
+
+    async def _list_images(self, request: web.Request):
+        filters = json.loads(request.query.get('filters', '{}'))
+        return web.json_response([
+            {'Id': name, 'Created': 0, 'Size': 1}
+            for name in sorted(self.images)
+            if filters == {'label': ['job']}
+        ])
+
+    async def _start(self, request: web.Request):
+        return web.Response(status=204)
+
+    async def _wait(self, request: web.Request):
+        return web.json_response({'StatusCode': 0})
+
+    async def _logs(self, request: web.Request):
+        if request.query.get('follow') == '1':
+            response = web.StreamResponse()
+            await response.prepare(request)
+            # a line may be split between several frames
+            await response.write(_frame(1, 'collected\n##task-re'))
+            await response.write(_frame(2, 'warning\n##jobs-done\n'))
+            await response.write(_frame(1, 'port {}\nend'))
+            return response
+        return web.Response(
+            body=_frame(1, '{"lab_id": 1}') + _frame(2, 'warning')
+        )
+
+    async def _stats(self, request: web.Request):
+        if request.query.get('stream') != 'false':
+            return web.json_response({'message': 'stream'}, status=400)
+        return web.json_response(
+            {'cpu_stats': {'cpu_usage': {'total_usage': 2500000000}}}
+        )
+
+    async def _archive(self, request: web.Request):
+        if request.query['path'] != '/result':
+            return web.json_response({'message': 'no such path'}, status=404)
+        return web.Response(body=_archive({
+            'result/report.json': b'{"lab_id": 1}',
+            'result/2_b/report.json': b'{"lab_id": 2}',
+            'result/../escape.json': b'{}',
+            'result/big.json': b'x' * 100,
+        }))
+
+    async def _remove_container(self, request: web.Request):
+        self.containers.pop(request.match_info['id'], None)
+        return web.Response(status=204)
+
+    async def _remove_image(self, request: web.Request):
+        self.images.discard(request.match_info['name'])
+        return web.json_response([])
+
+    async def test_container_lifecycle(self):
+        """
+        Check the image build, the start of the container,
+        reading its logs and removing the container and the image.
+        """
+        with tempfile.TemporaryDirectory() as context_dir:
+            Path(context_dir).joinpath('Dockerfile').write_text('FROM python')
+            context = make_build_context(Path(context_dir))
+
+        self.assertFalse(await self.client.image_exists('job:1'))
+        await self.client.build(context, 'job:1', labels={'job': 'true'})
+        self.assertTrue(await self.client.image_exists('job:1'))
+
+        container_id = await self.client.create_container('job:1', 'job-1')
+        await self.client.start_container(container_id)
+        self.assertEqual(await self.client.wait_container(container_id), 0)
+        stdout, stderr = await self.client.container_logs(container_id)
+        self.assertEqual(json.loads(stdout), {'lab_id': 1})
+        self.assertEqual(stderr, 'warning')
+
+        await self.client.remove_container(container_id)
+        await self.client.remove_image('job:1')
+        self.assertFalse(self.containers)
+        self.assertFalse(await self.client.image_exists('job:1'))
+
+    async def test_build_output_lines(self):
+        """Check that the build output is passed line by line"""
+        lines = []
+
+        async def on_output(line: str) -> None:
+            lines.append(line)
+
+        await self.client.build(b'', 'job:3', on_output=on_output)
+        self.assertEqual(
+            lines,
+            ['Step 1/1', '##task-report {"task_id": 1}', 'ok']
+        )
+
+    async def test_build_from_stream(self):
+        """
+        Check that the build context is streamed from a pipe
+        while it is written by another thread.
+        """
+        read_end, write_end = os.pipe()
+
+        def write() -> None:
+            with os.fdopen(write_end, 'wb') as file:
+                for _ in range(8):
+                    file.write(b'x' * 65536)
+
+        with os.fdopen(read_end, 'rb') as context:
+            await asyncio.gather(
+                asyncio.to_thread(write),
+                self.client.build(context, 'job:4')
+            )
+        self.assertEqual(self.contexts, [b'x' * 65536 * 8])
+
+    async def test_list_objects(self):
+        """Check listing the containers and the images by their label"""
+        await self.client.build(b'', 'job:5')
+        await self.client.create_container('job:5', 'job-5')
+        self.assertEqual(
+            [it['Id'] for it in await self.client.list_containers('job')],
+            ['job-5']
+        )
+        self.assertEqual(
+            [it['Id'] for it in await self.client.list_images('job')],
+            ['job:5']
+        )
+
+    async def test_build_error(self):
+        """Check that a failed build raises an exception"""
+        with self.assertRaises(DockerApiException):
+            await self.client.build(b'FAIL', 'job:2')
+
+    async def test_follow_logs(self):
+        """
+        Check that the logs of the running container are passed
+        line by line with their stream type.
+        """
+        lines = [it async for it in self.client.follow_logs('job-1')]
+        self.assertEqual(lines, [
+            (1, 'collected'),
+            (2, 'warning'),
+            (2, '##jobs-done'),
+            (1, '##task-report {}'),
+            (1, 'end'),
+        ])
+
+    async def test_container_cpu_time(self):
+        """Check reading the CPU time of the container from its stats"""
+        self.assertEqual(await self.client.container_cpu_time('job-1'), 2.5)
+
+    async def test_read_results(self):
+        """
+        Check reading the reports from the container
+        into the result directory of the job.
+        """
+        self.assertIsNone(await self.client.get_archive('job-1', '/missing'))
+        archive = await self.client.get_archive('job-1', '/result')
+        with tempfile.TemporaryDirectory() as temp:
+            result_dir = Path(temp).joinpath('job', '.result')
+            extract_results(archive, result_dir, limit=50)
+            self.assertEqual(
+                result_dir.joinpath('report.json').read_text(),
+                '{"lab_id": 1}'
+            )
+            self.assertTrue(result_dir.joinpath('2_b', 'report.json').exists())
+            self.assertFalse(Path(temp).joinpath('job', 'escape.json').exists())
+            self.assertFalse(result_dir.joinpath('big.json').exists())
+
+    def test_demultiplex_logs(self):
+        """Check splitting the logs into stdout and stderr"""
+        data = _frame(1, 'a') + _frame(2, 'b') + _frame(1, 'c')
+        self.assertEqual(demultiplex_logs(data), ('ac', 'b'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+This module contains tests of forming the job directory of the answers:
+the answers without tests are rejected, and the job is checked
+only IF some answer has a test.
+"""
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from model.pydantic.test_manifest import DisciplineTestManifest,\
+    LabTestManifest
+from model.pydantic.test_settings import TestGlobalSettings, TestSettings
+from testing_tools.checker.folder_builder import FolderBuilder
+from utils.test_manifest import save_manifest
+
+
+class TestFolderBuilder(unittest.TestCase):
+    """
+    This class is designed to test the rejection of the answers
+    for which there are no tests.
+    """
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.path = Path(self.temp.name)
+        tests = self.path.joinpath('tests')
+        tests.joinpath('1').mkdir(parents=True)
+        tests.joinpath('1', 'test_lab1_1.py').write_text('')
+        save_manifest(tests, DisciplineTestManifest(labs={
+            1: LabTestManifest(
+                lab_number=1,
+                tasks=['lab1_1.py'],
+                file_hashes={},
+                settings=TestSettings(
+                    global_level=TestGlobalSettings(),
+                    local_level=[]
+                ),
+                dependency_hash=''
+            )
+        }))
+        self.discipline = SimpleNamespace(
+            path_to_test=str(tests),
+            short_name='disc'
+        )
+
+    def tearDown(self):
+        self.temp.cleanup()
+
+    def build(self, names: list[str]) -> FolderBuilder:
+        files = []
+        for name in names:
+            answer = self.path.joinpath(name)
+            answer.write_text('')
+            files.append(str(answer))
+        builder = FolderBuilder(
+            self.path.joinpath('temp'),
+            SimpleNamespace(telegram_id=1, data=json.dumps({
+                'discipline_id': 1,
+                'lab_number': 1,
+                'files_path': files
+            }))
+        )
+        builder.build(self.discipline)
+        return builder
+
+    def test_answer_with_test(self):
+        builder = self.build(['lab1_1.py', 'lab1_2.py'])
+        self.assertEqual(builder.get_rejected_file_names(), ['lab1_2.py'])
+        self.assertTrue(builder.has_file_for_test())
+        self.assertTrue(
+            builder.docker_folder.joinpath('test_lab1_1.py').exists()
+        )
+
+    def test_all_answers_rejected(self):
+        builder = self.build(['lab1_2.py'])
+        self.assertTrue(builder.has_rejected_files())
+        self.assertFalse(builder.has_file_for_test())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+"""
+This module contains tests of the removal of the lab images
+no longer referenced by the tests of the disciplines.
+"""
+import asyncio
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+from testing_tools.checker import job_reaper
+from testing_tools.checker.docker_builder import LabImageUsage
+from testing_tools.checker.job_reaper import JobReaper, ReapReport
+
+
+def _image(tag: str, created: float) -> dict:
+    return {'Id': f'sha256:{tag}', 'RepoTags': [tag], 'Created': created,
+            'Size': 10}
+
+
+class TestLabImages(unittest.TestCase):
+    """
+    This class is designed to test which lab images are removed:
+    only the unreferenced ones, not used by a warm runner and
+    not used recently, the least recently used first.
+    """
+    def test_collect_lab_images(self):
+        old = time.time() - 2 * job_reaper.FRESH_JOB_TIME
+        images = [
+            _image('lab:recent', old),
+            _image('lab:current', old),
+            _image('lab:runner', old),
+            _image('lab:newer', old + 1),
+            _image('lab:older', old),
+        ]
+        removed = []
+
+        async def remove_image(name):
+            removed.append(name)
+
+        with tempfile.TemporaryDirectory() as temp:
+            reaper = JobReaper(Path(temp), 0)
+            usage = LabImageUsage(Path(temp).joinpath('.lab_images'))
+            usage.touch('lab:recent')
+            with mock.patch.object(
+                    job_reaper.admin_crud,
+                    'get_all_disciplines',
+                    mock.AsyncMock(return_value=[])), \
+                    mock.patch.object(job_reaper, '_get_lab_image_tags',
+                                      return_value={'lab:current'}), \
+                    mock.patch.object(
+                        job_reaper.docker_api,
+                        'list_containers',
+                        mock.AsyncMock(return_value=[
+                            {'ImageID': 'sha256:lab:runner'}
+                        ])), \
+                    mock.patch.object(job_reaper.docker_api, 'list_images',
+                                      mock.AsyncMock(return_value=images)), \
+                    mock.patch.object(job_reaper.docker_api, 'remove_image',
+                                      remove_image):
+                report = ReapReport()
+                asyncio.run(reaper._collect_lab_images(report))
+            self.assertEqual(removed, ['sha256:lab:older', 'sha256:lab:newer'])
+            self.assertEqual(report.removed_images, 2)
+            self.assertIsNotNone(usage.get_last_used('lab:recent'))
+
+
+if __name__ == '__main__':
+    unittest.main()
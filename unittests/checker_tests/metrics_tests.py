@@ -0,0 +1,52 @@
+"""
+This module contains tests of the timing histograms of the checker
+and of their export in the Prometheus text format.
+"""
+import math
+import unittest
+from testing_tools.checker.metrics import MetricsRegistry, quantile,\
+    render_prometheus
+from testing_tools.checker.supervisor import _merge_stats
+
+
+class TestMetrics(unittest.TestCase):
+    """
+    This class is designed to test the histograms of the durations
+    of the job steps.
+    """
+    def test_quantile(self):
+        registry = MetricsRegistry(buckets=(1, 5, 10))
+        for it in [0.5] * 90 + [3] * 9 + [20]:
+            registry.observe('run', it)
+        snapshot = registry.snapshot()['timing:run']
+        self.assertEqual(snapshot['count'], 100)
+        self.assertEqual(quantile(snapshot, 0.5), 1)
+        self.assertEqual(quantile(snapshot, 0.95), 5)
+        self.assertEqual(quantile(snapshot, 1), math.inf)
+
+    def test_snapshots_of_processes_are_summed(self):
+        first = MetricsRegistry(buckets=(1, 5))
+        second = MetricsRegistry(buckets=(1, 5))
+        first.observe('run', 0.5)
+        second.observe('run', 2)
+        total = _merge_stats([first.snapshot(), second.snapshot()])
+        self.assertEqual(total['timing:run']['count'], 2)
+        self.assertEqual(total['timing:run']['sum'], 2.5)
+
+    def test_render_prometheus(self):
+        registry = MetricsRegistry(buckets=(1, 5))
+        registry.observe('run', 0.5)
+        registry.observe('run', 2)
+        text = render_prometheus({'jobs': {'current': 1}, **registry.snapshot()})
+        self.assertIn(
+            'checker_step_duration_seconds_bucket{step="run",le="1"} 1', text
+        )
+        self.assertIn(
+            'checker_step_duration_seconds_bucket{step="run",le="+Inf"} 2', text
+        )
+        self.assertIn('checker_step_duration_seconds_count{step="run"} 2', text)
+        self.assertNotIn('jobs', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+"""
+This module contains tests of passing jobs through the pipeline stages:
+the jobs leave the pipeline finished or, IF a stage fails, failed.
+"""
+import asyncio
+import unittest
+from testing_tools.checker.pipeline import Pipeline, PipelineStage
+
+
+class TestPipeline(unittest.IsolatedAsyncioTestCase):
+    """
+    This class is designed to test that every job put into the pipeline
+    leaves it through the finish or the fail callback.
+    """
+    async def test_failed_job_is_reported(self):
+        finished = []
+        failed = []
+
+        async def check(job):
+            if job == 'bad':
+                raise RuntimeError(job)
+            return job
+
+        async def on_finish(job):
+            finished.append(job)
+
+        async def on_fail(job, ex):
+            failed.append((job, str(ex)))
+
+        pipeline = Pipeline(
+            [PipelineStage('check', check), PipelineStage('send', check)],
+            on_finish,
+            on_fail
+        )
+        task = asyncio.create_task(pipeline.run())
+        for it in ['good', 'bad', 'next']:
+            await pipeline.put(it)
+        while len(finished) + len(failed) < 3:
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+        self.assertEqual(finished, ['good', 'next'])
+        self.assertEqual(failed, [('bad', 'bad')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,185 @@
+"""
+This module contains tests of the estimation of the waiting time
+of the answers in the queue of the checks and of the admission control.
+"""
+import asyncio
+import os
+import unittest
+from datetime import date
+from unittest import mock
+from sqlalchemy.dialects import postgresql
+from database.main_db import common_crud
+from database.queue_db import queue_in_crud
+from model.pydantic.queue_in_raw import QueueInRaw
+from model.queue_db.checker_node import CheckerNode
+from model.queue_db.queue_in import QueueIn
+from testing_tools.answer import admission
+from testing_tools.answer.admission import AdmissionLimits,\
+    add_admitted_record, check_cpu_budget, find_blocking_record,\
+    get_budget_period
+from testing_tools.answer.queue_status import estimate_wait,\
+    format_queue_status
+
+
+def _node(capacity: int,
+          running: int,
+          job_time: float | None,
+          throughput: float = 0.0) -> CheckerNode:
+    return CheckerNode(
+        id='node',
+        host='host',
+        capacity=capacity,
+        running=running,
+        job_time=job_time,
+        throughput=throughput
+    )
+
+
+class TestQueueStatus(unittest.TestCase):
+    """
+    This class is designed to test how the estimated time follows
+    the position in the queue and the reports of the checker nodes.
+    """
+    def test_unknown_without_checks(self):
+        self.assertIsNone(estimate_wait(1, []))
+        self.assertIsNone(estimate_wait(1, [_node(2, 0, None)]))
+
+    def test_free_slots(self):
+        nodes = [_node(2, 0, 30.0), _node(2, 1, 50.0)]
+        # three records take the free slots at once
+        self.assertEqual(estimate_wait(3, nodes), 40.0)
+
+    def test_recent_throughput(self):
+        nodes = [_node(2, 2, 60.0, 0.05), _node(2, 2, 60.0, 0.05)]
+        self.assertAlmostEqual(estimate_wait(11, nodes), 170.0)
+
+    def test_slots_rate_without_throughput(self):
+        nodes = [_node(4, 4, 60.0)]
+        self.assertAlmostEqual(estimate_wait(9, nodes), 195.0)
+
+    def test_format(self):
+        self.assertNotIn('время', format_queue_status(2, None))
+        self.assertIn('меньше минуты', format_queue_status(1, 20.0))
+        self.assertIn('~3 мин.', format_queue_status(5, 150.0))
+
+
+class TestAdmission(unittest.TestCase):
+    """
+    This class is designed to test which record of the queue
+    has to be checked before the new record is admitted.
+    """
+    queue = [(1, 10), (2, 10), (1, 20), (3, 10), (1, 10)]
+
+    def test_unlimited(self):
+        self.assertIsNone(
+            find_blocking_record(self.queue, 1, 10, AdmissionLimits())
+        )
+
+    def test_max_depth(self):
+        limits = AdmissionLimits(max_depth=6)
+        self.assertIsNone(find_blocking_record(self.queue, 4, 30, limits))
+        limits = AdmissionLimits(max_depth=4)
+        self.assertEqual(find_blocking_record(self.queue, 4, 30, limits)[0], 2)
+
+    def test_max_per_student(self):
+        limits = AdmissionLimits(max_per_student=2)
+        self.assertEqual(find_blocking_record(self.queue, 1, 30, limits)[0], 3)
+        self.assertIsNone(find_blocking_record(self.queue, 2, 30, limits))
+
+    def test_discipline_quota(self):
+        limits = AdmissionLimits(discipline_quota=5, discipline_quotas={10: 3})
+        self.assertEqual(find_blocking_record(self.queue, 4, 10, limits)[0], 2)
+        self.assertIsNone(find_blocking_record(self.queue, 4, 20, limits))
+
+    def test_latest_blocking_record(self):
+        limits = AdmissionLimits(max_depth=5, max_per_student=1)
+        self.assertEqual(find_blocking_record(self.queue, 1, 30, limits)[0], 5)
+
+    def _add(self, student_id: int) -> tuple[str | None, mock.MagicMock]:
+        data = QueueInRaw(discipline_id=10, lab_number=1, files_path=[])
+        records = mock.MagicMock()
+        records.all.return_value = [
+            QueueIn(id=1, telegram_id=1, chat_id=1, data=data.json())
+        ]
+        session = mock.MagicMock(execute=mock.AsyncMock(),
+                                 scalars=mock.AsyncMock(return_value=records),
+                                 commit=mock.AsyncMock())
+        session.__aenter__.return_value = session
+        session.begin.return_value.__aenter__.return_value = None
+        session.begin.return_value.__aexit__.return_value = False
+        with mock.patch.dict(os.environ, {'QUEUE_MAX_PER_STUDENT': '1'}), \
+                mock.patch.object(queue_in_crud, 'Session',
+                                  return_value=session), \
+                mock.patch.object(admission, 'get_live_nodes',
+                                  mock.AsyncMock(return_value=[])):
+            refusal = asyncio.run(add_admitted_record(student_id, 1, data))
+        return refusal, session
+
+    def test_admitted_record_is_added_under_lock(self):
+        refusal, session = self._add(2)
+        self.assertIsNone(refusal)
+        statement = session.execute.call_args.args[0]
+        self.assertIn('pg_advisory_xact_lock',
+                      str(statement.compile(dialect=postgresql.dialect())))
+        session.add.assert_called_once()
+
+    def test_refused_record_is_not_added(self):
+        refusal, session = self._add(1)
+        self.assertIn('ваши предыдущие задания', refusal)
+        session.add.assert_not_called()
+
+    def test_budget_period(self):
+        with mock.patch.dict(os.environ, {'STUDENT_CPU_BUDGET_PERIOD': 'day'}):
+            self.assertEqual(
+                get_budget_period(date(2024, 5, 15)),
+                (date(2024, 5, 15), date(2024, 5, 16))
+            )
+        with mock.patch.dict(os.environ, {'STUDENT_CPU_BUDGET_PERIOD': 'week'}):
+            self.assertEqual(
+                get_budget_period(date(2024, 5, 15)),
+                (date(2024, 5, 13), date(2024, 5, 20))
+            )
+
+
+class TestCpuBudget(unittest.TestCase):
+    """
+    This class is designed to test the CPU time budget of the students:
+    refusing the answers once the budget is used up, and accounting
+    the CPU time of the checks.
+    """
+    def _check(self, used: float, env: dict[str, str]) -> str | None:
+        get_cpu_usage = mock.AsyncMock(return_value=used)
+        with mock.patch.dict(os.environ, env), \
+                mock.patch.object(common_crud, 'get_cpu_usage', get_cpu_usage):
+            return asyncio.run(check_cpu_budget(1))
+
+    def test_unlimited(self):
+        self.assertIsNone(self._check(10 ** 6, {'STUDENT_CPU_BUDGET': '0'}))
+
+    def test_budget_left(self):
+        self.assertIsNone(self._check(599, {'STUDENT_CPU_BUDGET': '600'}))
+
+    def test_budget_used_up(self):
+        text = self._check(600, {'STUDENT_CPU_BUDGET': '600',
+                                 'STUDENT_CPU_BUDGET_PERIOD': 'day'})
+        self.assertIn('10 из 10 мин.', text)
+        self.assertIn(f'{get_budget_period(date.today())[1]:%d.%m.%Y}', text)
+
+    def test_add_cpu_usage(self):
+        session = mock.MagicMock(execute=mock.AsyncMock())
+        session.__aenter__.return_value = session
+        with mock.patch.object(common_crud, 'Session', return_value=session):
+            asyncio.run(common_crud.add_cpu_usage(1, 2, 1.5))
+        statement = session.execute.call_args.args[0]
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+        self.assertIn('INSERT INTO cpu_usage', sql)
+        self.assertIn('FROM students', sql)
+        self.assertIn('ON CONFLICT (student_id, discipline_id, day) '
+                      'DO UPDATE', sql)
+        self.assertIn('checks = (cpu_usage.checks + ', sql)
+        self.assertIn('cpu_time = (cpu_usage.cpu_time + excluded.cpu_time)',
+                      sql)
+
+
+if __name__ == '__main__':
+    unittest.main()
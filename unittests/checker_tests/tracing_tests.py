@@ -0,0 +1,73 @@
+"""
+This module contains tests of the submission traces:
+the spans recorded by the checker and the latency breakdown.
+"""
+import asyncio
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+from testing_tools.checker.metrics import MetricsRegistry
+from utils import tracing
+from utils.tracing import aggregate, get_breakdown, load_spans
+
+
+class TestTracing(unittest.TestCase):
+    """
+    This class is designed to test the reconstruction
+    of the latency of the submissions from the trace sink.
+    """
+    def test_checker_steps_are_recorded(self):
+        with tempfile.TemporaryDirectory() as temp:
+            sink = Path(temp).joinpath('traces.jsonl')
+            with mock.patch.dict(os.environ, {'TRACE_FILE': str(sink)}):
+                registry = MetricsRegistry()
+                with registry.timer('keywords', 'abc'):
+                    pass
+                # steps of jobs without a trace are not recorded
+                with registry.timer('keywords'):
+                    pass
+            traces = load_spans([sink])
+        self.assertEqual(list(traces), ['abc'])
+        self.assertEqual(traces['abc'][0]['component'], 'checker')
+        self.assertEqual(registry.histograms['keywords'].count, 2)
+
+    def test_spans_of_coroutines_are_written_in_background(self):
+        with tempfile.TemporaryDirectory() as temp:
+            sink = Path(temp).joinpath('traces.jsonl')
+
+            async def record():
+                tracing.record_span('abc', 'bot', 'upload', 0, 1)
+                tracing.record_span('abc', 'bot', 'upload', 1, 2)
+                # the event loop is not blocked by the writing
+                self.assertFalse(sink.exists())
+                await tracing._writer
+
+            with mock.patch.dict(os.environ, {'TRACE_FILE': str(sink)}):
+                asyncio.run(record())
+            traces = load_spans([sink])
+        self.assertEqual(len(traces['abc']), 2)
+
+    def test_breakdown(self):
+        spans = [
+            {'span': 'upload', 'start': 0, 'end': 1},
+            {'span': 'job', 'start': 5, 'end': 15},
+            {'span': 'keywords', 'start': 6, 'end': 7},
+            {'span': 'deliver', 'start': 17, 'end': 18},
+        ]
+        breakdown = get_breakdown(spans)
+        self.assertEqual(breakdown['wait:job'], 4)
+        self.assertEqual(breakdown['keywords'], 1)
+        self.assertNotIn('wait:keywords', breakdown)
+        self.assertEqual(breakdown['wait:deliver'], 2)
+        self.assertEqual(breakdown['total'], 18)
+
+        stats = aggregate([breakdown, {'total': 10}])
+        self.assertEqual(stats['total']['count'], 2)
+        self.assertEqual(stats['total']['p50'], 10)
+        self.assertEqual(stats['total']['max'], 18)
+
+
+if __name__ == '__main__':
+    unittest.main()
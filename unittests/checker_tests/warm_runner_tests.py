@@ -0,0 +1,78 @@
+"""
+This module contains tests of sending jobs to the zygote
+of a warm runner container over its unix socket.
+"""
+import asyncio
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from testing_tools.checker.warm_runner import CPU_TIME_FRAME, FRAME_HEADER,\
+    OUTPUT_FRAME, REPORT_FRAME, TASK_FRAME, WarmRunner, WarmRunnerException
+
+
+def _frame(kind: bytes, data: bytes) -> bytes:
+    """Pack the data into a frame of the zygote"""
+    return FRAME_HEADER.pack(kind, len(data)) + data
+
+
+class TestWarmRunner(unittest.IsolatedAsyncioTestCase):
+    """
+    This class is designed to test the exchange with a fake zygote,
+    which prints the received request and archive in output frames
+    split in the middle of a line, sends a task result split between
+    task frames, and sends the CPU time and the report. Only the lines
+    of the task frames are passed as the task results.
+    """
+    async def asyncSetUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.socket_path = Path(self.temp.name).joinpath('zygote.sock')
+
+        async def handle(reader, writer):
+            request = json.loads(await reader.readline())
+            archive = await reader.readexactly(request['size'])
+            writer.write(_frame(OUTPUT_FRAME, archive + b'\n'))
+            writer.write(_frame(OUTPUT_FRAME, f"{request['cpus']}\ne".encode()))
+            writer.write(_frame(TASK_FRAME, b'##task'))
+            writer.write(_frame(TASK_FRAME, b'-report {}\n'))
+            writer.write(_frame(CPU_TIME_FRAME, b'1.5'))
+            writer.write(_frame(REPORT_FRAME, b'{"lab_id": 1}'))
+            writer.write(_frame(OUTPUT_FRAME, b'nd'))
+            await writer.drain()
+            writer.close()
+
+        self.server = await asyncio.start_unix_server(
+            handle,
+            str(self.socket_path)
+        )
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.temp.cleanup()
+
+    async def test_run(self):
+        runner = WarmRunner('lab', 'container', self.socket_path)
+        lines = []
+
+        async def on_event(line):
+            lines.append(line)
+
+        output, report, cpu_time = await runner.run(b'job', [2, 3], on_event)
+        self.assertEqual(lines, ['##task-report {}'])
+        self.assertEqual(output, 'job\n[2, 3]\nend')
+        self.assertEqual(report, '{"lab_id": 1}')
+        self.assertEqual(cpu_time, 1.5)
+
+    async def test_unavailable_runner(self):
+        runner = WarmRunner(
+            'lab',
+            'container',
+            Path(self.temp.name).joinpath('missing.sock')
+        )
+        with self.assertRaises(WarmRunnerException):
+            await runner.run(b'job')
+
+
+if __name__ == '__main__':
+    unittest.main()
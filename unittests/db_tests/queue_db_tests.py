@@ -38,7 +38,7 @@ class TestQueueDb(unittest.TestCase):
         self.assertTrue(queue_in_crud.is_not_empty())
 
         # get_first_record
-        record = queue_in_crud.get_first_record()
+        record = queue_in_crud.get_first_record("test-node")
         self.assertTrue(bool(record))
         self.assertTrue(queue_in_crud.is_empty())
 
@@ -1,19 +1,17 @@
 """
 Contains functionality for checking for the presence of a directory with tests.
 """
-import os
-from pathlib import Path
 from database.main_db import common_crud
+from utils.test_manifest import get_lab_manifest
 
 
 async def is_test_folder_exist(discipline_id: int, work_id: int) -> bool:
     """
-    Check if such directory with tests exists
+    Check if such directory with tests exists,
+    using the manifest of the discipline tests
 
     :param discipline_id: discipline ID
     :param work_id: work number
     """
     discipline = await common_crud.get_discipline(discipline_id)
-    return os.path.exists(Path.cwd().joinpath(
-        discipline.path_to_test
-    ).joinpath(str(work_id)))
+    return get_lab_manifest(discipline.path_to_test, work_id) is not None
@@ -0,0 +1,235 @@
+"""
+Contains functionality for building the manifest of the tests of a discipline
+and the in-memory index of these manifests, which is read by the bot
+and the verification subsystem instead of the test directories.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from threading import Lock
+from pydantic.json import pydantic_encoder
+from model.pydantic.test_manifest import DisciplineTestManifest,\
+    LabTestManifest
+from model.pydantic.test_settings import TestSettings
+
+
+MANIFEST_FILE_NAME = 'manifest.json'
+# directory of the discipline dataset store in the root test directory;
+# it is not versioned and is not replaced by test uploads
+DATASETS_DIR_NAME = 'datasets'
+
+_index: dict[Path, tuple[int, DisciplineTestManifest]] = {}
+_lock: Lock = Lock()
+
+
+def get_file_hash(path_to_file: Path) -> str:
+    """
+    Return the sha256 hash of the file content.
+
+    :param path_to_file: path to the file
+
+    :return str: hex digest of the file content
+    """
+    with open(path_to_file, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def get_dependency_hash(dependencies: list[str] | None) -> str:
+    """
+    Return the hash of the list of dependencies of the lab tests,
+    which does not depend on the order of the dependencies.
+
+    :param dependencies: list of packages from settings.json
+
+    :return str: hex digest of the sorted list of dependencies
+    """
+    data = ' '.join(sorted(dependencies or []))
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def create_lab_manifest(lab_number: int, path_to_lab: Path) -> LabTestManifest:
+    """
+    Build the manifest of the lab (homework) work tests.
+
+    :param lab_number: lab work number
+    :param path_to_lab: directory with the tests and settings.json of the lab
+
+    :return LabTestManifest: manifest of the lab tests
+    """
+    with open(path_to_lab.joinpath('settings.json'), encoding='utf-8') as file:
+        settings = TestSettings(**json.load(file))
+
+    tasks: list[str] = []
+    file_hashes: dict[str, str] = {}
+    for file in sorted(path_to_lab.iterdir()):
+        if not file.is_file():
+            continue
+        file_hashes[file.name] = get_file_hash(file)
+        if file.name.startswith('test_'):
+            tasks.append(file.name.split('_', 1)[1])
+
+    return LabTestManifest(
+        lab_number=lab_number,
+        tasks=tasks,
+        file_hashes=file_hashes,
+        settings=settings,
+        dependency_hash=get_dependency_hash(settings.dependencies)
+    )
+
+
+def create_manifest(path: Path) -> DisciplineTestManifest:
+    """
+    Build the manifest of all lab works found in the test directory
+    of the discipline.
+
+    :param path: absolute path to the test directory of the discipline
+
+    :return DisciplineTestManifest: manifest of the discipline tests
+    """
+    manifest = DisciplineTestManifest()
+    for lab_dir in sorted(path.iterdir()):
+        if not lab_dir.is_dir() or not lab_dir.name.isdigit():
+            continue
+        if not lab_dir.joinpath('settings.json').is_file():
+            continue
+        manifest.labs[int(lab_dir.name)] = create_lab_manifest(
+            int(lab_dir.name),
+            lab_dir
+        )
+    return manifest
+
+
+def save_manifest(path: Path, manifest: DisciplineTestManifest) -> None:
+    """
+    Save the manifest to the test directory of the discipline.
+    The manifest is written to a temporary file and then atomically
+    replaces the previous one, so readers never see a partial manifest.
+
+    :param path: absolute path to the test directory of the discipline
+    :param manifest: manifest of the discipline tests
+
+    :return None:
+    """
+    temp_path = path.joinpath(f'{MANIFEST_FILE_NAME}.tmp')
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump(
+            manifest,
+            file,
+            sort_keys=False,
+            indent=4,
+            ensure_ascii=False,
+            separators=(',', ': '),
+            default=pydantic_encoder
+        )
+    os.replace(temp_path, path.joinpath(MANIFEST_FILE_NAME))
+
+
+def put_manifest(path: Path, manifest: DisciplineTestManifest) -> None:
+    """
+    Save the manifest of the discipline tests and put it in the index.
+
+    :param path: absolute path to the test directory of the discipline
+    :param manifest: manifest of the discipline tests
+
+    :return None:
+    """
+    save_manifest(path, manifest)
+    mtime = os.stat(path.joinpath(MANIFEST_FILE_NAME)).st_mtime_ns
+    with _lock:
+        _index[path] = (mtime, manifest)
+
+
+def update_manifest(path_to_test: str) -> DisciplineTestManifest:
+    """
+    Rebuild the manifest of the tests located directly in the root
+    test directory of the discipline (tests uploaded before
+    the versioned layout appeared), save it and put it in the index.
+
+    :param path_to_test: root directory of the discipline tests
+
+    :return DisciplineTestManifest: new manifest of the discipline tests
+    """
+    path = Path.cwd().joinpath(path_to_test)
+    manifest = create_manifest(path)
+    put_manifest(path, manifest)
+    return manifest
+
+
+def get_manifest(path_to_test: str) -> DisciplineTestManifest:
+    """
+    Return the manifest of the discipline tests from the index.
+    The manifest is re-read only if it was changed on disk
+    (eg the tests were uploaded by the bot running in another process),
+    and is built if the tests were uploaded before manifests appeared.
+
+    :param path_to_test: root directory of the discipline tests
+
+    :return DisciplineTestManifest: manifest of the discipline tests
+    """
+    path = Path.cwd().joinpath(path_to_test)
+    manifest_path = path.joinpath(MANIFEST_FILE_NAME)
+    try:
+        mtime = os.stat(manifest_path).st_mtime_ns
+    except FileNotFoundError:
+        if not path.is_dir():
+            return DisciplineTestManifest()
+        return update_manifest(path_to_test)
+
+    with _lock:
+        cached = _index.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    with open(manifest_path, encoding='utf-8') as file:
+        manifest = DisciplineTestManifest(**json.load(file))
+    with _lock:
+        _index[path] = (mtime, manifest)
+    return manifest
+
+
+def get_lab_manifest(path_to_test: str,
+                     lab_number: int) -> LabTestManifest | None:
+    """
+    Return the manifest of the lab work tests.
+
+    :param path_to_test: root directory of the discipline tests
+    :param lab_number: lab work number
+
+    :return LabTestManifest | None: manifest of the lab tests,
+        None IF there are no tests for this lab
+    """
+    return get_manifest(path_to_test).labs.get(lab_number)
+
+
+def get_dataset_paths(path_to_test: str,
+                      settings: TestSettings) -> list[Path]:
+    """
+    Return the datasets of the lab work declared in settings.json.
+
+    :param path_to_test: root directory of the discipline tests
+    :param settings: testing policies of the lab
+
+    :return list[Path]: absolute paths to the files or directories
+        of the datasets in the dataset store of the discipline
+    """
+    store = Path.cwd().joinpath(path_to_test).joinpath(DATASETS_DIR_NAME)
+    return [store.joinpath(it) for it in settings.datasets or []]
+
+
+def get_lab_path(path_to_test: str,
+                 manifest: DisciplineTestManifest,
+                 lab_number: int) -> Path:
+    """
+    Return the directory with the tests of the lab work
+    of the version described by the manifest.
+
+    :param path_to_test: root directory of the discipline tests
+    :param manifest: manifest of the discipline tests
+    :param lab_number: lab work number
+
+    :return Path: absolute path to the lab tests
+    """
+    return Path.cwd().joinpath(
+        path_to_test
+    ).joinpath(manifest.root).joinpath(str(lab_number))
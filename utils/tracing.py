@@ -0,0 +1,210 @@
+"""
+Contains the tracing of the submissions: the trace ID generated when
+the student uploads the answers is carried through the intermediate
+database, and each component (bot, checker, result delivery) records
+the timings of its spans to the local trace sink, a JSONL file set by
+the TRACE_FILE environment variable. The spans recorded in a coroutine
+are buffered and appended to the sink in a worker thread,
+so that the tracing does not block the event loop. The functions at the end of the
+module reconstruct the latency breakdown of the submissions from the sink.
+"""
+import asyncio
+import atexit
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+
+# spans waiting to be written: path to the sink, line
+_pending: list[tuple[str, str]] = []
+_pending_lock = threading.Lock()
+# task of the event loop writing the buffered spans
+_writer: asyncio.Task | None = None
+
+
+def new_trace_id() -> str:
+    """
+    :return str: ID of a new submission trace
+    """
+    return uuid.uuid4().hex
+
+
+def record_span(trace_id: str | None,
+                component: str,
+                name: str,
+                start: float,
+                end: float) -> None:
+    """
+    Append the span to the trace sink. Nothing is recorded
+    IF the trace ID is unknown or the TRACE_FILE variable is not set.
+    In a running event loop the span is buffered and written
+    by the writer task, otherwise it is written at once.
+
+    :param trace_id: submission trace ID
+    :param component: component that executed the span: bot, checker, answer
+    :param name: span name
+    :param start: start time of the span (unix time, sec)
+    :param end: end time of the span (unix time, sec)
+
+    :return None:
+    """
+    path = os.getenv("TRACE_FILE")
+    if not path or trace_id is None:
+        return
+    line = json.dumps({
+        'trace_id': trace_id,
+        'component': component,
+        'span': name,
+        'start': start,
+        'end': end,
+    }) + '\n'
+    with _pending_lock:
+        _pending.append((path, line))
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        flush_spans()
+        return
+    global _writer
+    if _writer is None or _writer.done() or _writer.get_loop() is not loop:
+        _writer = loop.create_task(_write_spans())
+
+
+async def _write_spans() -> None:
+    """Write the buffered spans in a worker thread until none are left"""
+    while _pending:
+        await asyncio.to_thread(flush_spans)
+
+
+@atexit.register
+def flush_spans() -> None:
+    """
+    Write the buffered spans to the trace sinks. The spans of a sink
+    are written by a single append, so several processes can share it.
+    """
+    with _pending_lock:
+        lines = _pending[:]
+        _pending.clear()
+    sinks: dict[str, list[str]] = {}
+    for path, line in lines:
+        sinks.setdefault(path, []).append(line)
+    for path, it in sinks.items():
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, ''.join(it).encode('utf-8'))
+            finally:
+                os.close(fd)
+        except OSError as ex:
+            # tracing must not break the processing of the submission
+            print(f"Не удалось записать трассировку: {ex}")
+
+
+@contextmanager
+def span(trace_id: str | None, component: str, name: str):
+    """
+    Record the execution of the block as a span of the trace.
+
+    :param trace_id: submission trace ID
+    :param component: component that executes the span
+    :param name: span name
+    """
+    start = time.time()
+    try:
+        yield
+    finally:
+        record_span(trace_id, component, name, start, time.time())
+
+
+def load_spans(paths: list[Path]) -> dict[str, list[dict]]:
+    """
+    Read the spans from the trace sinks (eg of several checker hosts).
+
+    :param paths: paths to the JSONL files
+
+    :return dict[str, list[dict]]: trace ID: spans sorted by start time
+    """
+    traces: dict[str, list[dict]] = {}
+    for path in paths:
+        with open(path, encoding='utf-8') as sink:
+            for line in sink:
+                if not line.strip():
+                    continue
+                try:
+                    it = json.loads(line)
+                except ValueError:
+                    # a line cut by a crash of the writer
+                    continue
+                traces.setdefault(it['trace_id'], []).append(it)
+    for spans in traces.values():
+        spans.sort(key=lambda x: x['start'])
+    return traces
+
+
+def get_breakdown(spans: list[dict]) -> dict[str, float]:
+    """
+    Reconstruct the latency breakdown of a submission.
+    The time between the end of the previous spans and the start
+    of the next one (waiting in a queue) is counted as "wait:<next span>",
+    the whole time from the first span to the last one as "total".
+    Nested spans are counted separately, the waits are not.
+
+    :param spans: spans of the trace sorted by start time
+
+    :return dict[str, float]: span name: duration (sec)
+    """
+    result: dict[str, float] = {}
+    if not spans:
+        return result
+    reached = spans[0]['start']
+    for it in spans:
+        if it['start'] > reached:
+            name = f"wait:{it['span']}"
+            result[name] = result.get(name, 0) + it['start'] - reached
+        result[it['span']] = result.get(it['span'], 0) + it['end'] - it['start']
+        reached = max(reached, it['end'])
+    result['total'] = reached - spans[0]['start']
+    return result
+
+
+def percentile(values: list[float], q: float) -> float:
+    """
+    :param values: measured values
+    :param q: percentile as a fraction, eg 0.95
+
+    :return float: the value with the nearest rank, 0 IF there are no values
+    """
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+def aggregate(breakdowns: list[dict[str, float]]
+              ) -> dict[str, dict[str, float]]:
+    """
+    Aggregate the latency breakdowns of the submissions.
+
+    :param breakdowns: breakdowns (see get_breakdown)
+
+    :return dict[str, dict[str, float]]: span name: number of submissions
+        with the span, p50, p95, p99 and maximum of its duration
+    """
+    values: dict[str, list[float]] = {}
+    for it in breakdowns:
+        for name, duration in it.items():
+            values.setdefault(name, []).append(duration)
+    return {
+        name: {
+            'count': len(durations),
+            'p50': percentile(durations, 0.5),
+            'p95': percentile(durations, 0.95),
+            'p99': percentile(durations, 0.99),
+            'max': max(durations),
+        } for name, durations in values.items()
+    }
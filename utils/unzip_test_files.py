@@ -1,34 +1,165 @@
 """
-Contains functionality for unpacking an archive with tests on 
-an academic subject (downloaded by the administrator) 
+Contains functionality for unpacking an archive with tests on
+an academic subject (downloaded by the administrator)
 and saving it in a predefined directory.
+
+The archive is unpacked into a staging directory and validated,
+after which it becomes a new version of the tests: the manifest
+pointing to the new version atomically replaces the previous one,
+so the verification subsystem never sees a half-unpacked directory.
 """
-import os
+import asyncio
+import io
 import shutil
+import uuid
 from pathlib import Path
-from zipfile import ZipFile
+from zipfile import BadZipFile, ZipFile
+from pydantic import ValidationError
+from model.pydantic.test_manifest import DisciplineTestManifest,\
+    LabTestManifest
+from utils.test_manifest import DATASETS_DIR_NAME, MANIFEST_FILE_NAME,\
+    create_manifest, get_dataset_paths, get_manifest, put_manifest
+
+
+class TestArchiveException(Exception):
+    """The uploaded test archive does not meet the requirements"""
+
+
+_upload_lock = asyncio.Lock()
+
+
+def _validate_tests(path: Path) -> DisciplineTestManifest:
+    """
+    Check the unpacked tests and build their manifest.
 
+    :param path: directory where the test archive was unpacked
 
-async def save_test_files(path_to_test: str, downloaded_file: bytes) -> None:
+    :raises TestArchiveException: IF the tests do not meet the requirements
+
+    :return DisciplineTestManifest: manifest of the unpacked tests
+    """
+    for lab_dir in path.iterdir():
+        if lab_dir.is_dir() and lab_dir.name.isdigit() and \
+                not lab_dir.joinpath('settings.json').is_file():
+            raise TestArchiveException(
+                f'В директории {lab_dir.name} отсутствует settings.json'
+            )
+    try:
+        manifest = create_manifest(path)
+    except (ValueError, ValidationError) as ex:
+        raise TestArchiveException(
+            f'Ошибка в файле settings.json: {ex}'
+        ) from ex
+    if not manifest.labs:
+        raise TestArchiveException(
+            'В архиве нет пронумерованных директорий с тестами'
+        )
+    for lab in manifest.labs.values():
+        if not lab.tasks:
+            raise TestArchiveException(
+                f'В директории {lab.lab_number} нет тестов'
+            )
+    return manifest
+
+
+def _remove_old_versions(path: Path,
+                         current: DisciplineTestManifest,
+                         previous: DisciplineTestManifest) -> None:
     """
-    unpack the test archive (downloaded by the administrator) 
-    for a specific discipline.
+    Delete everything in the root test directory of the discipline,
+    except for the manifest, the dataset store, the current and the previous
+    version of tests (the previous one may still be used by running checks).
+
+    :param path: root test directory of the discipline
+    :param current: manifest of the new version of tests
+    :param previous: manifest of the replaced version of tests
+
+    :return None:
+    """
+    for it in path.iterdir():
+        if it.name in (MANIFEST_FILE_NAME, DATASETS_DIR_NAME,
+                       current.root, previous.root):
+            continue
+        if previous.root == '' and it.name.isdigit():
+            continue
+        if it.is_file():
+            it.unlink()
+        else:
+            shutil.rmtree(it)
+
 
-    :param path_to_test: root directory for loading tests 
+def _swap_test_files(path_to_test: str,
+                     downloaded_file: bytes) -> list[LabTestManifest]:
+    """
+    Unpack the test archive into a staging directory, validate it
+    and make it the current version of the discipline tests.
+
+    :param path_to_test: root directory for loading tests
+    :param downloaded_file: raw archive representation (byte set)
+
+    :raises TestArchiveException: IF the archive is broken or
+        the tests do not meet the requirements
+
+    :return list[LabTestManifest]: manifests of the new or changed labs
+    """
+    path = Path.cwd().joinpath(path_to_test)
+    path.mkdir(parents=True, exist_ok=True)
+    previous = get_manifest(path_to_test)
+
+    staging = path.joinpath(f'.staging-{uuid.uuid4()}')
+    try:
+        with ZipFile(io.BytesIO(downloaded_file)) as zipObj:
+            zipObj.extractall(path=staging)
+        manifest = _validate_tests(staging)
+        for lab in manifest.labs.values():
+            missing = [
+                it.name for it in get_dataset_paths(path_to_test, lab.settings)
+                if not it.exists()
+            ]
+            if missing:
+                raise TestArchiveException(
+                    f'Для работы {lab.lab_number} в хранилище дисциплины '
+                    f'нет наборов данных: {", ".join(missing)}'
+                )
+    except BadZipFile as ex:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise TestArchiveException('Архив повреждён') from ex
+    except TestArchiveException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    manifest.version = previous.version + 1
+    manifest.root = f'v{manifest.version}'
+    staging.rename(path.joinpath(manifest.root))
+    put_manifest(path, manifest)
+    _remove_old_versions(path, manifest, previous)
+
+    changed = []
+    for lab_number, lab in manifest.labs.items():
+        old_lab = previous.labs.get(lab_number)
+        if old_lab is None or old_lab.file_hashes != lab.file_hashes:
+            changed.append(lab)
+    return changed
+
+
+async def save_test_files(path_to_test: str,
+                          downloaded_file: bytes) -> list[LabTestManifest]:
+    """
+    unpack the test archive (downloaded by the administrator)
+    for a specific discipline and build the manifest of its tests.
+
+    :param path_to_test: root directory for loading tests
         for the subject chosen by the student
     :param downloaded_file: raw archive representation (byte set)
+
+    :raises TestArchiveException: IF the archive is broken or
+        the tests do not meet the requirements
+
+    :return list[LabTestManifest]: manifests of the new or changed labs
     """
-    path = Path.cwd()
-    path = Path(path.joinpath(path_to_test))
-    if os.listdir(path):
-        for file_name in os.listdir(path):
-            file_path = path.joinpath(file_name)
-            if os.path.isfile(file_path):
-                os.remove(file_path)
-            else:
-                shutil.rmtree(file_path)
-
-    with open(path.joinpath("archive.zip"), "wb") as new_file:
-        new_file.write(downloaded_file)
-    with ZipFile(path.joinpath("archive.zip")) as zipObj:
-        zipObj.extractall(path=Path(path))
+    async with _upload_lock:
+        return await asyncio.to_thread(
+            _swap_test_files,
+            path_to_test,
+            downloaded_file
+        )